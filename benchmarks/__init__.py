@@ -0,0 +1,4 @@
+"""ai_meeting_recorder のオフラインベンチマーク
+
+リポジトリ直下から `python -m benchmarks.<name>` で実行する。
+"""
@@ -0,0 +1,337 @@
+"""GUI ホットパス (update_waveform / log) のヘッドレス計測ハーネス
+
+偽の sounddevice モジュールを差し込み、合成会議音声を実時間の speed 倍で流し込みながら
+RecorderController / RecorderView を実際の Tk イベントループで動かす。
+
+計測項目:
+ - update_waveform 1 回の時間と、Tk 側で実際に行われる canvas.draw の時間
+ - Tk イベントループの遅延 (一定間隔の after() が予定からどれだけ遅れたか)
+ - view.log の 1 行当たりの時間 (ログ行数が増えた状態で計測)
+ - 録音中のメモリ (RSS) の推移と、模擬録音 1 時間当たりの増加量
+
+ディスプレイが必要。Linux のヘッドレス環境では Xvfb 上で実行する:
+
+    xvfb-run -a python -m benchmarks.gui_harness --hours 2 --speed 30 --out gui.json
+
+Tk を起動できない場合は Agg バックエンドで波形 Figure の更新/描画時間のみ計測する。
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import types
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from benchmarks import synthetic  # noqa: E402
+from src import sound_control  # noqa: E402
+
+RATE = 16000
+FEED_SECONDS = 60  # 合成音声はこの長さを繰り返し流す
+
+
+# ---------------------------------------------------------------------------
+# 偽 sounddevice
+# ---------------------------------------------------------------------------
+class _Feed:
+    """デバイス毎の合成音声 (ループ再生) と ADC 時刻の生成"""
+
+    def __init__(self, audio: np.ndarray, offset: float = 0.0, drift_ppm: float = 0.0):
+        self.audio = sound_control.to_int16(audio)
+        self.offset = offset
+        self.drift = drift_ppm * 1e-6
+        self.pos = 0
+
+    def read(self, frames: int, dtype: str):
+        n = len(self.audio)
+        start = self.pos % n
+        idx = (np.arange(start, start + frames)) % n
+        block = self.audio[idx].reshape(-1, 1)
+        adc = self.offset + self.pos / (RATE * (1 + self.drift))
+        self.pos += frames
+        if dtype != 'int16':
+            block = sound_control.to_float32(block)
+        return block, adc
+
+
+def make_fake_sounddevice(speed: float, drift_ppm: float = 150.0, offset_ms: float = 120.0):
+    mic, spk = synthetic.meeting(FEED_SECONDS, RATE, seed=1)
+    feeds = {
+        0: _Feed(mic),
+        1: _Feed(spk, offset_ms / 1000.0, drift_ppm),
+    }
+    devices = [
+        {'name': 'Fake Microphone', 'max_input_channels': 1, 'max_output_channels': 0, 'hostapi': 0,
+         'default_samplerate': float(RATE)},
+        {'name': 'Fake Loopback', 'max_input_channels': 2, 'max_output_channels': 0, 'hostapi': 0,
+         'default_samplerate': float(RATE)},
+        {'name': 'Fake Speaker', 'max_input_channels': 0, 'max_output_channels': 2, 'hostapi': 0,
+         'default_samplerate': float(RATE)},
+    ]
+    mod = types.ModuleType('sounddevice')
+    mod.stats = {'callbacks': 0, 'late_blocks': 0}
+
+    class PortAudioError(Exception):
+        pass
+
+    class InputStream:
+        def __init__(self, samplerate=RATE, channels=1, dtype='float32', device=None, callback=None,
+                     blocksize=0, **kwargs):
+            if device not in feeds:
+                raise PortAudioError(f'invalid device {device}')
+            self.samplerate = samplerate
+            self.dtype = dtype
+            self.blocksize = blocksize or samplerate // 10
+            self.callback = callback
+            self.feed = feeds[device]
+            self._stop = threading.Event()
+            self._thread = None
+
+        def _run(self):
+            interval = self.blocksize / self.samplerate / speed
+            next_t = time.perf_counter()
+            while not self._stop.is_set():
+                block, adc = self.feed.read(self.blocksize, self.dtype)
+                self.callback(block, self.blocksize, types.SimpleNamespace(inputBufferAdcTime=adc), 0)
+                mod.stats['callbacks'] += 1
+                next_t += interval
+                delay = next_t - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -interval:
+                    mod.stats['late_blocks'] += 1
+
+        def start(self):
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+        def stop(self):
+            self._stop.set()
+            if self._thread is not None:
+                self._thread.join()
+                self._thread = None
+
+        def close(self):
+            self.stop()
+
+        def __enter__(self):
+            self.start()
+            return self
+
+        def __exit__(self, *exc):
+            self.stop()
+            return False
+
+    mod.InputStream = InputStream
+    mod.PortAudioError = PortAudioError
+    mod.query_devices = lambda *a, **k: [dict(d) for d in devices]
+    mod.sleep = lambda ms: time.sleep(ms / 1000.0)
+    mod._terminate = lambda: None
+    mod._initialize = lambda: None
+    mod.default = types.SimpleNamespace(device=[0, 2])
+    return mod
+
+
+# ---------------------------------------------------------------------------
+# 計測
+# ---------------------------------------------------------------------------
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except Exception:
+        import resource
+        # Linux は KB, macOS は byte (最大値のみ)
+        scale = 2**20 if sys.platform == 'darwin' else 2**10
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _stats_ms(values):
+    if not values:
+        return None
+    v = sorted(values)
+    return {
+        'count': len(v),
+        'mean_ms': statistics.fmean(v) * 1e3,
+        'p50_ms': v[len(v) // 2] * 1e3,
+        'p95_ms': v[min(int(len(v) * 0.95), len(v) - 1)] * 1e3,
+        'max_ms': v[-1] * 1e3,
+    }
+
+
+def _timed(samples, fn):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+def run_tk(hours, speed, log_lines, probe_ms, log_every_seconds):
+    sys.modules['sounddevice'] = fake = make_fake_sounddevice(speed)
+    import tkinter as tk
+    work = tempfile.mkdtemp(prefix='amr_gui_')
+    os.chdir(work)  # init.yml / meeting.wav をテンポラリへ
+    from src.controller import RecorderController
+
+    root = tk.Tk()
+    root.geometry('1000x780')
+    controller = RecorderController(root)
+    view = controller.view
+    # 録音終了後の議事録生成 (Whisper / Gemini) は計測対象外
+    controller._start_minutes_processing = lambda: None
+    controller.model.settings.wav_file = os.path.join(work, 'meeting.wav')
+
+    waveform_times, draw_times, log_times, lateness = [], [], [], []
+    view.update_waveform = _timed(waveform_times, view.update_waveform)
+    view.canvas.draw = _timed(draw_times, view.canvas.draw)
+    memory = []
+    wall_seconds = hours * 3600 / speed
+    state = {'start': None, 'next_log': 0.0}
+
+    def probe(expected):
+        lateness.append(max(time.perf_counter() - expected, 0.0))
+        if state['start'] is not None and time.perf_counter() - state['start'] > wall_seconds:
+            return
+        root.after(probe_ms, probe, time.perf_counter() + probe_ms / 1000.0)
+
+    def sample():
+        if state['start'] is None:
+            return
+        elapsed = time.perf_counter() - state['start']
+        simulated = elapsed * speed
+        memory.append({'simulated_seconds': round(simulated, 1), 'rss_mb': round(rss_mb(), 1)})
+        # 模擬録音の経過に応じてログも流す (長時間録音でログが溜まった状態を再現)
+        while state['next_log'] <= simulated:
+            view.log(f"[harness] simulated {state['next_log'] / 60:.0f} min")
+            state['next_log'] += log_every_seconds
+        if elapsed < wall_seconds:
+            root.after(1000, sample)
+        else:
+            finish()
+
+    def finish():
+        controller.stop_recording()
+        log_box_lines = int(float(view.log_box.index('end')))
+        timed_log = _timed(log_times, view.log)
+        for i in range(log_lines):
+            timed_log(f"[harness] log throughput {i}")
+        result['log_box_lines'] = log_box_lines
+        root.after(200, root.quit)
+
+    result = {}
+
+    def begin():
+        result['rss_before_mb'] = round(rss_mb(), 1)
+        view.mic_device_var.set('Fake Microphone')
+        view.spk_device_var.set('Fake Loopback')
+        controller.start_recording()
+        state['start'] = time.perf_counter()
+        root.after(1000, sample)
+        probe(time.perf_counter())
+
+    root.after(500, begin)
+    root.mainloop()
+    try:
+        controller.stop_preview()
+        root.destroy()
+    except Exception:
+        pass
+
+    rss = [m['rss_mb'] for m in memory]
+    growth = None
+    if len(memory) >= 2:
+        x = np.array([m['simulated_seconds'] for m in memory]) / 3600
+        slope = np.polyfit(x, np.array(rss), 1)[0] if np.ptp(x) > 0 else 0.0
+        growth = round(float(slope), 1)
+    return {
+        'mode': 'tk',
+        'simulated_hours': hours,
+        'speed': speed,
+        'update_waveform': _stats_ms(waveform_times),
+        'canvas_draw': _stats_ms(draw_times),
+        'event_loop_lateness': _stats_ms(lateness),
+        'log': _stats_ms(log_times),
+        'log_box_lines': result.get('log_box_lines'),
+        'memory': {
+            'rss_before_mb': result.get('rss_before_mb'),
+            'rss_end_mb': rss[-1] if rss else None,
+            'rss_peak_mb': max(rss) if rss else None,
+            'growth_mb_per_simulated_hour': growth,
+            'samples': memory,
+        },
+        'buffer_stats': controller.buffer_stats(),
+        'fake_device': dict(fake.stats),
+    }
+
+
+def run_agg(frames):
+    """Tk 無しで波形 Figure の更新と Agg 描画のみ計測"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from src.level_meter import LevelMeter
+    from src.view import RecorderView
+    view = RecorderView.__new__(RecorderView)
+    view._build_figure()
+    view.canvas = FigureCanvasAgg(view.fig)
+    mic, spk = synthetic.meeting(FEED_SECONDS, RATE, seed=1)
+    meters = (LevelMeter(), LevelMeter())
+    block = RATE // 10
+    update_times, draw_times = [], []
+    for i in range(frames):
+        pos = (i * block) % (len(mic) - block)
+        meters[0].update(sound_control.to_int16(mic[pos:pos + block]))
+        meters[1].update(sound_control.to_int16(spk[pos:pos + block]))
+        start = time.perf_counter()
+        view.update_waveform(*meters)
+        update_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        view.canvas.draw()
+        draw_times.append(time.perf_counter() - start)
+    return {'mode': 'agg', 'update_waveform': _stats_ms(update_times), 'canvas_draw': _stats_ms(draw_times)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--hours', type=float, default=2.0, help='模擬録音時間 (時間)')
+    ap.add_argument('--speed', type=float, default=30.0,
+                    help='実時間に対する再生倍率 (録音リング 5 秒 / ドレイン 100ms のため 40 倍程度まで)')
+    ap.add_argument('--log-lines', type=int, default=2000, help='録音後に計測する log() 呼び出し回数')
+    ap.add_argument('--log-every', type=float, default=60.0, help='録音中のログ間隔 (模擬秒)')
+    ap.add_argument('--probe-ms', type=int, default=50, help='イベントループ遅延の計測間隔')
+    ap.add_argument('--agg', action='store_true', help='Tk を使わず Agg で描画時間のみ計測')
+    ap.add_argument('--agg-frames', type=int, default=300)
+    ap.add_argument('--out', help='結果 JSON の出力先')
+    args = ap.parse_args(argv)
+    out_path = os.path.abspath(args.out) if args.out else None  # run_tk は作業ディレクトリを移す
+
+    result = None
+    if not args.agg:
+        try:
+            result = run_tk(args.hours, args.speed, args.log_lines, args.probe_ms, args.log_every)
+        except Exception as e:
+            if 'display' not in str(e).lower():
+                raise
+            print(f'Tk を起動できないため Agg モードで計測します ({e})。xvfb-run -a での実行を推奨', file=sys.stderr)
+    if result is None:
+        result = run_agg(args.agg_frames)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if out_path:
+        with open(out_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
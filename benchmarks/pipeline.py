@@ -0,0 +1,247 @@
+"""音声/文字起こしパイプラインのオフラインベンチマーク
+
+合成会議音声 (benchmarks.synthetic) を使い、以下を計測して JSON で出力する。
+音声デバイス・GPU・ネットワークは不要 (Whisper / Gemini はスタブに差し替える)。
+
+ - split_audio           : 無音区間での分割
+ - split_audio_by_time   : 時間分割
+ - mix_and_save          : マイク + スピーカー (オフセット/ドリフト付き) の時刻合わせミックス
+ - level_meter           : 録音ブロック毎の LevelMeter.update と履歴コピー (1 ブロック当たり)
+ - waveform_draw         : 波形 Figure の更新 + 描画 (matplotlib がある場合のみ, Agg)
+ - create_meeting_report : スタブ ASR / スタブ要約での議事録処理全体
+
+    python -m benchmarks.pipeline --seconds 600 --out bench.json
+    python -m benchmarks.pipeline --seconds 600 --compare bench.json   # 前回結果との比較
+
+同じ --seconds / --seed なら入力は同一なので、コミット間で結果を比較できる。
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from src import ai_control, asr_backend, sound_control
+from src.level_meter import LevelMeter
+from src.model import RecorderModel
+from src.setting import AppSettings
+
+from benchmarks import synthetic
+
+RATE = 16000
+BLOCK = 1600  # 100 ms (録音ブロック相当)
+
+
+class StubBackend(asr_backend.AsrBackend):
+    """VAD の発話区間をそのままセグメントにする ASR スタブ (モデルロード・推論コスト無し)"""
+    name = 'bench-stub'
+
+    def load(self):
+        return True
+
+    def transcribe_array(self, audio, lang='ja', **kwargs):
+        regions = sound_control.speech_regions(audio, asr_backend.SAMPLE_RATE)
+        return [asr_backend.make_segment(s / asr_backend.SAMPLE_RATE, e / asr_backend.SAMPLE_RATE,
+                                         f"発話 {i}", -0.3, 0.01)
+                for i, (s, e) in enumerate(regions)]
+
+    def detect_language(self, audios):
+        return {'ja': 1.0}
+
+
+def _stub_summarizer(prompt, text, gemini_api_key, logger=None, metrics=None, **kwargs):
+    return f"(stub summary: {len(text)} chars)"
+
+
+def _timeit(fn, repeat):
+    times = []
+    extra = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        extra = fn()
+        times.append(time.perf_counter() - start)
+    result = {'seconds_min': min(times), 'seconds_median': statistics.median(times), 'repeat': repeat}
+    if isinstance(extra, dict):
+        result.update(extra)
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def bench_split(work, wav, repeat):
+    out = {}
+    out['split_audio'] = _timeit(lambda: {'chunks': len(sound_control.split_audio(wav, os.path.join(work, 'silence')))},
+                                 repeat)
+    out['split_audio_by_time'] = _timeit(
+        lambda: {'chunks': len(sound_control.split_audio_by_time(wav, os.path.join(work, 'time'), 30))}, repeat)
+    return out
+
+
+def bench_mix(work, mic, spk, drift_ppm, offset_ms, repeat):
+    mic_frames, mic_times = synthetic.to_blocks(mic, RATE, BLOCK, 0.0)
+    spk_audio = synthetic.apply_drift(spk, drift_ppm)
+    spk_frames, spk_times = synthetic.to_blocks(spk_audio, RATE, BLOCK, offset_ms / 1000.0, drift_ppm)
+    model = RecorderModel(settings=AppSettings(wav_file=os.path.join(work, 'mixed.wav')))
+
+    def run():
+        model.reset()
+        model.mic_frames, model.spk_frames = list(mic_frames), list(spk_frames)
+        model.mic_times, model.spk_times = list(mic_times), list(spk_times)
+        model.mix_and_save()
+        return {'drift_ppm': drift_ppm, 'offset_ms': offset_ms}
+    return {'mix_and_save': _timeit(run, repeat)}
+
+
+def bench_waveform(mic, spk, repeat):
+    out = {}
+    blocks = [sound_control.to_int16(mic[i:i + BLOCK]) for i in range(0, len(mic) - BLOCK, BLOCK)]
+    buf_min = np.zeros(600, dtype=np.float32)
+    buf_max = np.zeros(600, dtype=np.float32)
+
+    def meter_run():
+        meter = LevelMeter()
+        for b in blocks:
+            meter.update(b)
+            meter.copy_history(buf_min, buf_max)
+        return {'blocks': len(blocks)}
+    r = _timeit(meter_run, repeat)
+    r['us_per_block'] = r['seconds_min'] / max(len(blocks), 1) * 1e6
+    out['level_meter'] = r
+
+    try:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from src.view import RecorderView
+    except Exception as e:
+        out['waveform_draw'] = {'skipped': f'matplotlib unavailable: {e}'}
+        return out
+    view = RecorderView.__new__(RecorderView)
+    view._build_figure()
+    view.canvas = FigureCanvasAgg(view.fig)
+    mic_meter, spk_meter = LevelMeter(), LevelMeter()
+    for b in blocks:
+        mic_meter.update(b)
+        spk_meter.update(b)
+    frames = 50
+
+    def draw_run():
+        for _ in range(frames):
+            view.update_waveform(mic_meter, spk_meter)
+            view.canvas.draw()
+        return {'frames': frames}
+    r = _timeit(draw_run, repeat)
+    r['ms_per_frame'] = r['seconds_min'] / frames * 1e3
+    out['waveform_draw'] = r
+    return out
+
+
+def bench_report(work, wav, repeat, chunk_seconds, overlap_seconds, batch_size):
+    asr_backend.register_backend(StubBackend)
+    ai_control.summarize_minutes_gemini = _stub_summarizer
+    out_text = os.path.join(work, 'minutes.txt')
+    holder = {}
+
+    def run():
+        result = ai_control.create_meeting_report(
+            'prompt', wav, os.path.join(work, 'report_chunks'), chunk_seconds, out_text, 'dummy-key',
+            lang='ja', whisper_model='stub',
+            options=ai_control.PipelineOptions(batch_size=batch_size, asr_backend_name=StubBackend.name,
+                                               overlap_seconds=overlap_seconds))
+        if not result.get('success'):
+            raise RuntimeError(result.get('error'))
+        holder['metrics'] = result.get('metrics')
+        return {'segments': result['segment_count']}
+    r = _timeit(run, repeat)
+    metrics = holder.get('metrics') or {}
+    r['stages'] = {k: v['seconds'] for k, v in metrics.get('stages', {}).items()}
+    return {'create_meeting_report': r}
+
+
+def compare(current, previous):
+    """前回結果との比較行を返す (seconds_min の比)"""
+    prev_meta = previous.get('meta', {})
+    lines = [f"比較: {prev_meta.get('commit')} → {current['meta'].get('commit')}"]
+    for key in ('audio_seconds', 'seed'):
+        if prev_meta.get(key) != current['meta'].get(key):
+            lines.append(f"  注意: {key} が異なります ({prev_meta.get(key)} / {current['meta'].get(key)})")
+    for name, cur in current['results'].items():
+        prev = previous.get('results', {}).get(name)
+        if not prev or 'seconds_min' not in cur or 'seconds_min' not in prev:
+            continue
+        ratio = cur['seconds_min'] / prev['seconds_min'] if prev['seconds_min'] else float('nan')
+        lines.append(f"  {name:<22} {prev['seconds_min']:9.4f}s → {cur['seconds_min']:9.4f}s  x{ratio:.2f}")
+    return lines
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--seconds', type=float, default=300, help='合成会議音声の長さ (秒)')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--drift-ppm', type=float, default=150.0, help='スピーカー側のクロックドリフト')
+    ap.add_argument('--offset-ms', type=float, default=120.0, help='スピーカー側の開始オフセット')
+    ap.add_argument('--chunk-seconds', type=int, default=30)
+    ap.add_argument('--overlap-seconds', type=float, default=2.0)
+    ap.add_argument('--batch-size', type=int, default=1)
+    ap.add_argument('--only', nargs='+', choices=['split', 'mix', 'waveform', 'report'],
+                    help='実行するベンチマークを限定')
+    ap.add_argument('--out', help='結果 JSON の出力先')
+    ap.add_argument('--compare', help='比較対象の前回結果 JSON')
+    args = ap.parse_args(argv)
+
+    selected = set(args.only or ['split', 'mix', 'waveform', 'report'])
+    work = tempfile.mkdtemp(prefix='amr_bench_')
+    try:
+        mic, spk = synthetic.meeting(args.seconds, RATE, args.seed)
+        wav = os.path.join(work, 'meeting.wav')
+        synthetic.write_wav(wav, np.clip(mic + spk, -1, 1), RATE)
+        results = {}
+        if 'split' in selected:
+            results.update(bench_split(work, wav, args.repeat))
+        if 'mix' in selected:
+            results.update(bench_mix(work, mic, spk, args.drift_ppm, args.offset_ms, args.repeat))
+        if 'waveform' in selected:
+            results.update(bench_waveform(mic, spk, args.repeat))
+        if 'report' in selected:
+            results.update(bench_report(work, wav, args.repeat, args.chunk_seconds, args.overlap_seconds,
+                                        args.batch_size))
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'audio_seconds': args.seconds,
+            'seed': args.seed,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            for line in compare(report, json.load(f)):
+                print(line, file=sys.stderr)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
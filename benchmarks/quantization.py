@@ -0,0 +1,120 @@
+"""Whisper 動的 int8 量子化の速度/精度比較
+
+サンプルディレクトリ内の WAV を fp32 と int8 (quantize=True) の両方で文字起こしし、
+モデルロード時間・実時間係数 (RTF)・文字誤り率 (CER) を JSON で出力する。
+int8 のロード時間は量子化キャッシュ無し (fp32 ロード + 量子化 + 保存) と有り (キャッシュから組み立て) の両方を測る。
+
+    python -m benchmarks.quantization --samples path/to/samples --model small --lang ja
+
+サンプルは `xxx.wav` と同名の正解テキスト `xxx.txt` (任意) の組。正解が無い場合は
+fp32 の出力を基準として int8 の CER (= fp32 との差分) を算出する。
+音声サンプルはリポジトリに同梱していないため、社内の評価用音声を指定すること。
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+from src import asr_backend
+
+
+def char_error_rate(ref: str, hyp: str) -> float:
+    """空白を除いた文字単位の編集距離 / 正解文字数"""
+    r = ''.join(ref.split())
+    h = ''.join(hyp.split())
+    if not r:
+        return 0.0 if not h else 1.0
+    prev = list(range(len(h) + 1))
+    for i, rc in enumerate(r, 1):
+        cur = [i] + [0] * len(h)
+        for j, hc in enumerate(h, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (rc != hc))
+        prev = cur
+    return prev[-1] / len(r)
+
+
+def int8_load_seconds(model_size):
+    """int8 のロード時間 {'cold': キャッシュ無し, 'warm': キャッシュ有り} (既存のキャッシュは作り直す)"""
+    path = asr_backend.WhisperBackend(model_size, quantize=True).quantized_cache_path()
+    if os.path.exists(path):
+        os.remove(path)
+    times = {}
+    for key in ('cold', 'warm'):
+        start = time.perf_counter()
+        if not asr_backend.WhisperBackend(model_size, logger=print, quantize=True).load():
+            raise SystemExit('Whisper モデルを読み込めませんでした')
+        times[key] = time.perf_counter() - start
+    return times
+
+
+def _run(samples, model_size, lang, quantize):
+    start = time.perf_counter()
+    engine = asr_backend.get_backend('whisper', model_size, logger=print, quantize=quantize)
+    load_seconds = time.perf_counter() - start
+    if engine is None:
+        raise SystemExit('Whisper モデルを読み込めませんでした')
+    outputs = {}
+    total_audio = 0.0
+    total_time = 0.0
+    for wav in samples:
+        audio = asr_backend.load_audio(wav)
+        start = time.perf_counter()
+        segments = engine.transcribe_array(audio, lang=lang)
+        elapsed = time.perf_counter() - start
+        total_audio += len(audio) / asr_backend.SAMPLE_RATE
+        total_time += elapsed
+        outputs[wav] = asr_backend.segments_to_text(segments)
+    return {
+        'load_seconds': load_seconds,
+        'transcribe_seconds': total_time,
+        'rtf': total_time / total_audio if total_audio else None,
+    }, outputs
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--samples', required=True, help='WAV (+ 同名 .txt 正解) を置いたディレクトリ')
+    ap.add_argument('--model', default='small')
+    ap.add_argument('--lang', default='ja')
+    ap.add_argument('--out', help='結果 JSON の出力先')
+    args = ap.parse_args(argv)
+
+    samples = sorted(glob.glob(os.path.join(args.samples, '*.wav')))
+    if not samples:
+        raise SystemExit(f'WAV が見つかりません: {args.samples}')
+    refs = {}
+    for wav in samples:
+        txt = os.path.splitext(wav)[0] + '.txt'
+        if os.path.exists(txt):
+            with open(txt, encoding='utf-8') as f:
+                refs[wav] = f.read()
+
+    fp32, fp32_out = _run(samples, args.model, args.lang, quantize=False)
+    int8_load = int8_load_seconds(args.model)
+    int8, int8_out = _run(samples, args.model, args.lang, quantize=True)
+    int8['load_seconds_cold'] = int8_load['cold']
+    int8['load_seconds_warm'] = int8_load['warm']
+    for stats, outputs in ((fp32, fp32_out), (int8, int8_out)):
+        cers = [char_error_rate(refs.get(w, fp32_out[w]), outputs[w]) for w in samples]
+        stats['cer'] = sum(cers) / len(cers)
+    result = {
+        'model': args.model,
+        'samples': len(samples),
+        'reference': 'text' if len(refs) == len(samples) else 'fp32_output',
+        'fp32': fp32,
+        'int8': int8,
+        'speedup': fp32['transcribe_seconds'] / int8['transcribe_seconds'] if int8['transcribe_seconds'] else None,
+        'cer_delta': int8['cer'] - fp32['cer'],
+        'quantized_cache': asr_backend.WhisperBackend(args.model, quantize=True).quantized_cache_path(),
+    }
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""HTTP ジョブ API (src.server) の同時クライアント スループット
+
+合成会議音声 (benchmarks.synthetic) をクライアント数分の並列スレッドからアップロードし、
+完了までポーリングして文字起こしを取得するまでを 1 ジョブとして、ワーカー数別に
+ジョブ/秒・ジョブ毎の所要時間 (p50 / p95) を JSON で出力する。
+サーバは同じプロセス内で 127.0.0.1 の空きポートに立てる。音声デバイス・GPU・ネットワークは不要。
+
+ - ASR はスタブ (VAD の発話区間をセグメントにする) で、音声長 × --rtf だけ待つ。
+   推論は実モデルと同じく AsrBackend.lock で直列化される
+ - 要約はローカル抜粋 (オフライン) に --summary-latency 秒の待ちを足して外部 API を模擬する
+
+    python -m benchmarks.server_throughput --clients 8 --jobs-per-client 2 --workers 1 2 4
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from src import asr_backend, rolling_summary, server, sound_control
+from src.setting import AppSettings
+
+from benchmarks import synthetic
+
+RATE = 16000
+
+
+class SleepStubBackend(asr_backend.AsrBackend):
+    """音声長 × rtf 秒かかる ASR スタブ"""
+    name = 'bench-sleep'
+    rtf = 0.05
+
+    def load(self):
+        return True
+
+    def transcribe_array(self, audio, lang='ja', **kwargs):
+        time.sleep(len(audio) / asr_backend.SAMPLE_RATE * self.rtf)
+        regions = sound_control.speech_regions(audio, asr_backend.SAMPLE_RATE)
+        return [asr_backend.make_segment(s / asr_backend.SAMPLE_RATE, e / asr_backend.SAMPLE_RATE,
+                                         f"発話 {i}", -0.3, 0.01)
+                for i, (s, e) in enumerate(regions)]
+
+    def detect_language(self, audios):
+        return {'ja': 1.0}
+
+
+def _slow_summarizer(latency):
+    local = rolling_summary.local_summarize
+
+    def summarize(prompt, text):
+        time.sleep(latency)
+        return local(prompt, text)
+    return summarize
+
+
+def run_clients(base_url, wav, clients, jobs_per_client):
+    """clients 個のスレッドが順にジョブを投入・完了待ち・取得する。ジョブ毎の所要時間 (秒) を返す"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(jobs_per_client):
+            start = time.perf_counter()
+            try:
+                job = server.submit_file(base_url, wav)
+                job = server.wait_job(base_url, job['id'], interval=0.05)
+                if job['state'] != 'done':
+                    raise RuntimeError(job.get('error'))
+                server.fetch_output(base_url, job['id'], 'transcript')
+                server.fetch_output(base_url, job['id'], 'summary')
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors
+
+
+def bench_workers(work, wav, audio_seconds, workers, args):
+    settings = AppSettings(asr_backend=SleepStubBackend.name, whisper_model='stub', meeting_db='',
+                           metrics_jsonl='', rolling_summary_seconds=args.rolling_seconds)
+    manager = server.JobManager(os.path.join(work, f"jobs_{workers}"), settings, workers=workers,
+                                max_queue=args.clients * args.jobs_per_client, chunk_seconds=args.chunk_seconds)
+    manager.warm()
+    httpd = server.make_server(manager, '127.0.0.1', 0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        start = time.perf_counter()
+        latencies, errors = run_clients(f"http://127.0.0.1:{httpd.server_address[1]}", wav,
+                                        args.clients, args.jobs_per_client)
+        wall = time.perf_counter() - start
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        manager.shutdown()
+    done = len(latencies)
+    return {
+        'workers': workers,
+        'jobs': done,
+        'errors': errors[:5],
+        'wall_seconds': round(wall, 3),
+        'jobs_per_second': round(done / wall, 3) if wall else None,
+        'audio_x_realtime': round(done * audio_seconds / wall, 1) if wall else None,
+        'latency_p50': round(float(np.percentile(latencies, 50)), 3) if latencies else None,
+        'latency_p95': round(float(np.percentile(latencies, 95)), 3) if latencies else None,
+        'latency_max': round(max(latencies), 3) if latencies else None,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--seconds', type=float, default=120, help='1 ジョブの合成会議音声の長さ (秒)')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--clients', type=int, default=8, help='同時クライアント数')
+    ap.add_argument('--jobs-per-client', type=int, default=2)
+    ap.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='比較するワーカー数')
+    ap.add_argument('--chunk-seconds', type=int, default=30)
+    ap.add_argument('--rtf', type=float, default=0.05, help='スタブ ASR の実時間比')
+    ap.add_argument('--summary-latency', type=float, default=0.5, help='要約 1 回の模擬待ち時間 (秒)')
+    ap.add_argument('--rolling-seconds', type=float, default=600, help='途中要約の更新間隔 (秒)')
+    ap.add_argument('--out', help='結果 JSON の出力先')
+    args = ap.parse_args(argv)
+
+    SleepStubBackend.rtf = args.rtf
+    asr_backend.register_backend(SleepStubBackend)
+    rolling_summary.local_summarize = _slow_summarizer(args.summary_latency)
+    work = tempfile.mkdtemp(prefix='amr_bench_')
+    try:
+        mic, spk = synthetic.meeting(args.seconds, RATE, args.seed)
+        wav = os.path.join(work, 'meeting.wav')
+        synthetic.write_wav(wav, np.clip(mic + spk, -1, 1), RATE)
+        results = [bench_workers(work, wav, args.seconds, w, args) for w in args.workers]
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'audio_seconds': args.seconds,
+            'clients': args.clients,
+            'jobs_per_client': args.jobs_per_client,
+            'rtf': args.rtf,
+            'summary_latency': args.summary_latency,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
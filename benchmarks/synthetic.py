@@ -0,0 +1,78 @@
+"""ベンチマーク用の合成会議音声
+
+音声デバイス・ネットワーク無しで再現可能な入力を作る。
+
+ - 発話: 基本周波数 100〜240 Hz の倍音列を音節 (約 4 Hz) の包絡で変調し、息ノイズを加えたバースト
+ - 無音: 発話間に 0.3〜2 秒 (低レベルの暗騒音のみ)
+ - 2 チャンネル: マイク (自分) とスピーカー (相手) が交互に話す。スピーカー側は
+   開始オフセットとクロックドリフト (ppm) を持ち、録音と同じ (ブロック, ADC 時刻) の組で返す
+"""
+
+from typing import List, Tuple
+import wave
+
+import numpy as np
+
+from src import sound_control
+
+
+def speech_burst(rng: np.random.Generator, seconds: float, rate: int) -> np.ndarray:
+    n = int(seconds * rate)
+    t = np.arange(n) / rate
+    f0 = rng.uniform(100, 240) * (1 + 0.05 * np.sin(2 * np.pi * rng.uniform(0.5, 2) * t))
+    phase = 2 * np.pi * np.cumsum(f0) / rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    syllables = np.clip(np.sin(2 * np.pi * rng.uniform(3, 5) * t + rng.uniform(0, np.pi)), 0, None) ** 0.7
+    audio = voiced * syllables + 0.3 * rng.standard_normal(n) * syllables
+    edge = min(int(0.02 * rate), n // 2)
+    if edge:
+        ramp = np.linspace(0, 1, edge)
+        audio[:edge] *= ramp
+        audio[-edge:] *= ramp[::-1]
+    return (audio / (np.abs(audio).max() + 1e-9) * rng.uniform(0.2, 0.6)).astype(np.float32)
+
+
+def meeting(seconds: float, rate: int = 16000, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """(マイク, スピーカー) の float32 配列 (同じ長さ、名目クロック) を返す"""
+    rng = np.random.default_rng(seed)
+    n = int(seconds * rate)
+    mic = (0.002 * rng.standard_normal(n)).astype(np.float32)
+    spk = (0.002 * rng.standard_normal(n)).astype(np.float32)
+    pos = int(rng.uniform(0.2, 1.0) * rate)
+    turn = 0
+    while pos < n:
+        burst = speech_burst(rng, rng.uniform(1.0, 4.0), rate)[:n - pos]
+        (mic if turn == 0 else spk)[pos:pos + len(burst)] += burst
+        pos += len(burst) + int(rng.uniform(0.3, 2.0) * rate)
+        # 同じ話者が続くこともある
+        if rng.random() < 0.7:
+            turn ^= 1
+    return mic, spk
+
+
+def apply_drift(audio: np.ndarray, drift_ppm: float) -> np.ndarray:
+    """クロックが drift_ppm だけ速い機器で録った場合のサンプル列 (線形補間)"""
+    if not drift_ppm:
+        return audio
+    n = int(len(audio) * (1 + drift_ppm * 1e-6))
+    src = np.arange(n) / (1 + drift_ppm * 1e-6)
+    return np.interp(src, np.arange(len(audio)), audio).astype(np.float32)
+
+
+def to_blocks(audio: np.ndarray, rate: int, block: int, start_time: float, drift_ppm: float = 0.0,
+              dtype: str = 'int16') -> Tuple[List[np.ndarray], List[Tuple[np.ndarray, np.ndarray]]]:
+    """録音スレッドと同じ形 (ブロックのリスト, [(先頭サンプル番号, ADC 時刻)]) へ変換"""
+    data = sound_control.to_int16(audio) if dtype == 'int16' else audio
+    frames = [data[i:i + block].reshape(-1, 1) for i in range(0, len(data), block)]
+    idx = np.arange(0, len(data), block, dtype=np.int64)
+    # 機器クロックが drift_ppm 速い → 同じサンプル数を短い実時間で刻む
+    t = start_time + idx / (rate * (1 + drift_ppm * 1e-6))
+    return frames, [(idx, t)]
+
+
+def write_wav(path: str, audio: np.ndarray, rate: int = 16000):
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(sound_control.to_int16(audio).tobytes())
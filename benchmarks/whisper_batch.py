@@ -0,0 +1,81 @@
+"""Whisper バッチ推論のスループット比較
+
+チャンク毎の transcribe_audio_whisper ループと、transcribe_batch_whisper の
+バッチサイズ別の処理時間を計測して JSON で出力する。
+
+    python -m benchmarks.whisper_batch --wav meeting.wav --chunk-seconds 30 --batch-sizes 1 2 4 8
+
+--wav を省略した場合は合成音声 (トーン + ノイズ) を使う。テキストの中身は無意味だが
+エンコーダ/デコーダのスループット比較には十分。
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from src import ai_control, sound_control
+
+
+def _synthetic_wav(path, seconds, rate=16000):
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * rate)) / rate
+    audio = 0.2 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 0.5 * t) > 0)
+    audio += 0.02 * rng.standard_normal(len(t))
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(sound_control.to_int16(audio.astype(np.float32)).tobytes())
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--wav', help='入力 WAV (16kHz 推奨)。省略時は合成音声')
+    ap.add_argument('--seconds', type=float, default=240, help='合成音声の長さ (秒)')
+    ap.add_argument('--chunk-seconds', type=int, default=30)
+    ap.add_argument('--model', default='small')
+    ap.add_argument('--lang', default='ja')
+    ap.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8])
+    ap.add_argument('--out', help='結果 JSON の出力先 (省略時は標準出力のみ)')
+    args = ap.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix='amr_bench_')
+    wav = args.wav
+    if not wav:
+        wav = os.path.join(work, 'synthetic.wav')
+        _synthetic_wav(wav, args.seconds)
+    chunks = sound_control.split_audio_by_time(wav, os.path.join(work, 'chunks'), args.chunk_seconds)
+    data, rate = sound_control.read_wav_int16(wav)
+    audio_seconds = len(data) / rate
+
+    # モデルロード時間は計測から除外
+    ai_control.preload_models(whisper_model=args.model)
+
+    results = {'audio_seconds': audio_seconds, 'chunks': len(chunks), 'model': args.model, 'runs': []}
+    start = time.perf_counter()
+    for f in chunks:
+        ai_control.transcribe_audio_whisper(f, lang=args.lang, model_size=args.model)
+    elapsed = time.perf_counter() - start
+    results['runs'].append({'mode': 'per_chunk', 'seconds': elapsed, 'rtf': elapsed / audio_seconds})
+    for bs in args.batch_sizes:
+        start = time.perf_counter()
+        ai_control.transcribe_batch_whisper(chunks, lang=args.lang, model_size=args.model, batch_size=bs)
+        elapsed = time.perf_counter() - start
+        results['runs'].append({'mode': 'batch', 'batch_size': bs, 'seconds': elapsed, 'rtf': elapsed / audio_seconds})
+    base = results['runs'][0]['seconds']
+    for r in results['runs']:
+        r['speedup'] = base / r['seconds'] if r['seconds'] > 0 else None
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+
+if __name__ == '__main__':
+    main()
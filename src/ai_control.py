@@ -5,31 +5,45 @@
  - 音声ファイル不存在/空コンテンツ検出
  - Gemini要約時の API キー未設定 / ネットワーク / レート制限 / 一般例外捕捉
  - 失敗時に処理継続 (文字起こし成功→要約失敗 など) を許容し構造化結果を返却
- - Whisperモデルはキャッシュしループ毎の再ロードを防止
+ - 文字起こしエンジンは asr_backend 経由 (既定 openai-whisper、faster-whisper 等を選択可)
+ - モデルはバックエンド側でキャッシュしループ毎の再ロードを防止
+ - 複数チャンクを 30 秒窓のバッチにまとめて推論する経路 (transcribe_batch_whisper)
+ - 長時間録音は一定間隔毎に途中要約を更新し、最終要約をその統合にする (rolling_summary)
+ - FLAC / Opus アーカイブ (audio_archive) は必要な区間だけをデコードして処理する
+ - 結果は会議アーカイブ (meeting_store, SQLite 全文検索) へ登録できる
+ - 16kHz 以外の録音は分割前に 1 回だけリサンプルし (preprocess)、DC 除去・音量正規化もそこで行う
+ - マイク / スピーカーを別チャンネルのまま発話区間だけ文字起こしし、話者 local / remote 付きで統合できる
 """
 
-from typing import Callable, List, Dict, Optional
+from contextlib import nullcontext
+from dataclasses import dataclass, replace
+from typing import Callable, Iterable, List, Dict, Optional, Union
+import bisect
 import os
 import time
+import numpy as np
 
 try:
     import google.generativeai as genai
 except Exception:  # ライブラリ未インストールや読み込み失敗
     genai = None  # 後でチェック
 
-try:
-    import whisper
-except Exception:
-    whisper = None
-
 from . import sound_control
+from . import asr_backend
+from . import model_policy
+from . import transcript_export
+from . import rolling_summary
+from . import audio_archive
+from . import meeting_store
+from . import preprocess
+from .metrics import PipelineMetrics
+from .asr_backend import DEFAULT_BACKEND, segments_to_text
 
 WhisperLogger = Callable[[str], None]
 
-_WHISPER_MODEL_CACHE = {
-    "name": None,
-    "model": None
-}
+CHANNEL_SPEAKERS = ('local', 'remote')  # チャンネル別 WAV の L (マイク) / R (スピーカー)
+CHANNEL_PACK_GAP_SECONDS = 0.5          # 発話区間を詰めて 1 回の文字起こしにまとめる際に挟む無音
+PREPARED_WAV = '_prepared.wav'          # 前処理 (リサンプル等) 結果の一時ファイル (chunk_dir 内)
 
 def _log(logger: Optional[WhisperLogger], msg: str):
     if logger:
@@ -38,36 +52,25 @@ def _log(logger: Optional[WhisperLogger], msg: str):
         except Exception:
             pass
 
-def _load_whisper(model_size: str, logger: Optional[WhisperLogger]):
-    """Whisperモデルをキャッシュ付きでロード"""
-    if whisper is None:
-        _log(logger, "Whisperライブラリが読み込めなかったため文字起こしをスキップします")
-        return None
-    if _WHISPER_MODEL_CACHE["model"] is not None and _WHISPER_MODEL_CACHE["name"] == model_size:
-        return _WHISPER_MODEL_CACHE["model"]
-    try:
-        _log(logger, f"Whisperモデル '{model_size}' を読み込み中…")
-        model = whisper.load_model(model_size)
-        _WHISPER_MODEL_CACHE["name"] = model_size
-        _WHISPER_MODEL_CACHE["model"] = model
-        _log(logger, "Whisperモデル読み込み完了")
-        return model
-    except Exception as e:
-        _log(logger, f"Whisperモデル読み込み失敗: {e}")
-        return None
+def _get_engine(backend: str, model_size: str, logger: Optional[WhisperLogger], asr_options: Optional[dict]):
+    """ASRバックエンドをキャッシュ付きで取得 (ロード失敗時 None)"""
+    return asr_backend.get_backend(backend, model_size, logger=logger, **(asr_options or {}))
 
-def preload_models(logger: Optional[WhisperLogger]=None, whisper_model: str="small"):
+def preload_models(logger: Optional[WhisperLogger]=None, whisper_model: str="small",
+                   backend: str=DEFAULT_BACKEND, asr_options: Optional[dict]=None):
     """起動時の事前ロード用ユーティリティ
 
     メインGUI表示前に呼び出して重いモデルの遅延をスプラッシュ中に吸収。
     Whisperが無い場合は黙ってスキップ。
     """
-    _load_whisper(whisper_model, logger)
+    _get_engine(backend, whisper_model, logger, asr_options)
 
 def summarize_minutes_gemini(prompt: str, text: str, gemini_api_key: str, logger: Optional[WhisperLogger]=None,
-                              model_name: str='gemini-2.0-flash-lite', max_retry: int = 2, retry_wait: float = 3.0) -> str:
+                              model_name: str='gemini-2.0-flash-lite', max_retry: int = 2, retry_wait: float = 3.0,
+                              metrics: Optional[PipelineMetrics]=None) -> str:
     """Gemini APIを使った要約 (例外安全)
 
+    metrics を渡すと試行毎の API 応答時間 (gemini_request) と試行/失敗回数を記録する
     Returns: 要約文字列 (失敗時はエラーメッセージ含む簡易メッセージ)
     """
     if not gemini_api_key:
@@ -85,9 +88,14 @@ def summarize_minutes_gemini(prompt: str, text: str, gemini_api_key: str, logger
     full_prompt = prompt + text
     last_err = None
     for attempt in range(1, max_retry+2):  # 初回 + リトライ回数
+        if metrics is not None:
+            metrics.count('gemini_attempts')
         try:
             model = genai.GenerativeModel(model_name)
+            request_start = time.perf_counter()
             response = model.generate_content(full_prompt)
+            if metrics is not None:
+                metrics.add('gemini_request', time.perf_counter() - request_start, attempt=attempt)
             # APIは成功だが text が無いケース
             summary_text = getattr(response, 'text', None)
             if not summary_text:
@@ -95,6 +103,8 @@ def summarize_minutes_gemini(prompt: str, text: str, gemini_api_key: str, logger
             return summary_text
         except Exception as e:
             last_err = e
+            if metrics is not None:
+                metrics.count('gemini_failures')
             _log(logger, f"Gemini要約失敗 (試行{attempt}): {e}")
             if attempt <= max_retry:
                 time.sleep(retry_wait)
@@ -103,85 +113,451 @@ def summarize_minutes_gemini(prompt: str, text: str, gemini_api_key: str, logger
     return f"(要約失敗: {last_err})"
 
 def transcribe_audio_whisper(file_path: str, lang: str="ja", model_size: str="small", logger: Optional[WhisperLogger]=None,
-                             **whisper_kwargs) -> str:
+                             backend: str=DEFAULT_BACKEND, asr_options: Optional[dict]=None, **whisper_kwargs) -> str:
     """Whisperで文字起こし (例外安全)
 
+    backend で ASR エンジン ('whisper' / 'faster-whisper' など) を選択できる。
     whisper_kwargs に transcribe の追加パラメータ (temperature など) を渡せる
     Returns: テキスト (失敗時はエラーメッセージを括弧付きで返却)
     """
     if not os.path.exists(file_path):
         _log(logger, f"音声ファイルが存在しません: {file_path}")
         return "(文字起こし失敗: ファイルなし)"
-    model = _load_whisper(model_size, logger)
-    if model is None:
+    engine = _get_engine(backend, model_size, logger, asr_options)
+    if engine is None:
         return "(文字起こし失敗: Whisperモデル未ロード)"
     try:
-        result = model.transcribe(file_path, language=lang, **whisper_kwargs)
-        if "segments" in result:
-            text = "\n".join(seg.get("text", "").strip() for seg in result["segments"]) or "(空)"
-        else:
-            text = result.get("text", "") or "(空)"
-        return text
+        segments = engine.transcribe_file(file_path, lang=lang, **whisper_kwargs)
+        return segments_to_text(segments) or "(空)"
     except Exception as e:
         _log(logger, f"Whisper文字起こし失敗: {e}")
         return f"(文字起こし失敗: {e})"
 
+def transcribe_segments_whisper(file_path: str, lang: str="ja", model_size: str="small",
+                                logger: Optional[WhisperLogger]=None, backend: str=DEFAULT_BACKEND,
+                                asr_options: Optional[dict]=None, **whisper_kwargs) -> List[dict]:
+    """Whisperで文字起こしし、タイムスタンプ付きセグメントを返す (例外安全)
+
+    Returns: [{'start', 'end', 'text', 'avg_logprob', 'no_speech_prob'}, ...] (失敗時は空リスト)
+    """
+    if not os.path.exists(file_path):
+        _log(logger, f"音声ファイルが存在しません: {file_path}")
+        return []
+    engine = _get_engine(backend, model_size, logger, asr_options)
+    if engine is None:
+        return []
+    try:
+        with _engine_lock(engine):
+            return engine.transcribe_file(file_path, lang=lang, **whisper_kwargs)
+    except Exception as e:
+        _log(logger, f"Whisper文字起こし失敗: {e}")
+        return []
+
+def _engine_lock(engine):
+    """共有モデルの推論を直列化するロック (HTTP サーバの複数ワーカーから同じモデルを使う場合)"""
+    return getattr(engine, 'lock', None) or nullcontext()
+
+def _iter_transcriptions(engine, inputs: List[Union[str, np.ndarray]], lang: str, batch_size: int,
+                         logger: Optional[WhisperLogger]):
+    """チャンクを順に文字起こしし、完了したチャンクから dict を yield する
+
+    batch_size > 1 の場合は batch_size チャンクずつ transcribe_batch へまとめて渡す。
+    yield: {'index', 'segments', 'error', 'audio_seconds', 'speech_seconds', 'elapsed'}
+    """
+    group = max(batch_size, 1)
+    for g in range(0, len(inputs), group):
+        items = []
+        for idx in range(g, min(g + group, len(inputs))):
+            item = {'index': idx, 'segments': [], 'error': None, 'audio_seconds': 0.0,
+                    'speech_seconds': 0.0, 'elapsed': 0.0, 'audio': None}
+            src = inputs[idx]
+            try:
+                if isinstance(src, str):
+                    if not os.path.exists(src):
+                        _log(logger, f"音声ファイルが存在しません: {src}")
+                        item['error'] = "(文字起こし失敗: ファイルなし)"
+                        items.append(item)
+                        continue
+                    audio = asr_backend.load_audio(src)
+                else:
+                    audio = sound_control.to_float32(np.asarray(src).reshape(-1))
+                item['audio'] = audio
+                item['audio_seconds'] = len(audio) / asr_backend.SAMPLE_RATE
+                item['speech_seconds'] = sound_control.speech_seconds(audio, asr_backend.SAMPLE_RATE)
+            except Exception as e:
+                _log(logger, f"音声読み込み失敗: {e}")
+                item['error'] = f"(文字起こし失敗: {e})"
+            items.append(item)
+        ready = [it for it in items if it['audio'] is not None]
+        if ready:
+            start = time.perf_counter()
+            try:
+                with _engine_lock(engine):
+                    if len(ready) == 1 and group == 1:
+                        outputs = [engine.transcribe_array(ready[0]['audio'], lang=lang)]
+                    else:
+                        outputs = engine.transcribe_batch([it['audio'] for it in ready], lang=lang,
+                                                          batch_size=batch_size)
+                for it, segments in zip(ready, outputs):
+                    it['segments'] = segments
+            except Exception as e:
+                _log(logger, f"Whisper文字起こし失敗: {e}")
+                for it in ready:
+                    it['error'] = f"(文字起こし失敗: {e})"
+            elapsed = time.perf_counter() - start
+            total_audio = sum(it['audio_seconds'] for it in ready) or 1.0
+            for it in ready:
+                # バッチ処理時間は音声長で按分
+                it['elapsed'] = elapsed * it['audio_seconds'] / total_audio
+        for it in items:
+            it.pop('audio', None)
+            yield it
+
+def detect_language_once(engine, voice: str, logger: Optional[WhisperLogger]=None, samples: int=3,
+                         default: str='ja', data: Optional[np.ndarray]=None, rate: Optional[int]=None) -> str:
+    """録音全体から発話の多い 30 秒窓を samples 個選び、言語判定を 1 回だけ行う
+
+    判定できない場合は default を返す。結果は全チャンクで固定して使う
+    (チャンク毎の自動判定によるデコーダ追加パスを避ける)。
+    data/rate に読み込み済みの int16 配列 (または audio_archive.AudioSource) を渡すと WAV を読み直さない。
+    """
+    windows = []
+    try:
+        if data is None:
+            data, rate = sound_control.read_wav_int16(voice)
+        if rate != asr_backend.SAMPLE_RATE:
+            audio = asr_backend.load_audio(voice)
+            data, rate = audio, asr_backend.SAMPLE_RATE
+        if isinstance(data, audio_archive.AudioSource):
+            # アーカイブは索引から窓を選び、その区間だけデコードする
+            windows = data.dense_speech_windows(asr_backend.WINDOW_SECONDS, samples)
+        else:
+            windows = sound_control.dense_speech_windows(data, rate, asr_backend.WINDOW_SECONDS, samples)
+        with _engine_lock(engine):
+            probs = engine.detect_language([sound_control.to_float32(data[s:e]) for s, e in windows])
+    except Exception as e:
+        _log(logger, f"言語判定失敗: {e}")
+        probs = None
+    if not probs:
+        _log(logger, f"言語を判定できなかったため '{default}' を使用します")
+        return default
+    lang = max(probs, key=probs.get)
+    _log(logger, f"言語判定: {lang} (確率 {probs[lang]:.2f}, {len(windows)} 区間)")
+    return lang
+
+def _chunk_text(item: dict) -> str:
+    if item['error']:
+        return item['error']
+    return segments_to_text(item['segments']) or "(空)"
+
+def transcribe_batch_whisper(inputs: List[Union[str, np.ndarray]], lang: str="ja", model_size: str="small",
+                             batch_size: int = 8, logger: Optional[WhisperLogger]=None,
+                             backend: str=DEFAULT_BACKEND, asr_options: Optional[dict]=None) -> List[str]:
+    """複数チャンクをまとめて文字起こし (例外安全)
+
+    バックエンドの transcribe_batch を使う。whisper バックエンドでは各チャンクを 30 秒窓に区切り、
+    全窓の log-mel を一括計算してから batch_size 窓ずつエンコーダ/デコーダへ通す。
+    Returns: 入力順のテキストリスト (失敗時は各要素がエラーメッセージ)
+    """
+    if not inputs:
+        return []
+    engine = _get_engine(backend, model_size, logger, asr_options)
+    if engine is None:
+        return ["(文字起こし失敗: Whisperモデル未ロード)"] * len(inputs)
+    # 全チャンクを 1 グループとして渡し、窓単位のバッチを最大化する
+    items = list(_iter_transcriptions(engine, inputs, lang, len(inputs) if batch_size > 1 else 1, logger))
+    return [_chunk_text(it) for it in items]
+
+@dataclass
+class PipelineOptions:
+    """create_meeting_report の処理オプション (既定値は従来どおりの逐次処理)
+
+    AppSettings からは PipelineOptions.from_settings で作る。
+    """
+    batch_size: int = 1                          # > 1 でチャンクを batch_size 個ずつまとめて推論
+    asr_backend_name: str = DEFAULT_BACKEND      # 文字起こしエンジン (asr_backend.BACKENDS)
+    asr_options: Optional[dict] = None           # エンジンへの追加オプション
+    # whisper_model='auto' の目標処理時間。retranscribe_low_confidence=True なら低確信度チャンクを
+    # 残り時間の範囲で一段大きいモデルで再文字起こしする
+    deadline_seconds: float = 1800
+    retranscribe_low_confidence: bool = False
+    # > 0 でチャンク境界の前後を重ねて分割し、セグメントのタイムスタンプで重複を除いて連結する
+    overlap_seconds: float = 0.0
+    # out_voice_text と並べて書き出すタイムスタンプ付き形式 (None: srt / vtt / json)。チャンク完了毎に追記
+    transcript_formats: Optional[List[str]] = None
+    metrics_jsonl: Optional[str] = None          # 工程別計測を JSON Lines で追記するファイル
+    # > 0 で録音のその秒数分の文字起こしが進む毎に途中要約を更新し、最終要約は途中要約と残りの統合で作る
+    rolling_summary_seconds: float = 0
+    meeting_db: Optional[str] = None             # 会議アーカイブ (SQLite) へ登録する場合のパス
+    # チャンネル別 WAV (sound_control.channels_path) があればチャンネル毎に発話区間だけを文字起こしし、
+    # 話者 ('speaker': local / remote) 付きで時刻順に統合する (無ければミックスで処理)
+    separate_channels: bool = False
+    # 分割前の DC 除去 / 発話平均レベルの正規化目標 (dBFS)。16kHz 以外の録音はここで 1 回だけリサンプルする
+    remove_dc: bool = False
+    normalize_dbfs: Optional[float] = None
+    # True で全セグメントを result['segments'] に入れて返す (既定は件数だけ。セグメントは JSON 出力にある)
+    return_segments: bool = False
+    # 要約関数 (prompt, text) → 要約。指定時は Gemini の代わりに途中要約・最終要約で使う
+    summarizer: Optional[Callable[[str, str], str]] = None
+
+    @classmethod
+    def from_settings(cls, settings, **overrides) -> 'PipelineOptions':
+        """AppSettings から作る (overrides で個別に上書き)"""
+        options = cls(
+            batch_size=settings.whisper_batch_size,
+            asr_backend_name=settings.asr_backend,
+            asr_options=settings.asr_options(),
+            deadline_seconds=settings.deadline_seconds,
+            retranscribe_low_confidence=settings.retranscribe_low_confidence,
+            overlap_seconds=settings.chunk_overlap_seconds,
+            transcript_formats=settings.transcript_formats,
+            metrics_jsonl=settings.metrics_jsonl or None,
+            rolling_summary_seconds=settings.rolling_summary_seconds,
+            meeting_db=settings.meeting_db or None,
+            separate_channels=settings.separate_channels,
+            remove_dc=settings.remove_dc,
+            normalize_dbfs=settings.normalize_dbfs,
+        )
+        return replace(options, **overrides)
+
 def create_meeting_report(prompt: str, voice: str, chunk_dir: str, split_seconds: int,
                           out_voice_text: str, gemini_key: str, logger: Optional[WhisperLogger]=None,
-                          lang: str="ja", whisper_model: str="small") -> Dict[str, Optional[str]]:
+                          lang: str="ja", whisper_model: str="small", options: Optional[PipelineOptions]=None,
+                          progress: Optional[Callable[[int, int], None]]=None) -> Dict[str, object]:
     """議事録作成統合処理 (例外安全)
 
+    lang='auto' (または None) の場合は録音全体で 1 回だけ言語判定し、全チャンクに固定する。
+    whisper_model='auto' の場合は VAD 後の発話時間と実測 RTF から deadline_seconds 内に終わる最大のモデルを選ぶ。
+    voice に FLAC / Opus アーカイブ (audio_archive) を渡すと、チャンク毎の区間だけをデコードする。
+    その他の処理は options (PipelineOptions) で指定する。
+    progress を指定するとチャンク完了毎に progress(完了チャンク数, 全チャンク数) を呼ぶ
+    セグメントは書き出しの後は保持しない (再文字起こし・チャンネル別の並べ直しで必要な場合を除く)。
+    会議アーカイブへは JSON 出力から読み戻して登録する。一括要約 (rolling_summary_seconds=0) は
+    要約 API へ全文を 1 回で送るため、要約する場合 (Gemini / summarizer) に限り文字起こし全体を読み込む
+
     Returns:
         dict: {
             'success': bool,
             'transcription_file': str | None,
             'summary_file': str | None,
+            'segments': list (録音先頭からの秒でのセグメント。return_segments=True の場合のみ),
+            'segment_count': int,
+            'subtitle_files': dict (形式 → パス),
+            'metrics': dict (PipelineMetrics.summary),
             'error': str | None
         }
     """
+    opts = options or PipelineOptions()
     start_time = time.time()
+    metrics = PipelineMetrics(opts.metrics_jsonl)
     _log(logger, "議事録作成処理開始")
-    result: Dict[str, Optional[str]] = {
+    result: Dict[str, object] = {
         'success': False,
         'transcription_file': None,
         'summary_file': None,
+        'segments': [],
+        'segment_count': 0,
+        'subtitle_files': {},
+        'metrics': None,
         'error': None
     }
+    rolling = None
+    prepared = None
     try:
         if not os.path.exists(voice):
             raise FileNotFoundError(f"音声ファイルが存在しません: {voice}")
         try:
-            chunk_files = sound_control.split_audio_by_time(voice, chunk_dir, split_seconds)
+            if audio_archive.is_archive(voice):
+                with metrics.stage('archive_open'):
+                    data = audio_archive.open_audio(voice)
+                    rate = data.rate
+            else:
+                with metrics.stage('wav_read'):
+                    data, rate = sound_control.read_wav_int16(voice)
+            frames = len(data)
+            if rate != asr_backend.SAMPLE_RATE or (
+                    (opts.remove_dc or opts.normalize_dbfs is not None) and not isinstance(data, audio_archive.AudioSource)):
+                with metrics.stage('preprocess'):
+                    # 前処理の結果は一時 WAV へ書き、memmap で読む (録音全体の配列をもう 1 つ作らない)
+                    os.makedirs(chunk_dir, exist_ok=True)
+                    prepared = os.path.join(chunk_dir, PREPARED_WAV)
+                    source = data
+                    data, rate = preprocess.prepare_audio(source, rate, asr_backend.SAMPLE_RATE, opts.remove_dc,
+                                                          opts.normalize_dbfs, logger, out_path=prepared)
+                    if isinstance(source, audio_archive.AudioSource):
+                        source.close()
+                    del source
+            duration_seconds = len(data) / rate
+            channel_plan = None
+            if opts.separate_channels:
+                with metrics.stage('channel_vad'):
+                    channel_plan = _plan_channel_jobs(voice, frames, split_seconds, opts.overlap_seconds, logger,
+                                                      opts.remove_dc, opts.normalize_dbfs)
+            jobs = None
+            if channel_plan is None:
+                with metrics.stage('split', overlap_seconds=opts.overlap_seconds):
+                    spans = sound_control.write_time_chunks(data, rate, chunk_dir, split_seconds, opts.overlap_seconds)
+                chunk_files = inputs = [s[0] for s in spans]
+            else:
+                jobs, inputs = channel_plan
+                spans = chunk_files = [job['name'] for job in jobs]
         except Exception as e:
             raise RuntimeError(f"音声分割失敗: {e}") from e
-        if not chunk_files:
+        if not spans:
             raise RuntimeError("分割後のチャンクが生成されませんでした")
-        all_text_parts: List[str] = []
-        for f in chunk_files:
-            _log(logger, f"Whisperで文字起こし中: {f}")
-            part = transcribe_audio_whisper(f, lang=lang, model_size=whisper_model, logger=logger)
-            all_text_parts.append(part)
-        all_text = "\n".join(all_text_parts)
+        policy = None
+        model_name = whisper_model
+        if whisper_model == 'auto' or opts.retranscribe_low_confidence:
+            policy = model_policy.ModelPolicy(opts.asr_backend_name, opts.asr_options)
+        if whisper_model == 'auto':
+            with metrics.stage('model_select'):
+                if jobs is not None:
+                    # チャンネル別は文字起こしする区間の合計が処理量になる
+                    speech = sum(len(x) for x in inputs) / rate
+                elif isinstance(data, audio_archive.AudioSource):
+                    speech = data.speech_seconds()
+                else:
+                    speech = sound_control.speech_seconds(data, rate)
+                model_name, estimate = policy.choose(speech, opts.deadline_seconds)
+            _log(logger, f"モデル自動選択: {model_name} (発話 {speech:.0f}s, 見積 {estimate:.0f}s / 期限 {opts.deadline_seconds:.0f}s)")
+        with metrics.stage('model_load', model=model_name):
+            engine = _get_engine(opts.asr_backend_name, model_name, logger, opts.asr_options)
+        if engine is not None and lang in (None, 'auto'):
+            with metrics.stage('language_detect'):
+                lang = detect_language_once(engine, voice, logger, data=data, rate=rate)
+        if isinstance(data, audio_archive.AudioSource):
+            data.close()
+        del data
+        formats = transcript_export.EXPORT_FORMATS if opts.transcript_formats is None else opts.transcript_formats
         try:
-            with open(out_voice_text, "w", encoding="utf-8") as out:
-                out.write(all_text)
-            _log(logger, f"文字起こし完了: {out_voice_text}")
+            # チャンク完了毎に追記 + fsync (処理途中でも GUI から途中経過を読める)
+            writer = transcript_export.TranscriptWriter(out_voice_text, formats, language=lang, logger=logger)
         except Exception as e:
             raise RuntimeError(f"文字起こし書き込み失敗: {e}") from e
         result['transcription_file'] = out_voice_text
-
-        _log(logger, f"Gemini議事録作成開始: {out_voice_text}")
-        summary = summarize_minutes_gemini(prompt, all_text, gemini_key, logger=logger)
         summary_file = os.path.splitext(out_voice_text)[:1][0] + "_summary.txt"
+        use_gemini = opts.summarizer is None and bool(gemini_key) and genai is not None
+        summary_label = 'Gemini' if opts.summarizer is None else 'ローカル'
+        if opts.rolling_summary_seconds and opts.rolling_summary_seconds > 0:
+            if opts.summarizer is not None or use_gemini:
+                def summarize_fn(p, text):
+                    if opts.summarizer is not None:
+                        return opts.summarizer(p, text)
+                    return summarize_minutes_gemini(p, text, gemini_key, logger=logger, metrics=metrics)
+                # 途中更新は rolling_summarize、finish() の統合は下の summarize 工程として計測する
+                rolling = rolling_summary.RollingSummarizer(summarize_fn, prompt, opts.rolling_summary_seconds,
+                                                            summary_path=summary_file, logger=logger,
+                                                            metrics=metrics)
+            else:
+                _log(logger, "Gemini が使えないため途中要約を行いません")
+        result['summary_file'] = summary_file if rolling is not None else None
+        retranscribe = jobs is None and policy is not None and opts.retranscribe_low_confidence and engine is not None
+        # 書き出した後もチャンクを保持するのは、後で書き直す場合 (再文字起こし / チャンネル別の並べ直し) だけ
+        keep_chunks = retranscribe or jobs is not None
+        keep_segments = opts.return_segments or (opts.meeting_db and 'json' not in writer.paths)
+        chunks: List[dict] = []
+        segments: List[dict] = []
+        done = 0
+        try:
+            if engine is None:
+                for i in range(len(chunk_files)):
+                    writer.add_chunk("(文字起こし失敗: Whisperモデル未ロード)")
+            else:
+                if opts.batch_size > 1:
+                    _log(logger, f"Whisperでバッチ文字起こし中: {len(chunk_files)} チャンク (batch={opts.batch_size})")
+                for item in _iter_transcriptions(engine, inputs, lang, opts.batch_size, logger):
+                    metrics.chunk(item['index'], item['audio_seconds'], item['speech_seconds'], item['elapsed'],
+                                  model=model_name, error=item['error'])
+                    _log(logger, f"Whisperで文字起こし完了: {chunk_files[item['index']]}")
+                    if policy is not None and not item['error']:
+                        policy.record(model_name, item['speech_seconds'], item['elapsed'])
+                    if jobs is None:
+                        _clip_chunk(item, spans)
+                        position = spans[item['index']][1] + item['audio_seconds']
+                    else:
+                        item['segments'] = _unpack_segments(item['segments'], jobs[item['index']])
+                        position = jobs[item['index']]['end']
+                    with metrics.stage('write'):
+                        writer.add_chunk(_chunk_text(item), item['segments'])
+                    if rolling is not None:
+                        rolling.add(_chunk_text(item), position)
+                    result['segment_count'] += len(item['segments'])
+                    if keep_chunks:
+                        chunks.append(item)
+                    elif keep_segments:
+                        segments.extend(item['segments'])
+                    done += 1
+                    _report_progress(progress, done, len(chunk_files), logger)
+        finally:
+            result['subtitle_files'] = writer.close()
+        if jobs is not None and opts.retranscribe_low_confidence:
+            _log(logger, "チャンネル別文字起こしでは低確信度チャンクの再文字起こしを行いません")
+        elif retranscribe:
+            with metrics.stage('retranscribe'):
+                replaced = _retranscribe_low_confidence(policy, model_name, chunks, spans, lang, opts.batch_size,
+                                                        opts.deadline_seconds - (time.time() - start_time),
+                                                        opts.asr_backend_name, opts.asr_options, logger)
+            if replaced:
+                if rolling is not None:
+                    # 途中要約は差し替え前のテキストで作られているため、全文から要約し直す
+                    rolling.close()
+                    rolling = None
+                # 差し替えたチャンクを含めて書き直す
+                with metrics.stage('write'):
+                    with transcript_export.TranscriptWriter(out_voice_text, formats, language=lang, logger=logger,
+                                                            replace=True) as w:
+                        for c in chunks:
+                            w.add_chunk(_chunk_text(c), c['segments'])
+        if jobs is not None:
+            # 区間はチャンネル間で重なり得るため、最後にセグメント単位の時刻順で書き直す
+            with metrics.stage('write'):
+                result['subtitle_files'] = _write_merged_channels(out_voice_text, formats, lang, chunks, jobs, logger)
+        _log(logger, f"文字起こし完了: {out_voice_text}")
+        if result['subtitle_files']:
+            _log(logger, "タイムスタンプ付き出力: " + ", ".join(result['subtitle_files'].values()))
+        if keep_chunks:
+            result['segment_count'] = sum(len(c['segments']) for c in chunks)
+        if keep_chunks and keep_segments:
+            segments = [seg for c in chunks for seg in c['segments']]
+            if jobs is not None:
+                segments.sort(key=lambda seg: seg['start'])
+        del chunks
+        if opts.return_segments:
+            result['segments'] = segments
+        _log(logger, f"{summary_label}議事録作成開始: {out_voice_text}")
+        if rolling is not None:
+            with metrics.stage('summarize', rolling_updates=rolling.updates):
+                summary = rolling.finish()
+            rolling = None
+        elif opts.summarizer is not None or use_gemini:
+            # 要約には書き出したファイルを読み直して渡す (チャンク毎のテキストは保持しない)
+            with open(out_voice_text, encoding='utf-8') as f:
+                all_text = f.read()
+            with metrics.stage('summarize'):
+                if opts.summarizer is not None:
+                    summary = opts.summarizer(prompt, all_text)
+                else:
+                    summary = summarize_minutes_gemini(prompt, all_text, gemini_key, logger=logger, metrics=metrics)
+            del all_text
+        else:
+            # 要約しない場合は文字起こしを読み込まない (スキップ理由のメッセージだけを返す)
+            summary = summarize_minutes_gemini(prompt, '', gemini_key, logger=logger, metrics=metrics)
         try:
-            with open(summary_file, "w", encoding="utf-8") as out:
-                out.write(summary)
-            _log(logger, f"Gemini議事録作成完了: {summary_file}")
+            with metrics.stage('summary_write'):
+                with open(summary_file, "w", encoding="utf-8") as out:
+                    out.write(summary)
+            _log(logger, f"{summary_label}議事録作成完了: {summary_file}")
         except Exception as e:
             _log(logger, f"要約ファイル書き込み失敗: {e}")
             # 要約失敗でも transcription は成功として継続
             result['error'] = f"要約保存失敗: {e}"
         result['summary_file'] = summary_file
+        if opts.meeting_db:
+            with metrics.stage('meeting_store'):
+                if not keep_segments:
+                    segments = transcript_export.iter_json_segments(result['subtitle_files'].get('json', ''))
+                _store_meeting(opts.meeting_db, voice, out_voice_text, summary_file, summary, segments,
+                               result['segment_count'], lang, model_name, duration_seconds, logger)
         result['success'] = True
         duration = time.time() - start_time
         _log(logger, f"議事録処理完了 (所要 {duration:.1f}s)")
@@ -190,3 +566,166 @@ def create_meeting_report(prompt: str, voice: str, chunk_dir: str, split_seconds
         result['error'] = str(fatal)
         _log(logger, f"議事録処理致命的エラー: {fatal}")
         return result
+    finally:
+        if rolling is not None:
+            rolling.close()
+        if prepared is not None:
+            try:
+                os.remove(prepared)
+            except OSError:
+                pass
+        result['metrics'] = metrics.finish()
+        for line in metrics.format_lines(result['metrics']):
+            _log(logger, line)
+
+def _report_progress(progress: Optional[Callable[[int, int], None]], done: int, total: int,
+                     logger: Optional[WhisperLogger]):
+    if progress:
+        try:
+            progress(done, total)
+        except Exception as e:
+            _log(logger, f"進捗通知エラー: {e}")
+
+def _store_meeting(db_path: str, voice: str, transcript_path: str, summary_path: str, summary: str,
+                   segments: Iterable[dict], count: int, lang: Optional[str], model_name: str, duration_seconds: float,
+                   logger: Optional[WhisperLogger]):
+    """会議アーカイブへ登録 (失敗しても議事録処理は成功扱い)"""
+    try:
+        with meeting_store.MeetingStore(db_path) as store:
+            meeting_id = store.add_meeting(
+                segments, title=os.path.splitext(os.path.basename(voice))[0], audio_path=os.path.abspath(voice),
+                transcript_path=transcript_path, summary_path=summary_path, summary=summary, language=lang,
+                model=model_name, duration_seconds=duration_seconds)
+        _log(logger, f"会議アーカイブへ登録: #{meeting_id} ({count} セグメント)")
+    except Exception as e:
+        _log(logger, f"会議アーカイブ登録失敗: {e}")
+
+def _plan_channel_jobs(voice: str, frames: int, split_seconds: int, overlap_seconds: float,
+                       logger: Optional[WhisperLogger], remove_dc: bool=False, normalize_dbfs: Optional[float]=None):
+    """チャンネル別 WAV の発話区間から文字起こし単位を作る
+
+    Returns: (jobs, 入力配列) を開始時刻順に。jobs は {'name', 'speaker', 'pieces', 'end'} で、
+             pieces は (入力内の開始秒, 録音上の開始秒, 終了秒, 採用開始秒, 採用終了秒)。
+             チャンネル別で処理できない場合は None
+    """
+    path = sound_control.channels_path(voice)
+    if audio_archive.is_archive(voice) or not os.path.exists(path):
+        _log(logger, f"チャンネル別の録音が無いためミックスで文字起こしします: {path}")
+        return None
+    data, rate = sound_control.read_wav_channels(path)
+    if rate != asr_backend.SAMPLE_RATE or data.shape[1] < len(CHANNEL_SPEAKERS):
+        _log(logger, f"チャンネル別の録音が {asr_backend.SAMPLE_RATE}Hz 2ch ではないためミックスで文字起こしします")
+        return None
+    if len(data) != frames:
+        # ミックスと同時に書いたものでなければ別の録音の残り
+        _log(logger, f"チャンネル別の録音の長さがミックスと一致しないためミックスで文字起こしします: {path}")
+        return None
+    gap = np.zeros(int(rate * CHANNEL_PACK_GAP_SECONDS), dtype=data.dtype)
+    planned = []
+    for ch, speaker in enumerate(CHANNEL_SPEAKERS):
+        # 音量はチャンネル毎に揃える (相手側の声が小さくても VAD で落ちないように)
+        channel, _ = preprocess.prepare_audio(np.ascontiguousarray(data[:, ch]), rate, rate, remove_dc, normalize_dbfs)
+        packed = sound_control.pack_speech_regions(sound_control.speech_regions(channel, rate), rate,
+                                                   split_seconds, overlap_seconds, CHANNEL_PACK_GAP_SECONDS)
+        for group in packed:
+            parts = []
+            pieces = []
+            offset = 0
+            for start, end, keep_start, keep_end in group:
+                if parts:
+                    parts.append(gap)
+                    offset += len(gap)
+                parts.append(channel[start:end])
+                pieces.append((offset / rate, start / rate, end / rate, keep_start / rate, keep_end / rate))
+                offset += end - start
+            job = {'name': f"{speaker}@{pieces[0][1]:.1f}s", 'speaker': speaker, 'pieces': pieces,
+                   'end': pieces[-1][2]}
+            planned.append((job, np.concatenate(parts)))
+    if not planned:
+        _log(logger, "チャンネル別の録音に発話が無いためミックスで文字起こしします")
+        return None
+    planned.sort(key=lambda p: p[0]['pieces'][0][1])
+    active = sum(e - s for job, _ in planned for _o, s, e, _ks, _ke in job['pieces'])
+    _log(logger, f"チャンネル別文字起こし: {len(planned)} 区間 (発話 {active:.0f}s / 録音 {len(data) / rate:.0f}s x "
+                 f"{len(CHANNEL_SPEAKERS)}ch)")
+    return [job for job, _ in planned], [audio for _, audio in planned]
+
+def _unpack_segments(segments: List[dict], job: dict) -> List[dict]:
+    """詰めた入力上の時刻 → 録音先頭からの秒。話者を付け、分割した長い発話の重なり部分は中心時刻で片方だけ残す"""
+    pieces = job['pieces']
+    offsets = [p[0] for p in pieces]
+
+    def locate(t, is_start):
+        i = max(bisect.bisect_right(offsets, t) - 1, 0)
+        piece = pieces[i]
+        if is_start and t - piece[0] >= piece[2] - piece[1] and i + 1 < len(pieces):
+            # 挟んだ無音の中で始まるセグメントは次の区間の先頭から
+            piece = pieces[i + 1]
+        return piece, piece[1] + min(max(t - piece[0], 0.0), piece[2] - piece[1])
+
+    kept = []
+    for seg in segments:
+        piece, start = locate(float(seg.get('start') or 0.0), True)
+        _p, end = locate(float(seg.get('end') or 0.0), False)
+        end = max(end, start)
+        if piece[3] <= (start + end) / 2 < piece[4]:
+            kept.append(dict(seg, start=start, end=end, speaker=job['speaker']))
+    return kept
+
+def _write_merged_channels(out_voice_text: str, formats, lang: Optional[str], chunks: List[dict],
+                           jobs: List[dict], logger: Optional[WhisperLogger]) -> Dict[str, str]:
+    """チャンネル別のセグメントを時刻順に並べ直して書き出す (失敗区間のメッセージもその位置に残す)"""
+    lines = []
+    segments = []
+    for c in chunks:
+        if c['error']:
+            lines.append((jobs[c['index']]['pieces'][0][1], c['error']))
+        for seg in c['segments']:
+            if seg.get('text'):
+                lines.append((seg['start'], asr_backend.segment_text(seg)))
+            segments.append(seg)
+    lines.sort(key=lambda x: x[0])
+    segments.sort(key=lambda seg: seg['start'])
+    with transcript_export.TranscriptWriter(out_voice_text, formats, language=lang, logger=logger,
+                                            replace=True) as w:
+        w.add_chunk('\n'.join(text for _, text in lines) or "(空)", segments)
+    return dict(w.paths)
+
+def _clip_chunk(item: dict, spans: List[tuple]):
+    """チャンク相対 → 録音先頭からの絶対時刻。重なり部分は中心時刻で片方のチャンクだけ残す"""
+    _path, offset, keep_start, keep_end = spans[item['index']]
+    if item['index'] == 0:
+        keep_start = float('-inf')
+    if item['index'] == len(spans) - 1:
+        keep_end = float('inf')  # 末尾のタイムスタンプが音声長を僅かに超えても落とさない
+    item['segments'] = asr_backend.clip_segments(item['segments'], offset, keep_start, keep_end)
+
+def _retranscribe_low_confidence(policy, model_name: str, chunks: List[dict], spans: List[tuple], lang: str,
+                                 batch_size: int, remaining_seconds: float, backend: str,
+                                 asr_options: Optional[dict], logger: Optional[WhisperLogger]) -> int:
+    """低確信度チャンクを一段大きいモデルで再文字起こし (期限内に収まる場合のみ)
+
+    Returns: 差し替えたチャンク数
+    """
+    larger = policy.next_larger(model_name)
+    low = [c for c in chunks if not c['error'] and policy.is_low_confidence(c['segments'])]
+    if not low or larger is None:
+        return 0
+    need = policy.estimate(larger, sum(c['speech_seconds'] for c in low))
+    if need > remaining_seconds:
+        _log(logger, f"低確信度チャンク {len(low)} 件の再文字起こしは期限超過見込みのためスキップ (見積 {need:.0f}s)")
+        return 0
+    engine = _get_engine(backend, larger, logger, asr_options)
+    if engine is None:
+        return 0
+    _log(logger, f"低確信度チャンク {len(low)} 件を {larger} で再文字起こし")
+    files = [spans[c['index']][0] for c in low]
+    replaced = 0
+    for c, item in zip(low, _iter_transcriptions(engine, files, lang, batch_size, logger)):
+        if not item['error']:
+            policy.record(larger, item['speech_seconds'], item['elapsed'])
+            item['index'] = c['index']
+            _clip_chunk(item, spans)
+            c['segments'] = item['segments']
+            replaced += 1
+    return replaced
@@ -0,0 +1,441 @@
+"""音声認識 (ASR) バックエンド
+
+ai_control から使う文字起こしエンジンの共通インタフェース。
+
+ - AsrBackend: load / transcribe_array / transcribe_batch / transcribe_file / detect_language
+ - 結果はセグメント (dict: start, end, text, avg_logprob, no_speech_prob) のリスト。
+   start/end は入力音声先頭からの秒
+ - 'whisper'        : openai-whisper (PyTorch)。既定。quantize=True で Linear 層を動的 int8 量子化
+                      (量子化済みの重みと構成をキャッシュディレクトリへ保存し、次回起動時は fp32 の重みの
+                      読み込みと再量子化をせずに組み立てる)
+ - 'faster-whisper' : CTranslate2 実装。CPU では int8 演算で高速・省メモリ
+ - バックエンドは get_backend() でモデル毎にキャッシュし、ループ毎の再ロードを防止
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+import dataclasses
+import os
+import sys
+import threading
+import numpy as np
+
+from . import sound_control
+
+try:
+    import whisper
+    import torch
+except Exception:
+    whisper = None
+    torch = None
+
+try:
+    import faster_whisper
+except Exception:
+    faster_whisper = None
+
+AsrLogger = Callable[[str], None]
+Segment = Dict[str, object]
+
+SAMPLE_RATE = 16000
+WINDOW_SECONDS = 30          # Whisper エンコーダの入力窓
+TIME_PRECISION = 0.02        # Whisper タイムスタンプトークンの刻み (秒)
+NO_SPEECH_THRESHOLD = 0.6    # model.transcribe と同じ無音判定
+LOGPROB_THRESHOLD = -1.0
+DEFAULT_BACKEND = 'whisper'
+MAX_CACHED_BACKENDS = 2      # 同時に保持するモデル数 (メモリ節約)
+
+
+def default_cache_dir() -> str:
+    """量子化済みモデル等のキャッシュ保存先"""
+    if sys.platform == 'win32' and os.environ.get('LOCALAPPDATA'):
+        base = os.environ['LOCALAPPDATA']
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'ai_meeting_recorder')
+
+
+def quantize_whisper_int8(model):
+    """Whisper モデルの Linear 層を動的 int8 量子化 (CPU 推論用)
+
+    whisper.model.Linear は nn.Linear のサブクラスで、quantize_dynamic は厳密な型一致でしか
+    置き換えないため、先に nn.Linear へ戻してから量子化する (fp32 では forward は同等)。
+    """
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear) and type(module) is not torch.nn.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _log(logger: Optional[AsrLogger], msg: str):
+    if logger:
+        try:
+            logger(msg)
+        except Exception:
+            pass
+
+
+def make_segment(start: float, end: float, text: str, avg_logprob=None, no_speech_prob=None) -> Segment:
+    return {
+        'start': float(start),
+        'end': float(end),
+        'text': text.strip(),
+        'avg_logprob': None if avg_logprob is None else float(avg_logprob),
+        'no_speech_prob': None if no_speech_prob is None else float(no_speech_prob),
+    }
+
+
+def segment_text(seg: Segment) -> str:
+    """セグメントのテキスト。チャンネル別文字起こしの話者ラベル (local / remote) があれば先頭に付ける"""
+    if seg.get('speaker'):
+        return f"[{seg['speaker']}] {seg['text']}"
+    return seg['text']
+
+
+def segments_to_text(segments: List[Segment]) -> str:
+    return "\n".join(segment_text(s) for s in segments if s.get('text'))
+
+
+def clip_segments(segments: List[Segment], offset: float, keep_start: float = float('-inf'),
+                  keep_end: float = float('inf')) -> List[Segment]:
+    """チャンク相対のセグメントを絶対時刻へずらし、中心が [keep_start, keep_end) のものだけ残す
+
+    重なりを付けて分割したチャンク同士では、境界付近の同じ発話が両方に現れる。
+    中心時刻で採用チャンクを 1 つに決めることで重複を除き、境界で切れた語は
+    重なり側のチャンク (語全体を含む方) の結果が使われる。
+    """
+    kept: List[Segment] = []
+    for seg in segments:
+        start = offset + float(seg.get('start') or 0.0)
+        end = offset + float(seg.get('end') or 0.0)
+        if keep_start <= (start + end) / 2 < keep_end:
+            kept.append(dict(seg, start=start, end=end))
+    return kept
+
+
+def _average_probs(probs: List[Dict[str, float]]) -> Optional[Dict[str, float]]:
+    if not probs:
+        return None
+    total: Dict[str, float] = {}
+    for p in probs:
+        for lang, v in p.items():
+            total[lang] = total.get(lang, 0.0) + float(v)
+    return {lang: v / len(probs) for lang, v in total.items()}
+
+
+def load_audio(path: str) -> np.ndarray:
+    """16kHz float32 の音声配列を読み込む (16kHz WAV は ffmpeg を経由しない)"""
+    try:
+        data, rate = sound_control.read_wav_int16(path)
+        if rate == SAMPLE_RATE:
+            return sound_control.to_float32(data)
+    except Exception:
+        pass
+    if whisper is None:
+        raise RuntimeError(f"16kHz WAV 以外の読み込みには whisper (ffmpeg) が必要です: {path}")
+    return whisper.load_audio(path)
+
+
+class AsrBackend:
+    """バックエンド基底クラス"""
+    name = 'base'
+
+    def __init__(self, model_size: str = 'small', logger: Optional[AsrLogger] = None, **options):
+        self.model_size = model_size
+        self.logger = logger
+        self.options = options
+        self.model = None
+        # 同じモデルへの推論は直列化する (openai-whisper はデコード毎にモジュールへフックを付けるため、
+        # 複数スレッドから同時に呼ぶと結果が混ざる)。ロード済みモデルは複数ジョブで共有する
+        self.lock = threading.Lock()
+
+    @classmethod
+    def available(cls) -> bool:
+        return True
+
+    def load(self) -> bool:
+        """モデルをロード (済みなら何もしない)。失敗時は False"""
+        raise NotImplementedError
+
+    def transcribe_array(self, audio: np.ndarray, lang: Optional[str] = 'ja', **kwargs) -> List[Segment]:
+        """16kHz float32 配列を文字起こし"""
+        raise NotImplementedError
+
+    def transcribe_batch(self, audios: List[np.ndarray], lang: Optional[str] = 'ja', batch_size: int = 8,
+                         **kwargs) -> List[List[Segment]]:
+        """複数配列を文字起こし (既定は逐次処理)。入力順のセグメントリストを返す"""
+        return [self.transcribe_array(a, lang=lang, **kwargs) for a in audios]
+
+    def transcribe_file(self, path: str, lang: Optional[str] = 'ja', **kwargs) -> List[Segment]:
+        return self.transcribe_array(load_audio(path), lang=lang, **kwargs)
+
+    def detect_language(self, audios: List[np.ndarray]) -> Optional[Dict[str, float]]:
+        """各サンプル (30 秒以内) の言語確率を平均した {言語コード: 確率} を返す。未対応なら None"""
+        return None
+
+
+class WhisperBackend(AsrBackend):
+    """openai-whisper (PyTorch) バックエンド
+
+    options: quantize (bool, 動的 int8 量子化), cache_dir (量子化モデルの保存先)
+    """
+    name = 'whisper'
+
+    @classmethod
+    def available(cls) -> bool:
+        return whisper is not None
+
+    def load(self) -> bool:
+        if self.model is not None:
+            return True
+        if whisper is None:
+            _log(self.logger, "Whisperライブラリが読み込めなかったため文字起こしをスキップします")
+            return False
+        try:
+            _log(self.logger, f"Whisperモデル '{self.model_size}' を読み込み中…")
+            if self.options.get('quantize'):
+                self.model = self._load_quantized()
+            else:
+                self.model = whisper.load_model(self.model_size)
+            _log(self.logger, "Whisperモデル読み込み完了")
+            return True
+        except Exception as e:
+            _log(self.logger, f"Whisperモデル読み込み失敗: {e}")
+            return False
+
+    def quantized_cache_path(self) -> str:
+        cache_dir = self.options.get('cache_dir') or default_cache_dir()
+        version = getattr(whisper, '__version__', 'unknown')
+        tag = f"whisper-{self.model_size}-int8-w{version}-t{torch.__version__}".replace('+', '_')
+        return os.path.join(cache_dir, tag + '.int8.pt')
+
+    def _load_quantized(self):
+        """キャッシュがあれば量子化済みの重みからモデルを組み立てる。無ければ fp32 をロードして量子化し、保存する
+
+        キャッシュは {'dims': ModelDimensions, 'state_dict': 量子化済みの重み} (テンソルと基本型のみ) で保存し
+        weights_only=True で読む。モデルオブジェクトを pickle で保存・復元すると、書き込み可能な
+        キャッシュディレクトリ経由で任意コードを実行され得るうえ、whisper のクラス構成にも依存するため。
+        weights_only の無い古い torch ではキャッシュを使わない。
+        """
+        path = self.quantized_cache_path()
+        if os.path.exists(path):
+            try:
+                model = self._load_quantized_cache(path)
+                _log(self.logger, f"量子化済みの重みをキャッシュから読み込み: {path}")
+                return model
+            except Exception as e:
+                _log(self.logger, f"量子化キャッシュを使わずに量子化します: {e}")
+        model = quantize_whisper_int8(whisper.load_model(self.model_size, device='cpu'))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + '.tmp'
+            torch.save({'dims': dataclasses.asdict(model.dims), 'state_dict': model.state_dict()}, tmp)
+            os.replace(tmp, path)
+            _log(self.logger, f"量子化済みの重みを保存: {path}")
+        except Exception as e:
+            _log(self.logger, f"量子化キャッシュ保存失敗: {e}")
+        return model
+
+    def _load_quantized_cache(self, path: str):
+        """未ロードの Whisper を同じ構成で作って量子化し (モジュール構成だけが目的)、キャッシュの重みを入れる"""
+        cache = torch.load(path, map_location='cpu', weights_only=True)
+        model = quantize_whisper_int8(whisper.model.Whisper(whisper.model.ModelDimensions(**cache['dims'])))
+        model.load_state_dict(cache['state_dict'])
+        # 単語タイムスタンプ用のヘッド指定は state_dict に含まれない (load_model と同じく設定する)
+        heads = getattr(whisper, '_ALIGNMENT_HEADS', {}).get(self.model_size)
+        if heads is not None:
+            model.set_alignment_heads(heads)
+        return model
+
+    @property
+    def _fp16(self) -> bool:
+        return self.model.device.type != 'cpu'
+
+    def transcribe_array(self, audio, lang='ja', **kwargs):
+        kwargs.setdefault('fp16', self._fp16)
+        result = self.model.transcribe(np.ascontiguousarray(audio, dtype=np.float32), language=lang, **kwargs)
+        if "segments" in result:
+            return [make_segment(seg.get('start', 0.0), seg.get('end', 0.0), seg.get('text', ''),
+                                 seg.get('avg_logprob'), seg.get('no_speech_prob'))
+                    for seg in result["segments"]]
+        text = result.get("text", "")
+        return [make_segment(0.0, len(audio) / SAMPLE_RATE, text)] if text else []
+
+    def transcribe_file(self, path, lang='ja', **kwargs):
+        # ffmpeg 対応形式をそのまま渡せるよう model.transcribe にパスを渡す
+        kwargs.setdefault('fp16', self._fp16)
+        result = self.model.transcribe(path, language=lang, **kwargs)
+        if "segments" in result:
+            return [make_segment(seg.get('start', 0.0), seg.get('end', 0.0), seg.get('text', ''),
+                                 seg.get('avg_logprob'), seg.get('no_speech_prob'))
+                    for seg in result["segments"]]
+        text = result.get("text", "")
+        return [make_segment(0.0, 0.0, text)] if text else []
+
+    def batch_log_mel(self, windows: List[np.ndarray]):
+        """複数の 30 秒窓の log-mel を一括計算 (B, n_mels, 3000)
+
+        whisper.log_mel_spectrogram はバッチ全体の最大値で正規化してしまうため、
+        窓毎の最大値で正規化するよう同じ処理をバッチ向けに展開している。
+        """
+        from whisper.audio import N_FFT, HOP_LENGTH, N_SAMPLES, mel_filters
+        audio = torch.zeros((len(windows), N_SAMPLES), dtype=torch.float32)
+        for i, w in enumerate(windows):
+            n = min(len(w), N_SAMPLES)
+            audio[i, :n] = torch.from_numpy(np.ascontiguousarray(w[:n], dtype=np.float32))
+        audio = audio.to(self.model.device)
+        window = torch.hann_window(N_FFT).to(audio.device)
+        stft = torch.stft(audio, N_FFT, HOP_LENGTH, window=window, return_complex=True)
+        magnitudes = stft[..., :-1].abs() ** 2
+        mel_spec = mel_filters(audio.device, self.model.dims.n_mels) @ magnitudes
+        log_spec = torch.clamp(mel_spec, min=1e-10).log10()
+        log_spec = torch.maximum(log_spec, log_spec.amax(dim=(-2, -1), keepdim=True) - 8.0)
+        return (log_spec + 4.0) / 4.0
+
+    def _tokens_to_segments(self, tokenizer, tokens, offset: float, duration: float, res) -> List[Segment]:
+        """タイムスタンプトークン付きの出力を区間毎のセグメントへ分解"""
+        ts_begin = tokenizer.timestamp_begin
+        segments: List[Segment] = []
+        text_tokens: List[int] = []
+        seg_start = 0.0
+        for tok in tokens:
+            if tok >= ts_begin:
+                t = (tok - ts_begin) * TIME_PRECISION
+                if text_tokens:
+                    segments.append(make_segment(offset + seg_start, offset + t, tokenizer.decode(text_tokens),
+                                                 res.avg_logprob, res.no_speech_prob))
+                    text_tokens = []
+                seg_start = t
+            elif tok < tokenizer.eot:
+                text_tokens.append(tok)
+        if text_tokens:
+            segments.append(make_segment(offset + seg_start, offset + duration, tokenizer.decode(text_tokens),
+                                         res.avg_logprob, res.no_speech_prob))
+        return [s for s in segments if s['text']]
+
+    def transcribe_batch(self, audios, lang='ja', batch_size=8, **kwargs):
+        """全入力を 30 秒窓に区切り、log-mel 一括計算 + batch_size 窓ずつ decode
+
+        30 秒を超える入力は窓境界で単純に区切るため、短めのチャンクでの利用を推奨。
+        """
+        from whisper.tokenizer import get_tokenizer
+        step = SAMPLE_RATE * WINDOW_SECONDS
+        windows: List[np.ndarray] = []
+        owners: List[Tuple[int, float]] = []
+        for idx, audio in enumerate(audios):
+            audio = sound_control.to_float32(np.asarray(audio).reshape(-1))
+            for s in range(0, max(len(audio), 1), step):
+                windows.append(audio[s:s+step])
+                owners.append((idx, s / SAMPLE_RATE))
+        tokenizer = get_tokenizer(self.model.is_multilingual, num_languages=self.model.num_languages,
+                                  language=lang, task='transcribe')
+        options = whisper.DecodingOptions(language=lang, fp16=self._fp16, **kwargs)
+        results: List[List[Segment]] = [[] for _ in audios]
+        bs = max(batch_size, 1)
+        for b in range(0, len(windows), bs):
+            batch = windows[b:b+bs]
+            decoded = self.model.decode(self.batch_log_mel(batch), options)
+            for (owner, offset), window, res in zip(owners[b:b+bs], batch, decoded):
+                # transcribe と同じ基準で無音窓を除外 (幻聴対策)
+                if res.no_speech_prob > NO_SPEECH_THRESHOLD and res.avg_logprob < LOGPROB_THRESHOLD:
+                    continue
+                results[owner].extend(self._tokens_to_segments(tokenizer, res.tokens, offset,
+                                                               len(window) / SAMPLE_RATE, res))
+        return results
+
+    def detect_language(self, audios):
+        if not self.model.is_multilingual:
+            return {'en': 1.0}
+        mel = self.batch_log_mel([sound_control.to_float32(np.asarray(a).reshape(-1)) for a in audios])
+        if self._fp16:
+            mel = mel.half()
+        _tokens, probs = self.model.detect_language(mel)
+        if isinstance(probs, dict):
+            probs = [probs]
+        return _average_probs(probs)
+
+
+class FasterWhisperBackend(AsrBackend):
+    """faster-whisper (CTranslate2) バックエンド
+
+    options: device ('cpu'), compute_type ('int8' / 'int8_float32' / 'float32' など), cpu_threads
+    """
+    name = 'faster-whisper'
+
+    @classmethod
+    def available(cls) -> bool:
+        return faster_whisper is not None
+
+    def load(self) -> bool:
+        if self.model is not None:
+            return True
+        if faster_whisper is None:
+            _log(self.logger, "faster-whisper がインストールされていないため利用できません")
+            return False
+        try:
+            _log(self.logger, f"faster-whisper モデル '{self.model_size}' を読み込み中…")
+            self.model = faster_whisper.WhisperModel(
+                self.model_size,
+                device=self.options.get('device', 'cpu'),
+                compute_type=self.options.get('compute_type', 'int8'),
+                cpu_threads=self.options.get('cpu_threads', 0),
+            )
+            _log(self.logger, "faster-whisper モデル読み込み完了")
+            return True
+        except Exception as e:
+            _log(self.logger, f"faster-whisper モデル読み込み失敗: {e}")
+            return False
+
+    def transcribe_array(self, audio, lang='ja', **kwargs):
+        segments, _info = self.model.transcribe(np.ascontiguousarray(audio, dtype=np.float32), language=lang, **kwargs)
+        return [make_segment(s.start, s.end, s.text, getattr(s, 'avg_logprob', None), getattr(s, 'no_speech_prob', None))
+                for s in segments]
+
+    def detect_language(self, audios):
+        probs = []
+        for audio in audios:
+            # 言語判定は transcribe 呼び出し時に行われる。セグメント (generator) は消費しない
+            _segments, info = self.model.transcribe(np.ascontiguousarray(audio, dtype=np.float32), language=None)
+            all_probs = getattr(info, 'all_language_probs', None)
+            probs.append(dict(all_probs) if all_probs else {info.language: info.language_probability})
+        return _average_probs(probs)
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+_BACKEND_CACHE: Dict[tuple, AsrBackend] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def register_backend(cls):
+    """バックエンドクラスを登録 (ベンチマーク用スタブなど)"""
+    BACKENDS[cls.name] = cls
+    return cls
+
+
+def get_backend(name: Optional[str] = None, model_size: str = 'small', logger: Optional[AsrLogger] = None,
+                **options) -> Optional[AsrBackend]:
+    """ロード済みバックエンドを返す (キャッシュ付き)。利用不可/ロード失敗時は None"""
+    name = name or DEFAULT_BACKEND
+    cls = BACKENDS.get(name)
+    if cls is None:
+        _log(logger, f"未知のASRバックエンド: {name}")
+        return None
+    key = (name, model_size, tuple(sorted(options.items())))
+    # 複数スレッド (HTTP サーバのワーカー) から同時に呼ばれても 1 回だけロードする
+    with _CACHE_LOCK:
+        backend = _BACKEND_CACHE.get(key)
+        if backend is None:
+            backend = cls(model_size, logger=logger, **options)
+        else:
+            backend.logger = logger
+        if not backend.load():
+            return None
+        _BACKEND_CACHE.pop(key, None)
+        _BACKEND_CACHE[key] = backend
+        while len(_BACKEND_CACHE) > MAX_CACHED_BACKENDS:
+            # 最も古く使われたモデルを解放
+            _BACKEND_CACHE.pop(next(iter(_BACKEND_CACHE)))
+    return backend
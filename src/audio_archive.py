@@ -0,0 +1,267 @@
+"""録音の圧縮アーカイブ (FLAC / Opus) と区間読み出し
+
+処理の終わった 16kHz int16 WAV を FLAC (可逆) または Opus (非可逆, 小容量) へ圧縮し、
+同じ場所へシークポイント索引 <アーカイブ>.index.json を書く。
+
+ - 索引は SEEK_POINT_SECONDS 毎のサンプル位置と発話割合、録音全体の発話区間・発話時間を持つ
+   (VAD は圧縮時に 1 回だけ行う)。モデル自動選択・言語判定の窓選びは索引だけで済み、
+   デコードするのは実際に必要な区間だけになる
+ - AudioSource は WAV / FLAC / Opus を区間単位で読む。source[start:end] で int16 モノラル配列を返すので、
+   sound_control.write_time_chunks へ配列の代わりに渡せる (全体をメモリへ展開しない)
+ - FLAC / Opus の読み書きには soundfile (libsndfile) が必要。未インストール時はアーカイブをスキップし WAV を残す
+
+    python -m src.audio_archive meeting.wav --codec opus --remove-source
+"""
+
+from typing import Callable, List, Optional, Tuple
+import argparse
+import json
+import os
+import wave
+
+import numpy as np
+
+try:
+    import soundfile as sf
+except Exception:  # 未インストール時は WAV のみ扱う
+    sf = None
+
+from . import sound_control
+
+# 形式 → (libsndfile の format, subtype, 拡張子)
+ARCHIVE_CODECS = {
+    'flac': ('FLAC', 'PCM_16', '.flac'),
+    'opus': ('OGG', 'OPUS', '.opus'),
+}
+ARCHIVE_EXTENSIONS = ('.flac', '.opus', '.ogg')
+INDEX_SUFFIX = '.index.json'
+INDEX_VERSION = 1
+SEEK_POINT_SECONDS = 30  # シークポイント間隔 (Whisper の 30 秒窓に合わせる)
+
+Logger = Callable[[str], None]
+
+
+def _log(logger: Optional[Logger], msg: str):
+    if logger:
+        try:
+            logger(msg)
+        except Exception:
+            pass
+
+
+def is_archive(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in ARCHIVE_EXTENSIONS
+
+
+def index_path(path: str) -> str:
+    return path + INDEX_SUFFIX
+
+
+def load_index(path: str) -> Optional[dict]:
+    """アーカイブの索引 (無い/壊れている場合は None)"""
+    try:
+        with open(index_path(path), encoding='utf-8') as f:
+            index = json.load(f)
+    except Exception:
+        return None
+    return index if index.get('version') == INDEX_VERSION else None
+
+
+def _mono_int16(data: np.ndarray) -> np.ndarray:
+    if data.ndim > 1:
+        data = data[:, 0]
+    return sound_control.to_int16(data)
+
+
+def build_index(db: np.ndarray, frame: int, total: int, rate: int, codec: str, source: str = '') -> dict:
+    """フレーム dB 列 (録音全体) から索引を作る"""
+    active = sound_control.activity_from_db(db)
+    regions = sound_control.regions_from_activity(active, frame, total, rate)
+    density, span = sound_control.window_density(active, frame, rate, SEEK_POINT_SECONDS)
+    span = span or int(SEEK_POINT_SECONDS * rate)
+    points = [[i * span, round(float(d), 4)] for i, d in enumerate(density)]
+    if total > len(points) * span:
+        # 窓に満たない末尾もシークポイントとして持つ (発話割合は計算しない)
+        points.append([len(points) * span, None])
+    return {
+        'version': INDEX_VERSION,
+        'source': os.path.basename(source),
+        'codec': codec,
+        'sample_rate': rate,
+        'frames': total,
+        'seconds': round(total / rate, 3),
+        'seek_point_seconds': SEEK_POINT_SECONDS,
+        'seek_point_frames': span,
+        'points': points,  # [[先頭サンプル, 発話フレーム割合], ...]
+        'speech_regions': [[int(s), int(e)] for s, e in regions],
+        'speech_seconds': round(sum(e - s for s, e in regions) / rate, 3),
+    }
+
+
+class AudioSource:
+    """WAV / FLAC / Opus を区間単位で読む
+
+    len(source) は総サンプル数、source[start:end] は int16 モノラル配列。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index = load_index(path) if is_archive(path) else None
+        self._wave = None
+        self._sf = None
+        if is_archive(path):
+            if sf is None:
+                raise RuntimeError(f"soundfile が無いため圧縮音声を読めません: {path}")
+            self._sf = sf.SoundFile(path)
+            self.rate = self._sf.samplerate
+            self.frames = self._sf.frames
+        else:
+            self._wave = wave.open(path, 'rb')
+            if self._wave.getsampwidth() != 2:
+                self._wave.close()
+                raise ValueError('16bit PCM WAV のみ対応')
+            self.rate = self._wave.getframerate()
+            self.frames = self._wave.getnframes()
+            self._nch = self._wave.getnchannels()
+        if self.index and self.index.get('frames') != self.frames:
+            self.index = None  # 別のファイルの索引
+
+    def __len__(self) -> int:
+        return self.frames
+
+    def __getitem__(self, key) -> np.ndarray:
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise TypeError('AudioSource は [start:end] の区間指定のみ対応')
+        start, end, _ = key.indices(self.frames)
+        return self.read(start, end)
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """[start, end) を int16 モノラルで返す (範囲外は切り詰め)"""
+        start = max(int(start), 0)
+        end = min(int(end), self.frames)
+        if end <= start:
+            return np.zeros(0, dtype=np.int16)
+        if self._sf is not None:
+            self._sf.seek(start)
+            return _mono_int16(self._sf.read(end - start, dtype='int16', always_2d=True))
+        self._wave.setpos(start)
+        data = np.frombuffer(self._wave.readframes(end - start), dtype='<i2')
+        if self._nch > 1:
+            data = data.reshape(-1, self._nch)[:, 0]
+        return data
+
+    def blocks(self, block_frames: int):
+        """先頭から block_frames ずつ順に読む"""
+        for start in range(0, self.frames, block_frames):
+            yield self.read(start, start + block_frames)
+
+    def frame_db(self) -> Tuple[np.ndarray, int]:
+        """録音全体のフレーム dB 列を区間毎のデコードで求める (索引が無い場合用)"""
+        return _stream_frame_db(self.blocks, self.rate)
+
+    def speech_seconds(self) -> float:
+        if self.index:
+            return float(self.index['speech_seconds'])
+        db, frame = self.frame_db()
+        active = sound_control.activity_from_db(db)
+        return sum(e - s for s, e in sound_control.regions_from_activity(active, frame, self.frames, self.rate)) / self.rate
+
+    def dense_speech_windows(self, window_seconds: float = SEEK_POINT_SECONDS, count: int = 3) -> List[Tuple[int, int]]:
+        """発話の多い窓 (sound_control.dense_speech_windows と同じ選び方)。索引があればデコード不要"""
+        if self.index and self.index.get('seek_point_seconds') == window_seconds:
+            density = np.array([d for _, d in self.index['points'] if d is not None], dtype=np.float64)
+            span = self.index['seek_point_frames']
+        else:
+            db, frame = self.frame_db()
+            density, span = sound_control.window_density(sound_control.activity_from_db(db), frame,
+                                                         self.rate, window_seconds)
+        if len(density) == 0:
+            return [(0, self.frames)] if self.frames else []
+        return sound_control.densest_windows(density, span, count)
+
+    def close(self):
+        if self._sf is not None:
+            self._sf.close()
+        if self._wave is not None:
+            self._wave.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_audio(path: str) -> AudioSource:
+    return AudioSource(path)
+
+
+def _stream_frame_db(blocks, rate: int, frame_ms: int = 30) -> Tuple[np.ndarray, int]:
+    frame = max(int(rate * frame_ms / 1000), 1)
+    block = frame * max(int(SEEK_POINT_SECONDS * rate) // frame, 1)
+    parts = []
+    for data in blocks(block):
+        db, _ = sound_control.frame_db(data, rate, frame_ms)
+        parts.append(db)
+    return (np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)), frame
+
+
+def archive_recording(wav_path: str, codec: str = 'flac', out_path: Optional[str] = None,
+                      remove_source: bool = False, logger: Optional[Logger] = None) -> Optional[str]:
+    """WAV を FLAC / Opus へ圧縮し索引を書く。成功時はアーカイブのパス、失敗/スキップ時は None"""
+    if codec not in ARCHIVE_CODECS:
+        _log(logger, f"未対応のアーカイブ形式です: {codec}")
+        return None
+    if sf is None:
+        _log(logger, "soundfile が無いためアーカイブをスキップします (pip install soundfile)")
+        return None
+    fmt, subtype, ext = ARCHIVE_CODECS[codec]
+    out_path = out_path or os.path.splitext(wav_path)[0] + ext
+    tmp = out_path + '.part'
+    try:
+        with AudioSource(wav_path) as src:
+            rate, total = src.rate, src.frames
+            with sf.SoundFile(tmp, 'w', samplerate=rate, channels=1, format=fmt, subtype=subtype) as out:
+                def blocks(block_frames):
+                    # 圧縮と同じデコード結果から VAD 用の dB 列も作る (読み込みは 1 回)
+                    for data in src.blocks(block_frames):
+                        out.write(data)
+                        yield data
+                db, frame = _stream_frame_db(blocks, rate)
+        os.replace(tmp, out_path)
+        index = build_index(db, frame, total, rate, codec, wav_path)
+        with open(index_path(out_path), 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+    except Exception as e:
+        _log(logger, f"アーカイブ失敗: {e}")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return None
+    before = os.path.getsize(wav_path)
+    after = os.path.getsize(out_path)
+    _log(logger, f"アーカイブ作成: {out_path} ({before / 2**20:.1f} MiB → {after / 2**20:.1f} MiB)")
+    if remove_source:
+        try:
+            os.remove(wav_path)
+        except OSError as e:
+            _log(logger, f"元の WAV を削除できません: {e}")
+    return out_path
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='録音 WAV を FLAC / Opus へ圧縮し索引を作る')
+    ap.add_argument('wav', nargs='+')
+    ap.add_argument('--codec', choices=sorted(ARCHIVE_CODECS), default='flac')
+    ap.add_argument('--remove-source', action='store_true', help='圧縮後に元の WAV を削除')
+    args = ap.parse_args(argv)
+    failed = 0
+    for path in args.wav:
+        if archive_recording(path, args.codec, remove_source=args.remove_source, logger=print) is None:
+            failed += 1
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,127 @@
+"""録音用リングバッファ
+
+PortAudio コールバック (書き込み側) と録音スレッド (読み出し側) の間で
+サンプルを受け渡す単一 writer / 単一 reader の循環配列。
+
+ - 配列は生成時に確保し、コールバックではスライス代入のみ (アロケーションなし)
+ - 読み出し側は一定間隔でまとめて取り出すため、list.append の回数も大幅に減る
+ - ブロック毎の ADC 時刻 (先頭サンプル番号と対) も固定長配列へ記録し、
+   ストリーム間の時刻合わせ (stream_align.py) に使う
+ - 満杯で書けなかったブロック (overflow) やデータ不足 (underflow)、
+   PortAudio が報告したステータスを数え、診断用に stats() で公開する
+"""
+
+from typing import Dict, Optional
+import numpy as np
+
+RING_SECONDS = 5  # リングに保持できる秒数 (読み出し遅延の許容量)
+TIMESTAMP_SLOTS = 4096  # 読み出しまでに保持できるブロック時刻の数
+
+
+class BlockRing:
+    def __init__(self, capacity_frames: int, channels: int = 1, dtype=np.float32):
+        if capacity_frames <= 0:
+            raise ValueError('capacity_frames は正の値を指定してください')
+        self.capacity = int(capacity_frames)
+        self.channels = channels
+        self.buf = np.zeros((self.capacity, channels), dtype=dtype)
+        # 累積フレーム数 (単調増加)。書き込み側は _write、読み出し側は _read のみ更新する
+        self._write = 0
+        self._read = 0
+        # ブロック時刻 (先頭サンプル番号, ADC 時刻)
+        self.ts_index = np.zeros(TIMESTAMP_SLOTS, dtype=np.int64)
+        self.ts_time = np.zeros(TIMESTAMP_SLOTS, dtype=np.float64)
+        self._ts_write = 0
+        self._ts_read = 0
+        self.overflows = 0          # 満杯のため破棄したブロック数
+        self.dropped_frames = 0     # 破棄したフレーム数
+        self.underflows = 0         # 読み出し時にデータが無かった回数
+        self.input_overflows = 0    # PortAudio が報告した input overflow
+        self.input_underflows = 0   # PortAudio が報告した input underflow
+
+    def available(self) -> int:
+        return self._write - self._read
+
+    def write(self, indata, adc_time: Optional[float] = None) -> bool:
+        """ブロックを書き込む (コールバックから呼び出し)。満杯なら破棄して False
+
+        adc_time を渡すとブロック先頭サンプルの時刻として記録する
+        """
+        n = indata.shape[0]
+        w = self._write
+        if w - self._read + n > self.capacity:
+            self.overflows += 1
+            self.dropped_frames += n
+            return False
+        if adc_time is not None:
+            tw = self._ts_write
+            if tw - self._ts_read < TIMESTAMP_SLOTS:
+                slot = tw % TIMESTAMP_SLOTS
+                self.ts_index[slot] = w
+                self.ts_time[slot] = adc_time
+                self._ts_write = tw + 1
+        pos = w % self.capacity
+        first = min(n, self.capacity - pos)
+        self.buf[pos:pos + first] = indata[:first]
+        if first < n:
+            self.buf[:n - first] = indata[first:]
+        # コピー完了後に公開
+        self._write = w + n
+        return True
+
+    def note_status(self, status):
+        """sounddevice の CallbackFlags を集計 (文字列化やログ出力はしない)"""
+        if getattr(status, 'input_overflow', False):
+            self.input_overflows += 1
+        if getattr(status, 'input_underflow', False):
+            self.input_underflows += 1
+
+    def read(self, max_frames: Optional[int] = None, count_underflow: bool = True):
+        """溜まっているフレームを新しい配列で取り出す。空なら None"""
+        avail = self.available()
+        if avail <= 0:
+            if count_underflow:
+                self.underflows += 1
+            return None
+        n = avail if max_frames is None else min(avail, max_frames)
+        out = np.empty((n, self.channels), dtype=self.buf.dtype)
+        self._copy_out(out, n)
+        return out
+
+    def read_into(self, out) -> int:
+        """呼び出し側のバッファへ取り出し、コピーしたフレーム数を返す"""
+        n = min(self.available(), out.shape[0])
+        if n > 0:
+            self._copy_out(out, n)
+        return n
+
+    def _copy_out(self, out, n: int):
+        r = self._read
+        pos = r % self.capacity
+        first = min(n, self.capacity - pos)
+        out[:first] = self.buf[pos:pos + first]
+        if first < n:
+            out[first:n] = self.buf[:n - first]
+        self._read = r + n
+
+    def read_timestamps(self):
+        """未読のブロック時刻を (サンプル番号配列, 時刻配列) で取り出す。無ければ None"""
+        tr = self._ts_read
+        n = self._ts_write - tr
+        if n <= 0:
+            return None
+        slots = np.arange(tr, tr + n) % TIMESTAMP_SLOTS
+        out = (self.ts_index[slots], self.ts_time[slots])
+        self._ts_read = tr + n
+        return out
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'written_frames': self._write,
+            'read_frames': self._read,
+            'overflows': self.overflows,
+            'dropped_frames': self.dropped_frames,
+            'underflows': self.underflows,
+            'input_overflows': self.input_overflows,
+            'input_underflows': self.input_underflows,
+        }
@@ -3,6 +3,8 @@ import queue
 import sounddevice as sd
 import numpy as np
 import os
+import codecs
+import time
 from .resource_util import resource_path as _res_path
 import tkinter as tk
 try:
@@ -11,8 +13,22 @@ try:
 except Exception:
     _PIL_AVAILABLE = False
 from .model import RecorderModel
+from .level_meter import LevelMeter
+from .audio_buffer import BlockRing, RING_SECONDS
+from .device_registry import DeviceRegistry
 from .view import RecorderView, BG_COLOR, FG_COLOR
 from . import ai_control
+from . import diagnostics
+from . import audio_archive
+from . import meeting_store
+from .preprocess import CapturePreprocessor
+
+PREVIEW_RESTART_DELAY_MS = 300  # デバイス選択変更からプレビュー再起動までの待ち (連続変更をまとめる)
+WAVEFORM_INTERVAL_MS = 100       # 波形更新間隔
+SUSPENDED_INTERVAL_MS = 500      # プレビュー停止中のポーリング間隔
+TRANSCRIPT_TAIL_MS = 1000        # 議事録処理中の文字起こしファイル追跡間隔
+SEARCH_LIMIT = 200               # 議事録検索で表示する最大件数
+
 
 class RecorderController:
     def __init__(self, master):
@@ -23,9 +39,25 @@ class RecorderController:
         self.preview_streams = []
         self.mic_queue = queue.Queue()
         self.spk_queue = queue.Queue()
-        self.preview_mic_frames = []
-        self.preview_spk_frames = []
+        # ブロック毎のピーク/RMS と履歴 (プレビュー・録音共通)
+        self.mic_meter = LevelMeter()
+        self.spk_meter = LevelMeter()
         self.record_thread = None
+        # 録音コールバック → 録音スレッド受け渡し用 (録音開始毎に生成)
+        self.mic_ring = None
+        self.spk_ring = None
+        self._segment_error = False  # セグメント書き込みエラーを通知済みか
+        self._capture_pre = {}  # ストリーム名 → 録音時の前処理 (リサンプル / DC 除去)
+        # デバイス一覧キャッシュとプレビュー再起動の間引き
+        self.devices = DeviceRegistry()
+        self._preview_ids = None
+        self._preview_restart_job = None
+        # 最小化/非アクティブ時はプレビューを止める
+        self.preview_suspended = False
+        # 診断モード (設定 diagnostics / 環境変数 AMR_DIAGNOSTICS) では主要ループを計測対象にする
+        self.diagnostics = None
+        self._diagnostics_threads = []
+        self._init_diagnostics()
         self._wire_events()
         self._populate_devices()
         # 初期値を設定ファイルから反映
@@ -40,6 +72,7 @@ class RecorderController:
                 pass
         self.start_preview()
         self._schedule_waveform_update()
+        self._schedule_device_refresh()
         # 議事録処理状態
         self.processing_minutes = False
         self.processing_overlay = None
@@ -71,6 +104,7 @@ class RecorderController:
         except Exception:
             pass
         self.model.save_settings()
+        self._close_diagnostics()
         # 録音中なら停止
         try:
             self.is_recording = False
@@ -78,6 +112,44 @@ class RecorderController:
             pass
         self.view.master.destroy()
 
+    def _init_diagnostics(self):
+        settings = self.model.settings
+        mode = diagnostics.resolve_mode(settings.diagnostics, settings.diagnostics_mode)
+        if mode is None:
+            return
+        try:
+            self.diagnostics = diagnostics.Diagnostics(settings.diagnostics_dir, mode, logger=self.view.log)
+        except Exception as e:
+            self.view.log(f"診断モードを開始できません: {e}")
+            return
+        # インスタンス属性で差し替えるため、スレッド target / after() から呼ばれる経路も計測される
+        self._record_loop = self.diagnostics.wrap('record_loop', self._record_loop)
+        self._schedule_waveform_update = self.diagnostics.wrap('waveform_update', self._schedule_waveform_update)
+        self._process_minutes = self.diagnostics.wrap('create_meeting_report', self._process_minutes)
+        try:
+            self.view.master.bind('<Control-Shift-D>', lambda e: self._dump_diagnostics('manual'), add='+')
+        except Exception:
+            pass
+        self.view.log(f"診断モード ({mode}) 有効: {settings.diagnostics_dir} (Ctrl+Shift+D で書き出し)")
+
+    def _dump_diagnostics(self, reason):
+        """診断レポートをワーカースレッドで書き出す (tracemalloc のスナップショットで UI を止めない)"""
+        if self.diagnostics is None:
+            return
+        th = threading.Thread(target=self.diagnostics.dump, args=(reason,), name='amr-diagnostics-dump', daemon=True)
+        self._diagnostics_threads = [t for t in self._diagnostics_threads if t.is_alive()] + [th]
+        th.start()
+
+    def _close_diagnostics(self):
+        """終了時: 書き出し中のレポートを待ち、最後のレポートを書いてサンプラを止める"""
+        if self.diagnostics is None:
+            return
+        for th in self._diagnostics_threads:
+            th.join()
+        self.diagnostics.dump('exit')
+        self.diagnostics.close()
+        self.diagnostics = None
+
     def _wire_events(self):
         v = self.view
         v.btn_output.configure(command=self.select_output)
@@ -87,17 +159,35 @@ class RecorderController:
         v.btn_resume.configure(command=self.resume_recording)
         v.btn_stop.configure(command=self.stop_recording)
         v.btn_transcribe.configure(command=self.transcribe_and_summarize)
-        # 変数トレースでツールキット非依存の変更検知
+        v.btn_refresh_devices.configure(command=self.refresh_devices)
+        v.btn_search.configure(command=self.search_meetings)
         try:
-            self.view.mic_device_var.trace_add('write', lambda *a: self.restart_preview())
-            self.view.spk_device_var.trace_add('write', lambda *a: self.restart_preview())
+            v.search_entry.bind('<Return>', lambda e: self.search_meetings())
+        except Exception:
+            pass
+        # 変数トレースでツールキット非依存の変更検知 (再起動は間引いて実行)
+        try:
+            self.view.mic_device_var.trace_add('write', lambda *a: self._request_preview_restart())
+            self.view.spk_device_var.trace_add('write', lambda *a: self._request_preview_restart())
+        except Exception:
+            pass
+        # ウィンドウ状態でプレビューを停止/再開
+        try:
+            v.master.bind('<Unmap>', self._on_window_unmap, add='+')
+            v.master.bind('<Map>', self._on_window_map, add='+')
+            v.master.bind('<FocusOut>', self._on_focus_change, add='+')
+            v.master.bind('<FocusIn>', self._on_focus_change, add='+')
         except Exception:
             pass
 
     def _populate_devices(self):
-        devices = sd.query_devices()
-        mic_list = [d['name'] for d in devices if d['max_input_channels'] > 0]
-        spk_list = [d['name'] for d in devices if d['max_input_channels'] > 0]
+        try:
+            names = self.devices.input_names()
+        except Exception as e:
+            self.view.log(f"デバイス一覧取得エラー: {e}")
+            names = []
+        mic_list = names
+        spk_list = list(names)
         try:
             self.view.set_device_options(mic_list, spk_list)
         except Exception:
@@ -111,6 +201,43 @@ class RecorderController:
                     self.view.spk_device_combo.current(0)
             except Exception:
                 pass
+        # 選択中のデバイスが消えていれば先頭へ切り替え
+        for var, values in ((self.view.mic_device_var, mic_list), (self.view.spk_device_var, spk_list)):
+            current = var.get()
+            if current and current not in values:
+                var.set(values[0] if values else '')
+
+    def refresh_devices(self, rescan=True):
+        """デバイス一覧を再検索 (rescan=True で PortAudio 再初期化しホットプラグを反映)
+
+        [デバイス再検索] ボタンから呼ぶ。再初期化は開いている全ストリームを壊すため、
+        録音中は行わず、プレビューは止めてから再初期化し、終わったら開き直す
+        """
+        if self.is_recording:
+            self.view.log('録音中はデバイスを再検索できません')
+            return
+        if rescan:
+            self.stop_preview()
+        try:
+            changed = self.devices.refresh(rescan=rescan)
+        except Exception as e:
+            self.view.log(f"デバイス再検索エラー: {e}")
+            changed = False
+        if changed:
+            self._populate_devices()
+            self.view.log('デバイス一覧を更新しました')
+        if rescan:
+            self.start_preview()
+
+    def _schedule_device_refresh(self):
+        interval = getattr(self.model.settings, 'device_refresh_seconds', 0) or 0
+        if interval <= 0:
+            return
+        # 定期実行は開いているストリームが無いとき (ウィンドウ非アクティブでプレビュー停止中) だけ行う。
+        # プレビューを表示中に止めて開き直すと利用者の操作無しにメーターが途切れるため
+        if not self.is_recording and not self.preview_streams and not getattr(self, 'processing_minutes', False):
+            self.refresh_devices(rescan=True)
+        self.view.master.after(int(interval * 1000), self._schedule_device_refresh)
 
     def select_output(self):
         path = self.view.ask_save_text()
@@ -123,8 +250,10 @@ class RecorderController:
         path = self.view.ask_open_wav()
         if path:
             self.view.wav_path.set(path)
-            self.model.settings.wav_file = path
-            self.model.save_settings()
+            # 録音の保存先は WAV のまま (アーカイブを選んだ場合は処理対象だけ切り替える)
+            if not audio_archive.is_archive(path):
+                self.model.settings.wav_file = path
+                self.model.save_settings()
         self._update_transcribe_button_state()
 
     def _update_transcribe_button_state(self):
@@ -139,34 +268,46 @@ class RecorderController:
 
     def start_preview(self):
         self.stop_preview()
-        mic_name = self.view.mic_device_var.get()
-        spk_name = self.view.spk_device_var.get()
-        devices = sd.query_devices()
-        mic_id = [i for i,d in enumerate(devices) if d['name']==mic_name][0] if mic_name else None
-        spk_id = [i for i,d in enumerate(devices) if d['name']==spk_name][0] if spk_name else None
-        self.preview_mic_frames = []
-        self.preview_spk_frames = []
+        mic_id = self.devices.resolve(self.view.mic_device_var.get())
+        spk_id = self.devices.resolve(self.view.spk_device_var.get())
+        self._preview_ids = (mic_id, spk_id)
+        if self.preview_suspended:
+            return
+        settings = self.model.settings
+        # プレビューはレベル表示のみ (サンプルは保持しない)
         def mic_cb(indata, frames, time, status):
             if status:
                 self.view.log(f"プレビュー(マイク): {status}")
-            self.preview_mic_frames.append(indata.copy())
-            if len(self.preview_mic_frames) > 10:
-                self.preview_mic_frames.pop(0)
+            self.mic_meter.update(indata)
         def spk_cb(indata, frames, time, status):
             if status:
                 self.view.log(f"プレビュー(スピーカー): {status}")
-            self.preview_spk_frames.append(indata.copy())
-            if len(self.preview_spk_frames) > 10:
-                self.preview_spk_frames.pop(0)
-        try:
+            self.spk_meter.update(indata)
+        def shared_cb(indata, frames, time, status):
+            # 同一デバイスは 1 ストリームで両メーターを更新
+            if status:
+                self.view.log(f"プレビュー: {status}")
+            self.mic_meter.update(indata)
+            self.spk_meter.update(indata)
+        streams = []
+        if mic_id is not None and mic_id == spk_id:
+            streams.append((mic_id, shared_cb))
+        else:
             if mic_id is not None:
-                s1 = sd.InputStream(samplerate=self.model.settings.sample_rate, channels=self.model.settings.channels, device=mic_id, callback=mic_cb)
-                s1.start()
-                self.preview_streams.append(s1)
+                streams.append((mic_id, mic_cb))
             if spk_id is not None:
-                s2 = sd.InputStream(samplerate=self.model.settings.sample_rate, channels=self.model.settings.channels, device=spk_id, callback=spk_cb)
-                s2.start()
-                self.preview_streams.append(s2)
+                streams.append((spk_id, spk_cb))
+        try:
+            for device_id, cb in streams:
+                # 設定のレートを開けないデバイスは既定レートで開く (レベル表示のみなので変換しない)
+                # 大きめのブロックで受け取り、コールバック内でメーター値 (min/max/peak/RMS) へ間引く
+                rate = self.devices.capture_rate(device_id, settings.sample_rate, settings.channels,
+                                                 settings.capture_dtype)
+                blocksize = max(int(rate * settings.preview_block_ms / 1000), 0)
+                st = sd.InputStream(samplerate=rate, channels=settings.channels, dtype=settings.capture_dtype,
+                                    blocksize=blocksize, device=device_id, callback=cb)
+                st.start()
+                self.preview_streams.append(st)
         except Exception as e:
             self.view.log(f"プレビューエラー: {e}")
 
@@ -177,18 +318,89 @@ class RecorderController:
             except Exception:
                 pass
         self.preview_streams = []
-        self.preview_mic_frames = []
-        self.preview_spk_frames = []
+        self._preview_ids = None
 
     def restart_preview(self):
         if not self.is_recording:
             self.start_preview()
 
+    # ---------------- プレビュー停止/再開 (省電力) ----------------
+    def _on_window_unmap(self, event=None):
+        if event is not None and event.widget is not self.view.master:
+            return
+        self._suspend_preview()
+
+    def _on_window_map(self, event=None):
+        if event is not None and event.widget is not self.view.master:
+            return
+        self._resume_preview()
+
+    def _on_focus_change(self, event=None):
+        # 子ウィジェット間のフォーカス移動でも発火するため、確定後のフォーカスで判定
+        try:
+            self.view.master.after_idle(self._check_focus)
+        except Exception:
+            pass
+
+    def _check_focus(self):
+        try:
+            focused = self.view.master.focus_get() is not None
+        except Exception:
+            # コンボボックスのポップアップ等で取得できない場合はアプリ内とみなす
+            focused = True
+        if focused:
+            self._resume_preview()
+        elif self.model.settings.preview_pause_unfocused:
+            self._suspend_preview()
+
+    def _suspend_preview(self):
+        if self.preview_suspended or self.is_recording:
+            return
+        self.preview_suspended = True
+        self.stop_preview()
+
+    def _resume_preview(self):
+        if not self.preview_suspended:
+            return
+        self.preview_suspended = False
+        if not self.is_recording:
+            self.start_preview()
+
+    def _request_preview_restart(self, delay_ms=PREVIEW_RESTART_DELAY_MS):
+        """デバイス変更時のプレビュー再起動を間引く (最後の変更から delay_ms 後に 1 回だけ実行)"""
+        master = self.view.master
+        if self._preview_restart_job is not None:
+            try:
+                master.after_cancel(self._preview_restart_job)
+            except Exception:
+                pass
+        self._preview_restart_job = master.after(delay_ms, self._run_preview_restart)
+
+    def _run_preview_restart(self):
+        self._preview_restart_job = None
+        if self.is_recording:
+            return
+        ids = (self.devices.resolve(self.view.mic_device_var.get()),
+               self.devices.resolve(self.view.spk_device_var.get()))
+        # 同じデバイスのままなら開き直さない
+        if ids == self._preview_ids and self.preview_streams:
+            return
+        self.start_preview()
+
     def start_recording(self):
+        self.preview_suspended = False
+        mic_id = self.devices.resolve(self.view.mic_device_var.get())
+        spk_id = self.devices.resolve(self.view.spk_device_var.get())
+        if mic_id is None:
+            self.view.log('マイク入力デバイスが見つかりません。デバイスを再検索してください')
+            return
         self.stop_preview()
         self.is_recording = True
         self.is_paused = False
         self.model.reset()
+        # 履歴は会議全体を表示するため録音開始時にリセット
+        self.mic_meter.reset()
+        self.spk_meter.reset()
         self._set_states({
             self.view.btn_record: 'disabled',
             self.view.btn_pause: 'normal',
@@ -200,17 +412,17 @@ class RecorderController:
         except Exception:
             pass
         self.view.log('録音開始')
-        mic_name = self.view.mic_device_var.get()
-        spk_name = self.view.spk_device_var.get()
-        devices = sd.query_devices()
-        mic_id = [i for i,d in enumerate(devices) if d['name']==mic_name][0]
-        spk_id = [i for i,d in enumerate(devices) if d['name']==spk_name][0]
-        self.model.same_device = (mic_id == spk_id)
-        if self.model.same_device:
+        self.model.same_device = (mic_id == spk_id) or spk_id is None
+        if spk_id is None:
+            self.view.log('スピーカーデバイスが見つからないため、マイクのみ録音します')
+            self.record_thread = threading.Thread(target=self._record_loop, args=(mic_id, None))
+        elif self.model.same_device:
             self.view.log('マイクとスピーカーが同じデバイスのため、マイクのみ録音します')
             self.record_thread = threading.Thread(target=self._record_loop, args=(mic_id, None))
         else:
             self.record_thread = threading.Thread(target=self._record_loop, args=(mic_id, spk_id))
+        self.model.start_segments(logger=self.view.log)
+        self._segment_error = False
         self.record_thread.start()
         self._update_transcribe_button_state()
 
@@ -237,6 +449,7 @@ class RecorderController:
         self.is_recording = False
         if self.record_thread:
             self.record_thread.join()
+        self._dump_diagnostics('recording')
         self._set_states({
             self.view.btn_record: 'normal',
             self.view.btn_pause: 'disabled',
@@ -248,6 +461,10 @@ class RecorderController:
         except Exception:
             pass
         self.view.log('録音終了')
+        for name, st in self.buffer_stats().items():
+            if st['overflows'] or st['underflows'] or st['input_overflows'] or st['input_underflows']:
+                self.view.log(f"バッファ統計({name}): overflow={st['overflows']} (破棄 {st['dropped_frames']} frames) "
+                              f"underflow={st['underflows']} input_overflow={st['input_overflows']} input_underflow={st['input_underflows']}")
         if self.model.mix_and_save(logger=self.view.log):
             # 非同期で議事録生成
             self._start_minutes_processing()
@@ -257,63 +474,125 @@ class RecorderController:
         self._update_transcribe_button_state()
 
     def _record_loop(self, mic_id, spk_id):
+        sr = self.model.settings.sample_rate
+        ch = self.model.settings.channels
+        # int16 で受け取ればメモリは float32 の半分、保存時の変換も不要
+        dtype = self.model.settings.capture_dtype
+        # 設定のレートを開けないデバイス (44.1k / 48kHz 専用など) はデバイスのレートで録り、
+        # リングから取り出す毎に sr へリサンプルする (DC 除去も同じ段で行う)。
+        # sr で開けたストリームはそのまま保存する (DC 除去は議事録処理の分割前に行う)
+        mic_sr = self.devices.capture_rate(mic_id, sr, ch, dtype)
+        spk_sr = self.devices.capture_rate(spk_id, sr, ch, dtype) if spk_id is not None else sr
+        self._capture_pre = {}
+        for name, rate in (('mic', mic_sr), ('spk', spk_sr)):
+            if rate != sr:
+                self._capture_pre[name] = CapturePreprocessor(rate, sr, ch, self.model.settings.remove_dc)
+                self.view.log(f"録音デバイス({name})を {rate}Hz で開き {sr}Hz へ変換します")
+        # コールバックではリングへのスライス代入のみ行い、取り出しはこのスレッドでまとめて行う
+        self.mic_ring = BlockRing(mic_sr * RING_SECONDS, ch, dtype=dtype)
+        self.spk_ring = BlockRing(spk_sr * RING_SECONDS, ch, dtype=dtype) if spk_id is not None else None
+        mic_ring = self.mic_ring
+        spk_ring = self.spk_ring
         def mic_cb(indata, frames, time, status):
             if status:
-                self.view.log(f"マイク: {status}")
+                mic_ring.note_status(status)
             if not self.is_paused and self.is_recording:
-                self.model.mic_frames.append(indata.copy())
+                self.mic_meter.update(indata)
+                mic_ring.write(indata, time.inputBufferAdcTime)
         def spk_cb(indata, frames, time, status):
             if status:
-                self.view.log(f"スピーカー: {status}")
-            if not self.is_paused and self.is_recording and spk_id is not None:
-                self.model.spk_frames.append(indata.copy())
+                spk_ring.note_status(status)
+            if not self.is_paused and self.is_recording:
+                self.spk_meter.update(indata)
+                spk_ring.write(indata, time.inputBufferAdcTime)
         try:
             if spk_id is None:
-                with sd.InputStream(samplerate=self.model.settings.sample_rate, channels=self.model.settings.channels, device=mic_id, callback=mic_cb):
+                with sd.InputStream(samplerate=mic_sr, channels=ch, dtype=dtype, device=mic_id, callback=mic_cb):
                     while self.is_recording:
                         sd.sleep(100)
+                        self._drain_rings()
             else:
-                with sd.InputStream(samplerate=self.model.settings.sample_rate, channels=self.model.settings.channels, device=mic_id, callback=mic_cb), \
-                     sd.InputStream(samplerate=self.model.settings.sample_rate, channels=self.model.settings.channels, device=spk_id, callback=spk_cb):
+                with sd.InputStream(samplerate=mic_sr, channels=ch, dtype=dtype, device=mic_id, callback=mic_cb), \
+                     sd.InputStream(samplerate=spk_sr, channels=ch, dtype=dtype, device=spk_id, callback=spk_cb):
                     while self.is_recording:
                         sd.sleep(100)
+                        self._drain_rings()
         except Exception as e:
             self.view.log(f"録音エラー: {e}")
+        # ストリーム停止後の残りを回収
+        self._drain_rings(final=True)
+
+    def _drain_rings(self, final=False):
+        """リングに溜まったサンプルをモデルへ移す (録音スレッドから呼び出し)"""
+        count_underflow = not (final or self.is_paused)
+        writer = self.model.segment_writer
+        for name, ring, frames, times in (('mic', self.mic_ring, self.model.mic_frames, self.model.mic_times),
+                                          ('spk', self.spk_ring, self.model.spk_frames, self.model.spk_times)):
+            if ring is None:
+                continue
+            chunk = ring.read(count_underflow=count_underflow)
+            ts = ring.read_timestamps()
+            pre = self._capture_pre.get(name)
+            if pre is not None:
+                chunk = pre.process(chunk)
+                ts = pre.map_timestamps(ts)
+                if final:
+                    tail = pre.flush()
+                    if tail is not None:
+                        chunk = tail if chunk is None else np.concatenate((chunk, tail))
+            if writer is not None:
+                # セグメントへ直接書き出し、メモリには溜めない
+                if chunk is not None or ts is not None:
+                    self._write_segment(writer, name, chunk, ts)
+                continue
+            if chunk is not None:
+                frames.append(chunk)
+            if ts is not None:
+                times.append(ts)
+
+    def _write_segment(self, writer, name, chunk, ts):
+        try:
+            writer.write(name, chunk, ts)
+        except Exception as e:
+            # ディスク満杯など。ログが溢れないよう最初の 1 回だけ出す
+            if not self._segment_error:
+                self._segment_error = True
+                self.view.log(f"セグメント書き込みエラー: {e}")
+
+    def buffer_stats(self):
+        """録音リングの診断カウンタ (overflow / underflow 等) を返す"""
+        stats = {}
+        if self.mic_ring is not None:
+            stats['mic'] = self.mic_ring.stats()
+        if self.spk_ring is not None:
+            stats['spk'] = self.spk_ring.stats()
+        return stats
 
     def _schedule_waveform_update(self):
-        if self.is_recording:
-            mic_frames = self.model.mic_frames
-            spk_frames = self.model.spk_frames
-            # 録音中は赤色表示
-            try:
-                self.view.line_mic.set_color('red')
-                self.view.line_spk.set_color('red')
-            except Exception:
-                pass
-        else:
-            mic_frames = self.preview_mic_frames
-            spk_frames = self.preview_spk_frames
-            # 非録音時は元の色へ戻す
-            try:
-                self.view.line_mic.set_color('lime')
-                self.view.line_spk.set_color('cyan')
-            except Exception:
-                pass
-        self.view.update_waveform(mic_frames, spk_frames)
+        if self.preview_suspended and not self.is_recording:
+            # 非表示中は描画せず間隔も延ばす
+            self.view.master.after(SUSPENDED_INTERVAL_MS, self._schedule_waveform_update)
+            return
+        # 録音中/非録音時の色分けは View 側 (set_recording_state) で行う
+        self.view.update_waveform(self.mic_meter, self.spk_meter)
         self._update_transcribe_button_state()
-        self.view.master.after(100, self._schedule_waveform_update)
+        self.view.master.after(WAVEFORM_INTERVAL_MS, self._schedule_waveform_update)
 
     def _process_minutes(self):
-        lang = 'ja' if self.view.lang_var.get().startswith('日本語') else 'en'
+        # 表示名末尾の "(ja)" / "(en)" / "(auto)" から言語コードを取り出す
+        lang = self.view.lang_var.get().rsplit('(', 1)[-1].rstrip(')') or 'ja'
+        voice = self.view.wav_path.get() or self.model.settings.wav_file
         result = ai_control.create_meeting_report(
             self.view.prompt_entry.get('1.0', 'end'),
-            self.model.settings.wav_file,
+            voice,
             self.model.settings.chunk_dir,
-            self.model.settings.record_seconds,
+            self.model.settings.split_seconds(),
             self.view.output_path.get(),
             self.view.gemini_key_var.get(),
             logger=self.view.log,
-            lang=lang
+            lang=lang,
+            whisper_model=self.model.settings.whisper_model,
+            options=ai_control.PipelineOptions.from_settings(self.model.settings)
         )
         # 念のため None ガード
         if result is None:
@@ -325,8 +604,39 @@ class RecorderController:
         else:
             if result.get('summary_file'):
                 self.view.log(f"要約ファイル: {result['summary_file']}")
+            self._archive_recording(voice)
         return result
 
+    def _archive_recording(self, voice):
+        """議事録処理の済んだ WAV を設定に応じて FLAC / Opus へ圧縮 (議事録処理スレッドから呼び出し)"""
+        codec = self.model.settings.archive_codec
+        if not codec or audio_archive.is_archive(voice):
+            return
+        remove = self.model.settings.archive_remove_wav
+        archive = audio_archive.archive_recording(voice, codec, remove_source=remove, logger=self.view.log)
+        if archive and remove:
+            # WAV を消したので、再処理の対象はアーカイブにする
+            self.view.master.after(0, lambda: self.view.wav_path.set(archive))
+
+    def search_meetings(self):
+        query = self.view.search_var.get().strip()
+        db = self.model.settings.meeting_db
+        if not query:
+            return
+        if not db:
+            self.view.log('会議アーカイブが無効です (設定 meeting_db に保存先を指定すると議事録処理後に登録されます)')
+            return
+        if not os.path.exists(db):
+            self.view.log('会議アーカイブがまだありません (議事録処理後に作成されます)')
+            return
+        try:
+            with meeting_store.MeetingStore(db) as store:
+                hits = store.search(query, limit=SEARCH_LIMIT)
+        except Exception as e:
+            self.view.log(f"議事録検索失敗: {e}")
+            return
+        self.view.show_search_results(query, [meeting_store.format_hit(h) for h in hits])
+
     def transcribe_and_summarize(self):
         wav_file = self.view.wav_path.get()
         if not os.path.exists(wav_file):
@@ -342,6 +652,7 @@ class RecorderController:
             return
         self.processing_minutes = True
         self._show_processing_overlay()
+        self._start_transcript_tail(self.view.output_path.get())
         # 処理中は関連ボタンを無効化
         self._set_states({
             self.view.btn_record: 'disabled',
@@ -368,6 +679,7 @@ class RecorderController:
             result = {'success': False, 'error': 'unexpected result object'}
         self.processing_minutes = False
         self._hide_processing_overlay()
+        self._dump_diagnostics('minutes')
         # ボタン再有効化
         self._set_states({
             self.view.btn_record: 'normal',
@@ -481,6 +793,11 @@ class RecorderController:
                             self.view.log('GIFフレームが読み込めません (フォールバック)')
                 except Exception as e:
                     self.view.log(f"GIF読み込み失敗: {e}")
+            # 文字起こしの途中経過 (チャンク完了毎に出力ファイルから追記)
+            tail_box = tk.Text(top, height=10, width=70, wrap='word', bg='#002244', fg=FG_COLOR,
+                               insertbackground=FG_COLOR, state='disabled')
+            tail_box.pack(padx=10, pady=(0, 10), fill='both', expand=True)
+            top._tail_box = tail_box
             # 中央配置
             try:
                 top.update_idletasks()
@@ -494,6 +811,55 @@ class RecorderController:
         except Exception as e:
             self.view.log(f"処理中画面表示エラー: {e}")
 
+    def _start_transcript_tail(self, path):
+        """議事録処理中、出力テキストの追記分を処理中画面へ流す"""
+        self._tail_path = path
+        self._tail_offset = 0
+        self._tail_inode = None
+        self._tail_since = time.time()
+        self._tail_decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.view.master.after(TRANSCRIPT_TAIL_MS, self._tail_transcript)
+
+    def _tail_transcript(self):
+        if not self.processing_minutes:
+            return
+        try:
+            self._read_transcript_tail()
+        except Exception:
+            pass
+        self.view.master.after(TRANSCRIPT_TAIL_MS, self._tail_transcript)
+
+    def _read_transcript_tail(self):
+        path = self._tail_path
+        # 前回実行の古いファイルは表示しない
+        if not path or not os.path.exists(path) or os.path.getmtime(path) < self._tail_since - 1:
+            return
+        box = getattr(getattr(self, 'processing_overlay', None), '_tail_box', None)
+        if box is None:
+            return
+        with open(path, 'rb') as f:
+            # 開いたファイル自体を stat し、判定と読み込みが同じファイルを指すようにする
+            st = os.fstat(f.fileno())
+            # 書き直し (再文字起こし・チャンネル統合) は別ファイルへの置き換えになる → 先頭から読み直す
+            if st.st_ino != self._tail_inode or st.st_size < self._tail_offset:
+                self._tail_inode = st.st_ino
+                self._tail_offset = 0
+                self._tail_decoder.reset()
+                box.configure(state='normal')
+                box.delete('1.0', 'end')
+                box.configure(state='disabled')
+            if st.st_size == self._tail_offset:
+                return
+            f.seek(self._tail_offset)
+            data = f.read(st.st_size - self._tail_offset)
+        self._tail_offset += len(data)
+        text = self._tail_decoder.decode(data)
+        if text:
+            box.configure(state='normal')
+            box.insert('end', text)
+            box.see('end')
+            box.configure(state='disabled')
+
     def _hide_processing_overlay(self):
         top = getattr(self, 'processing_overlay', None)
         if not top:
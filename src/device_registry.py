@@ -0,0 +1,94 @@
+"""オーディオデバイス一覧のキャッシュ
+
+sd.query_devices() の結果を保持し、デバイス名 → ID を辞書で引けるようにする。
+PortAudio は初期化時点のデバイス一覧しか返さないため、USB マイクの抜き差しを
+検出したい場合は refresh(rescan=True) で PortAudio を再初期化してから読み直す。
+
+再初期化は sounddevice の非公開関数 sd._terminate() / sd._initialize() (0.4 系) に依存する。
+PortAudio を終了すると開いている全ストリームが無効になるため、呼び出し側で全ストリームを
+閉じてから呼ぶこと (録音中・プレビュー中は不可)。関数が無いバージョンでは再初期化せずに読み直す。
+"""
+
+from typing import Dict, List, Optional
+
+try:
+    import sounddevice as sd
+except Exception:  # PortAudio 未導入環境
+    sd = None
+
+
+class DeviceRegistry:
+    def __init__(self):
+        self._devices: List[dict] = []
+        self._input_ids: Dict[str, int] = {}
+        self._input_names: List[str] = []
+        self._signature = None
+
+    def refresh(self, rescan: bool = False) -> bool:
+        """デバイス一覧を読み直す。前回から変化していれば True
+
+        rescan=True は開いているストリームが無いときだけ呼ぶ (モジュール説明参照)
+        """
+        if sd is None:
+            raise RuntimeError('sounddevice が利用できません')
+        if rescan:
+            self._reinitialize()
+        devices = [dict(d) for d in sd.query_devices()]
+        input_ids: Dict[str, int] = {}
+        input_names: List[str] = []
+        for i, d in enumerate(devices):
+            if d.get('max_input_channels', 0) > 0 and d['name'] not in input_ids:
+                # 同名デバイスは先頭を採用 (従来のリスト内包 [0] と同じ)
+                input_ids[d['name']] = i
+                input_names.append(d['name'])
+        signature = tuple((d['name'], d.get('max_input_channels', 0), d.get('hostapi')) for d in devices)
+        changed = signature != self._signature
+        self._devices = devices
+        self._input_ids = input_ids
+        self._input_names = input_names
+        self._signature = signature
+        return changed
+
+    @staticmethod
+    def _reinitialize() -> bool:
+        """PortAudio を再初期化してホットプラグを反映する (非公開 API が無ければ何もしない)"""
+        terminate = getattr(sd, '_terminate', None)
+        initialize = getattr(sd, '_initialize', None)
+        if terminate is None or initialize is None:
+            return False
+        terminate()
+        # 失敗すると PortAudio が未初期化のまま残るため、例外は呼び出し側へ伝えてログに出す
+        initialize()
+        return True
+
+    def _ensure_loaded(self):
+        if self._signature is None:
+            self.refresh()
+
+    def input_names(self) -> List[str]:
+        self._ensure_loaded()
+        return list(self._input_names)
+
+    def resolve(self, name: Optional[str]) -> Optional[int]:
+        """デバイス名から ID を返す。見つからなければ None"""
+        if not name:
+            return None
+        self._ensure_loaded()
+        return self._input_ids.get(name)
+
+    def info(self, device_id: int) -> Optional[dict]:
+        self._ensure_loaded()
+        if device_id is None or not (0 <= device_id < len(self._devices)):
+            return None
+        return self._devices[device_id]
+
+    def capture_rate(self, device_id: Optional[int], rate: int, channels: int, dtype) -> int:
+        """device_id で rate が開けるならそのまま、開けなければデバイスの既定レートを返す"""
+        try:
+            sd.check_input_settings(device=device_id, samplerate=rate, channels=channels, dtype=dtype)
+            return rate
+        except Exception:
+            pass
+        info = self.info(device_id) or {}
+        default = info.get('default_samplerate')
+        return int(default) if default else rate
@@ -0,0 +1,269 @@
+"""診断モード (サンプリングプロファイラ / cProfile / tracemalloc)
+
+「1 時間ほど使うと重くなる」といった報告の調査用。有効時は録音ループ・波形更新・議事録処理を
+区間 (section) としてラップし、以下を diagnostics フォルダへ書き出す。
+
+ - samples.folded / samples_top.txt : 区間実行中スレッドのスタックを一定間隔でサンプリングした結果
+                                      (folded 形式は flamegraph.pl / speedscope でそのまま読める)
+ - cprofile_<区間>.txt / .prof       : mode='cprofile' の場合のみ。区間内の決定的プロファイル
+ - tracemalloc.txt                   : 確保メモリの上位行と、診断開始時からの増加分
+ - sections.json                     : 区間毎の呼び出し回数・合計/最大時間、RSS
+
+有効化: 設定 diagnostics: true、または環境変数 AMR_DIAGNOSTICS=1 (sample) / cprofile。
+書き出し: 録音終了時・議事録処理終了時 (ワーカースレッド)、GUI で Ctrl+Shift+D、および終了時。
+"""
+
+from collections import Counter
+from typing import Callable, Dict, Optional
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import psutil
+except Exception:
+    psutil = None
+
+ENV_VAR = 'AMR_DIAGNOSTICS'
+MODES = ('sample', 'cprofile')
+SAMPLE_INTERVAL = 0.01      # スタックサンプリング間隔 (秒)
+TRACEMALLOC_FRAMES = 10     # 確保箇所として保持するスタック深さ
+TOP_LINES = 40              # レポートに載せる上位件数
+
+
+def resolve_mode(setting_enabled: bool = False, setting_mode: str = 'sample') -> Optional[str]:
+    """環境変数 > 設定 の順で診断モードを決める。無効なら None"""
+    env = os.environ.get(ENV_VAR, '').strip().lower()
+    if env in ('0', 'false', 'off', 'no'):
+        return None
+    if env in MODES:
+        return env
+    if env:
+        return 'sample'
+    if setting_enabled:
+        return setting_mode if setting_mode in MODES else 'sample'
+    return None
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class _StackSampler(threading.Thread):
+    """区間実行中のスレッドだけを対象にスタックを数える"""
+
+    def __init__(self, diag, interval: float):
+        super().__init__(name='amr-diagnostics-sampler', daemon=True)
+        self.diag = diag
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            active = self.diag._active_threads()
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for tid, section in active.items():
+                frame = frames.get(tid)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(section)
+                self.diag._add_sample(';'.join(reversed(stack)))
+
+
+class Diagnostics:
+    def __init__(self, out_dir: str, mode: str = 'sample', interval: float = SAMPLE_INTERVAL,
+                 logger: Optional[Callable[[str], None]] = None):
+        self.out_dir = out_dir
+        self.mode = mode
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._samples: Counter = Counter()
+        self._active: Dict[int, str] = {}
+        self._sections: Dict[str, dict] = {}
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._started = time.time()
+        self._owns_tracemalloc = not tracemalloc.is_tracing()
+        if self._owns_tracemalloc:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._baseline = tracemalloc.take_snapshot()
+        self._sampler = _StackSampler(self, interval)
+        self._sampler.start()
+
+    # ---------------- 区間 ----------------
+    def _active_threads(self) -> Dict[int, str]:
+        with self._lock:
+            return dict(self._active)
+
+    def _add_sample(self, stack: str):
+        with self._lock:
+            self._samples[stack] += 1
+
+    def wrap(self, section: str, fn: Callable) -> Callable:
+        """fn の実行を区間 section として計測するラッパを返す"""
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tid = threading.get_ident()
+            with self._lock:
+                outer = self._active.get(tid)
+                self._active[tid] = section
+            profile = None
+            if self.mode == 'cprofile' and outer is None:
+                with self._lock:
+                    profile = self._profiles.setdefault(section, cProfile.Profile())
+                try:
+                    profile.enable()
+                except ValueError:  # 別スレッドで同じプロファイラが有効
+                    profile = None
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                if profile is not None:
+                    profile.disable()
+                with self._lock:
+                    if outer is None:
+                        self._active.pop(tid, None)
+                    else:
+                        self._active[tid] = outer
+                    st = self._sections.setdefault(section, {'calls': 0, 'total_seconds': 0.0, 'max_seconds': 0.0})
+                    st['calls'] += 1
+                    st['total_seconds'] += elapsed
+                    st['max_seconds'] = max(st['max_seconds'], elapsed)
+        return wrapper
+
+    # ---------------- 書き出し ----------------
+    def dump(self, reason: str = 'manual') -> Optional[str]:
+        """現在までの結果をフォルダへ書き出し、サンプル/区間統計をリセットする。書き出し先を返す"""
+        base = os.path.join(self.out_dir, time.strftime('%Y%m%d-%H%M%S') + f"-{reason}")
+        path = base
+        n = 1
+        while os.path.exists(path):
+            n += 1
+            path = f"{base}-{n}"
+        try:
+            os.makedirs(path, exist_ok=True)
+            with self._lock:
+                samples, self._samples = self._samples, Counter()
+                sections, self._sections = self._sections, {}
+                profiles = dict(self._profiles)
+            self._write_samples(path, samples)
+            self._write_profiles(path, profiles)
+            self._write_tracemalloc(path)
+            with open(os.path.join(path, 'sections.json'), 'w', encoding='utf-8') as f:
+                json.dump({'reason': reason, 'mode': self.mode, 'uptime_seconds': round(time.time() - self._started, 1),
+                           'rss_mb': _rss_mb(), 'sections': sections}, f, ensure_ascii=False, indent=1)
+        except Exception as e:
+            self._log(f"診断レポート書き出し失敗: {e}")
+            return None
+        self._log(f"診断レポート: {path}")
+        return path
+
+    def _write_samples(self, path: str, samples: Counter):
+        with open(os.path.join(path, 'samples.folded'), 'w', encoding='utf-8') as f:
+            for stack, n in samples.most_common():
+                f.write(f"{stack} {n}\n")
+        total = sum(samples.values()) or 1
+        self_counts: Counter = Counter()
+        inclusive: Counter = Counter()
+        for stack, n in samples.items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += n
+            for name in set(frames):
+                inclusive[name] += n
+        lines = [f"samples: {sum(samples.values())} (interval {self._sampler.interval * 1000:.0f} ms)", '',
+                 'self (その関数自体で止まっていた割合)']
+        lines += [f"  {100 * n / total:5.1f}%  {name}" for name, n in self_counts.most_common(TOP_LINES)]
+        lines += ['', 'inclusive (呼び出し先を含む割合)']
+        lines += [f"  {100 * n / total:5.1f}%  {name}" for name, n in inclusive.most_common(TOP_LINES)]
+        with open(os.path.join(path, 'samples_top.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def _write_profiles(self, path: str, profiles: Dict[str, cProfile.Profile]):
+        for section, profile in profiles.items():
+            try:
+                profile.dump_stats(os.path.join(path, f"cprofile_{section}.prof"))
+                buf = io.StringIO()
+                pstats.Stats(profile, stream=buf).sort_stats('cumulative').print_stats(TOP_LINES)
+                with open(os.path.join(path, f"cprofile_{section}.txt"), 'w', encoding='utf-8') as f:
+                    f.write(buf.getvalue())
+            except Exception as e:
+                self._log(f"cProfile 書き出し失敗 ({section}): {e}")
+
+    def _write_tracemalloc(self, path: str):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced: current {current / 2**20:.1f} MiB / peak {peak / 2**20:.1f} MiB", '', '上位の確保箇所']
+        lines += [f"  {stat}" for stat in snapshot.statistics('lineno')[:TOP_LINES]]
+        lines += ['', '診断開始時からの増加']
+        lines += [f"  {stat}" for stat in snapshot.compare_to(self._baseline, 'lineno')[:TOP_LINES]]
+        with open(os.path.join(path, 'tracemalloc.txt'), 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def _log(self, msg: str):
+        if self.logger:
+            try:
+                self.logger(msg)
+            except Exception:
+                pass
+
+    def close(self):
+        """サンプラを止め、自分で開始した tracemalloc を止める (以後 dump は使えない)"""
+        self._sampler.stop_event.set()
+        self._sampler.join(timeout=1.0)
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+
+
+def _rss_bytes_windows() -> Optional[int]:
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    kernel32 = ctypes.WinDLL('kernel32')
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi = ctypes.WinDLL('psapi')
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return counters.WorkingSetSize
+
+
+def _rss_mb() -> Optional[float]:
+    """常駐メモリ (MiB)。psutil があれば使い、無ければ Windows は GetProcessMemoryInfo、Linux は /proc"""
+    try:
+        if psutil is not None:
+            rss = psutil.Process().memory_info().rss
+        elif sys.platform == 'win32':
+            rss = _rss_bytes_windows()
+        else:
+            with open('/proc/self/statm') as f:
+                rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        return None
+    return None if rss is None else round(rss / 2**20, 1)
@@ -0,0 +1,106 @@
+"""音声レベルメーター
+
+録音/プレビューのコールバックからブロック毎に update() を呼び、
+ピーク・RMS と会議全体の min/max 履歴を保持する。
+
+ - ブロック処理はベクトル演算のみ (作業用バッファを再利用しアロケーションなし)
+ - 履歴は固定長配列。満杯になると隣接ビンを統合して解像度を半分にするため、
+   録音時間に関わらずメモリ・描画コストは一定
+ - GUI スレッドは copy_history() で自前のバッファへ写してから描画する
+ - int16 ブロックはフルスケール 1.0 に正規化して扱う
+"""
+
+import math
+import threading
+import numpy as np
+
+HISTORY_BINS = 600  # 履歴ビン数 (偶数)
+INT16_SCALE = 1.0 / 32768.0
+
+
+def to_dbfs(level: float) -> float:
+    """振幅 (0..1) を dBFS に変換 (無音は -120dB)"""
+    if level <= 1e-6:
+        return -120.0
+    return 20.0 * math.log10(level)
+
+
+class LevelMeter:
+    def __init__(self, bins: int = HISTORY_BINS, block_capacity: int = 4096):
+        if bins < 2 or bins % 2:
+            raise ValueError('bins は 2 以上の偶数を指定してください')
+        self.bins = bins
+        self.hist_min = np.zeros(bins, dtype=np.float32)
+        self.hist_max = np.zeros(bins, dtype=np.float32)
+        self._scratch = np.empty(block_capacity, dtype=np.float32)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.peak = 0.0
+            self.rms = 0.0
+            self.hist_min[:] = 0
+            self.hist_max[:] = 0
+            self.count = 0           # 使用中のビン数
+            self.blocks_per_bin = 1  # 1ビンあたりのブロック数 (統合の度に倍増)
+            self._pending = 0        # 現在ビンへ積算済みのブロック数
+            self.total_blocks = 0
+
+    def update(self, indata):
+        """1ブロック分のレベルを反映 (音声コールバックから呼び出し)"""
+        x = indata.reshape(-1)
+        n = x.shape[0]
+        if n == 0:
+            return
+        scale = INT16_SCALE if x.dtype.kind == 'i' else 1.0
+        mx = float(x.max()) * scale
+        mn = float(x.min()) * scale
+        if n > self._scratch.shape[0]:
+            # ブロックサイズが想定より大きい場合のみ再確保
+            self._scratch = np.empty(n, dtype=np.float32)
+        sq = self._scratch[:n]
+        np.multiply(x, x, out=sq, dtype=np.float32)
+        rms = math.sqrt(float(sq.sum()) / n) * scale
+        with self._lock:
+            self.peak = max(mx, -mn)
+            self.rms = rms
+            if self._pending == 0:
+                if self.count == self.bins:
+                    self._compact()
+                i = self.count
+                self.count += 1
+                self.hist_min[i] = mn
+                self.hist_max[i] = mx
+            else:
+                i = self.count - 1
+                if mn < self.hist_min[i]:
+                    self.hist_min[i] = mn
+                if mx > self.hist_max[i]:
+                    self.hist_max[i] = mx
+            self._pending += 1
+            if self._pending >= self.blocks_per_bin:
+                self._pending = 0
+            self.total_blocks += 1
+
+    def _compact(self):
+        """隣接ビンを統合して履歴を半分に詰める (ロック取得済みで呼ぶ)"""
+        half = self.bins // 2
+        np.minimum(self.hist_min[0::2], self.hist_min[1::2], out=self.hist_min[:half])
+        np.maximum(self.hist_max[0::2], self.hist_max[1::2], out=self.hist_max[:half])
+        self.hist_min[half:] = 0
+        self.hist_max[half:] = 0
+        self.count = half
+        self.blocks_per_bin *= 2
+
+    def copy_history(self, out_min, out_max) -> int:
+        """履歴を呼び出し側のバッファへコピーし、有効ビン数を返す"""
+        with self._lock:
+            c = self.count
+            out_min[:c] = self.hist_min[:c]
+            out_max[:c] = self.hist_max[:c]
+        return c
+
+    def levels(self):
+        """(peak, rms) を返す"""
+        return self.peak, self.rms
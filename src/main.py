@@ -3,6 +3,7 @@ import threading
 import time
 import os
 from .controller import RecorderController
+from .model import RecorderModel
 from .view import BG_COLOR, FG_COLOR
 from . import ai_control
 from .resource_util import resource_path
@@ -82,7 +83,11 @@ def main():
 
     def preload():
         start = time.time()
-        ai_control.preload_models(logger=lambda m: None)
+        settings = RecorderModel().settings
+        # "auto" は音声長が分かるまでモデルが決まらないため既定モデルを先読み
+        model = settings.whisper_model if settings.whisper_model != 'auto' else 'small'
+        ai_control.preload_models(logger=lambda m: None, whisper_model=model, backend=settings.asr_backend,
+                                  asr_options=settings.asr_options())
         load_done['ok'] = True
         elapsed = time.time() - start
         # 体感で一瞬で消えないよう最小表示時間
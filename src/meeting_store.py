@@ -0,0 +1,272 @@
+"""会議アーカイブ (SQLite + FTS5 全文検索)
+
+create_meeting_report の結果 (会議メタデータ・タイムスタンプ付きセグメント・要約) を 1 つの
+SQLite ファイルへ蓄積し、数千件の会議を横断して検索する。ヒットは録音先頭からのミリ秒で返すので、
+そのまま音声の再生位置に使える。
+
+ - 全文索引は FTS5 の trigram トークナイザ (分かち書きの無い日本語でも部分一致できる)。
+   trigram が使えない SQLite では unicode61 にフォールバックする
+ - trigram は 3 文字以上の語しか索引を引けないため、2 文字以下の語 (「予算」等) は
+   索引で絞った結果への instr 条件、語が全て短い場合は本文の走査で探す
+ - 同じ録音 (パス・更新時刻・サイズが同じ) を再処理した場合は古い記録を置き換える
+
+    python -m src.meeting_store search 予算 --db meetings.db
+    python -m src.meeting_store list --db meetings.db
+"""
+
+from typing import Dict, Iterable, List, Optional
+import argparse
+import os
+import sqlite3
+import time
+
+SCHEMA_VERSION = 1
+MIN_TRIGRAM_CHARS = 3
+SNIPPET_TOKENS = 12
+SNIPPET_CHARS = 24  # 走査検索時の前後文字数
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meetings (
+    id INTEGER PRIMARY KEY,
+    created TEXT NOT NULL,
+    title TEXT,
+    audio_path TEXT,
+    transcript_path TEXT,
+    summary_path TEXT,
+    language TEXT,
+    model TEXT,
+    duration_ms INTEGER,
+    summary TEXT,
+    source_key TEXT
+);
+CREATE INDEX IF NOT EXISTS meetings_source ON meetings(source_key);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    meeting_id INTEGER NOT NULL REFERENCES meetings(id) ON DELETE CASCADE,
+    start_ms INTEGER NOT NULL,
+    end_ms INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_meeting ON segments(meeting_id, start_ms);
+"""
+
+_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(text, content='segments', content_rowid='id', tokenize='{tok}');
+CREATE VIRTUAL TABLE IF NOT EXISTS summaries_fts USING fts5(summary, content='meetings', content_rowid='id', tokenize='{tok}');
+CREATE TRIGGER IF NOT EXISTS segments_ai AFTER INSERT ON segments BEGIN
+    INSERT INTO segments_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS segments_ad AFTER DELETE ON segments BEGIN
+    INSERT INTO segments_fts(segments_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS meetings_ai AFTER INSERT ON meetings BEGIN
+    INSERT INTO summaries_fts(rowid, summary) VALUES (new.id, coalesce(new.summary, ''));
+END;
+CREATE TRIGGER IF NOT EXISTS meetings_ad AFTER DELETE ON meetings BEGIN
+    INSERT INTO summaries_fts(summaries_fts, rowid, summary) VALUES ('delete', old.id, coalesce(old.summary, ''));
+END;
+"""
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def source_key(audio_path: str) -> Optional[str]:
+    """録音ファイルの同一性キー (同じファイルの再処理を判定する)"""
+    try:
+        st = os.stat(audio_path)
+    except OSError:
+        return None
+    return f"{os.path.abspath(audio_path)}:{int(st.st_mtime)}:{st.st_size}"
+
+
+def _segment_text(seg: dict) -> str:
+    # チャンネル別文字起こしの話者ラベルは本文の先頭に残す (asr_backend.segment_text と同じ形)
+    return f"[{seg['speaker']}] {seg['text']}" if seg.get('speaker') else seg['text']
+
+
+def format_ms(ms: Optional[int]) -> str:
+    if ms is None:
+        return '--:--'
+    s, ms = divmod(int(ms), 1000)
+    h, s = divmod(s, 3600)
+    return f"{h:d}:{s // 60:02d}:{s % 60:02d}.{ms:03d}"
+
+
+class MeetingStore:
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=5.0)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        try:
+            self.conn.execute('PRAGMA journal_mode = WAL')  # 検索中も書き込める
+        except sqlite3.DatabaseError:
+            pass
+        self._init_schema()
+
+    def _init_schema(self):
+        with self.conn:
+            self.conn.executescript(_SCHEMA)
+            try:
+                self.conn.executescript(_FTS.format(tok='trigram'))
+            except sqlite3.OperationalError:
+                # SQLite 3.34 未満は trigram 無し
+                self.conn.executescript(_FTS.format(tok='unicode61'))
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        row = self.conn.execute("SELECT sql FROM sqlite_master WHERE name = 'segments_fts'").fetchone()
+        self.trigram = 'trigram' in (row['sql'] if row else '')
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------------- 登録 ----------------
+    def add_meeting(self, segments: Iterable[dict], title: Optional[str] = None, audio_path: Optional[str] = None,
+                    transcript_path: Optional[str] = None, summary_path: Optional[str] = None,
+                    summary: Optional[str] = None, language: Optional[str] = None, model: Optional[str] = None,
+                    duration_seconds: Optional[float] = None, created: Optional[str] = None) -> int:
+        """会議を登録して id を返す。segments は録音先頭からの秒の {'start', 'end', 'text'} (+ 'speaker')
+
+        segments はイテレータでもよい (duration_seconds を渡せば 1 回の走査で登録する)
+        """
+        if duration_seconds is None:
+            segments = list(segments)
+            duration_seconds = max((seg['end'] for seg in segments), default=None)
+        key = source_key(audio_path) if audio_path else None
+        with self.conn:
+            if key:
+                self.conn.execute('DELETE FROM meetings WHERE source_key = ?', (key,))
+            cur = self.conn.execute(
+                'INSERT INTO meetings (created, title, audio_path, transcript_path, summary_path, language, model,'
+                ' duration_ms, summary, source_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (created or time.strftime('%Y-%m-%d %H:%M:%S'), title, audio_path, transcript_path, summary_path,
+                 language, model, None if duration_seconds is None else int(round(duration_seconds * 1000)), summary,
+                 key))
+            meeting_id = cur.lastrowid
+            self.conn.executemany(
+                'INSERT INTO segments (meeting_id, start_ms, end_ms, text) VALUES (?, ?, ?, ?)',
+                ((meeting_id, int(round(seg['start'] * 1000)), int(round(seg['end'] * 1000)), _segment_text(seg))
+                 for seg in segments if seg.get('text')))
+        return meeting_id
+
+    def delete_meeting(self, meeting_id: int):
+        with self.conn:
+            self.conn.execute('DELETE FROM meetings WHERE id = ?', (meeting_id,))
+
+    # ---------------- 参照 ----------------
+    def list_meetings(self, limit: int = 100) -> List[dict]:
+        rows = self.conn.execute(
+            'SELECT m.id, m.created, m.title, m.audio_path, m.transcript_path, m.duration_ms,'
+            ' (SELECT count(*) FROM segments s WHERE s.meeting_id = m.id) AS segments'
+            ' FROM meetings m ORDER BY m.created DESC, m.id DESC LIMIT ?', (limit,))
+        return [dict(r) for r in rows]
+
+    def get_segments(self, meeting_id: int) -> List[dict]:
+        rows = self.conn.execute('SELECT start_ms, end_ms, text FROM segments WHERE meeting_id = ? ORDER BY start_ms',
+                                 (meeting_id,))
+        return [dict(r) for r in rows]
+
+    # ---------------- 検索 ----------------
+    def search(self, query: str, limit: int = 50, include_summaries: bool = True) -> List[dict]:
+        """全語を含むセグメント (と要約) をそれぞれ最大 limit 件、関連度順に返す
+
+        Returns: [{'kind': 'segment' | 'summary', 'meeting_id', 'title', 'created', 'audio_path',
+                   'start_ms', 'end_ms', 'snippet'}, ...]
+        """
+        terms = query.split()
+        if not terms:
+            return []
+        hits = self._search_table('segment', terms, limit)
+        if include_summaries:
+            hits += self._search_table('summary', terms, limit)
+        return hits
+
+    def _search_table(self, kind: str, terms: List[str], limit: int) -> List[dict]:
+        if kind == 'segment':
+            fts, column, table, alias = 'segments_fts', 'text', 'segments', 's'
+            select = ('s.meeting_id, s.start_ms, s.end_ms, m.title, m.created, m.audio_path, s.text AS body')
+            join = 'JOIN meetings m ON m.id = s.meeting_id'
+        else:
+            fts, column, table, alias = 'summaries_fts', 'summary', 'meetings', 'm'
+            select = ('m.id AS meeting_id, NULL AS start_ms, NULL AS end_ms, m.title, m.created, m.audio_path,'
+                      ' m.summary AS body')
+            join = ''
+        if self.trigram:
+            indexed = [t for t in terms if len(t) >= MIN_TRIGRAM_CHARS]
+            scanned = [t for t in terms if len(t) < MIN_TRIGRAM_CHARS]
+        else:
+            indexed, scanned = terms, []
+        where = [f'instr({alias}.{column}, ?) > 0' for _ in scanned]
+        params: list = list(scanned)
+        if indexed:
+            sql = (f'SELECT {select}, snippet({fts}, 0, \'[\', \']\', \'…\', {SNIPPET_TOKENS}) AS snippet'
+                   f' FROM {fts} JOIN {table} {alias} ON {alias}.rowid = {fts}.rowid {join}'
+                   f' WHERE {fts} MATCH ?' + ''.join(f' AND {w}' for w in where) +
+                   f' ORDER BY bm25({fts}) LIMIT ?')
+            params = [' '.join(_fts_phrase(t) for t in indexed)] + params + [limit]
+        else:
+            # 短い語だけ → 索引を使えないので本文を走査 (新しい会議から)
+            sql = (f'SELECT {select}, NULL AS snippet FROM {table} {alias} {join}'
+                   f' WHERE ' + ' AND '.join(where) +
+                   (' ORDER BY m.created DESC, s.start_ms' if kind == 'segment' else ' ORDER BY m.created DESC') +
+                   ' LIMIT ?')
+            params = params + [limit]
+        hits = []
+        for r in self.conn.execute(sql, params):
+            hit = dict(r)
+            body = hit.pop('body') or ''
+            if not hit['snippet'] or scanned:
+                hit['snippet'] = _snippet(body, terms)
+            hit['kind'] = kind
+            hits.append(hit)
+        return hits
+
+
+def _snippet(text: str, terms: List[str]) -> str:
+    """最初に現れた語の前後を切り出し、語を [ ] で囲む"""
+    pos = min((text.find(t) for t in terms if t in text), default=0)
+    start = max(pos - SNIPPET_CHARS, 0)
+    end = min(pos + SNIPPET_CHARS * 2, len(text))
+    part = text[start:end]
+    for t in sorted(set(terms), key=len, reverse=True):
+        part = part.replace(t, f'[{t}]')
+    return ('…' if start > 0 else '') + part + ('…' if end < len(text) else '')
+
+
+def format_hit(hit: Dict) -> str:
+    where = format_ms(hit['start_ms']) if hit['kind'] == 'segment' else '要約'
+    return f"{hit['created']} {hit['title'] or ''} [{where}] {hit['snippet']}"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='会議アーカイブの検索')
+    ap.add_argument('--db', required=True, help='会議アーカイブ (設定 meeting_db のパス)')
+    sub = ap.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('search', help='文字起こし・要約を全文検索')
+    p.add_argument('query', nargs='+')
+    p.add_argument('--limit', type=int, default=50)
+    p = sub.add_parser('list', help='登録済みの会議一覧')
+    p.add_argument('--limit', type=int, default=100)
+    args = ap.parse_args(argv)
+    with MeetingStore(args.db) as store:
+        if args.command == 'search':
+            for hit in store.search(' '.join(args.query), limit=args.limit):
+                print(format_hit(hit))
+        else:
+            for m in store.list_meetings(args.limit):
+                print(f"{m['id']:5d} {m['created']} {format_ms(m['duration_ms'])} {m['segments']:6d} seg  "
+                      f"{m['title'] or ''}  {m['audio_path'] or ''}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,114 @@
+"""議事録パイプラインの工程別計測
+
+create_meeting_report の各工程 (WAV 読み込み・分割・モデルロード・チャンク毎の文字起こし・
+Gemini 要約・ファイル書き込み) の所要時間と、文字起こしの実時間係数 (RTF = 処理秒 / 音声秒) を集める。
+
+    metrics = PipelineMetrics()
+    with metrics.stage('split'):
+        ...
+    metrics.chunk(index, audio_seconds, speech_seconds, elapsed)
+    metrics.summary()       # result['metrics'] に入れる dict
+    metrics.format_lines()  # GUI ログ向けの表
+
+jsonl_path を指定すると記録 1 件毎に JSON Lines で追記し、最後に summary を書く。
+"""
+
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import json
+import threading
+import time
+
+
+class PipelineMetrics:
+    def __init__(self, jsonl_path: Optional[str] = None, run_id: Optional[str] = None):
+        self.jsonl_path = jsonl_path
+        self.run_id = run_id or time.strftime('%Y%m%d-%H%M%S')
+        self.started = time.perf_counter()
+        self.records: List[dict] = []
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _emit(self, record: dict):
+        record = dict(record, run=self.run_id)
+        with self._lock:
+            self.records.append(record)
+            if not self.jsonl_path:
+                return
+            try:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            except Exception:
+                # 計測の失敗で本処理を止めない
+                self.jsonl_path = None
+
+    def add(self, stage: str, seconds: float, **fields):
+        self._emit({'type': 'stage', 'stage': stage, 'seconds': round(seconds, 4), **fields})
+
+    @contextmanager
+    def stage(self, name: str, **fields):
+        """with ブロックの所要時間を工程 name として記録 (例外時も記録し error を付ける)"""
+        start = time.perf_counter()
+        try:
+            yield fields
+        except Exception as e:
+            fields['error'] = str(e)
+            raise
+        finally:
+            self.add(name, time.perf_counter() - start, **fields)
+
+    def chunk(self, index: int, audio_seconds: float, speech_seconds: float, seconds: float, **fields):
+        """チャンク毎の文字起こし時間と RTF を記録"""
+        self._emit({'type': 'chunk', 'index': index, 'seconds': round(seconds, 4),
+                    'audio_seconds': round(audio_seconds, 3), 'speech_seconds': round(speech_seconds, 3),
+                    'rtf': round(seconds / audio_seconds, 4) if audio_seconds > 0 else None, **fields})
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self) -> dict:
+        stages: Dict[str, dict] = {}
+        chunk_seconds = 0.0
+        audio_seconds = 0.0
+        chunks = 0
+        for r in self.records:
+            if r['type'] == 'stage':
+                s = stages.setdefault(r['stage'], {'seconds': 0.0, 'count': 0})
+                s['seconds'] = round(s['seconds'] + r['seconds'], 4)
+                s['count'] += 1
+            elif r['type'] == 'chunk':
+                chunks += 1
+                chunk_seconds += r['seconds']
+                audio_seconds += r['audio_seconds']
+        return {
+            'run': self.run_id,
+            'total_seconds': round(time.perf_counter() - self.started, 4),
+            'stages': stages,
+            'chunks': chunks,
+            'transcribe_seconds': round(chunk_seconds, 4),
+            'audio_seconds': round(audio_seconds, 3),
+            'rtf': round(chunk_seconds / audio_seconds, 4) if audio_seconds > 0 else None,
+            'counters': dict(self.counters),
+        }
+
+    def finish(self) -> dict:
+        """summary を返し、jsonl へも書き出す"""
+        summary = self.summary()
+        self._emit({'type': 'summary', **summary})
+        return summary
+
+    def format_lines(self, summary: Optional[dict] = None) -> List[str]:
+        summary = summary or self.summary()
+        total = summary['total_seconds'] or 1.0
+        lines = [f"処理時間内訳 (合計 {summary['total_seconds']:.1f}s)"]
+        for name, s in sorted(summary['stages'].items(), key=lambda kv: -kv[1]['seconds']):
+            count = f" x{s['count']}" if s['count'] > 1 else ''
+            lines.append(f"  {name:<16} {s['seconds']:8.2f}s {100 * s['seconds'] / total:5.1f}%{count}")
+        if summary['rtf'] is not None:
+            t = summary['transcribe_seconds']
+            lines.append(f"  {'transcribe':<16} {t:8.2f}s {100 * t / total:5.1f}% "
+                         f"RTF {summary['rtf']:.3f} ({summary['chunks']} チャンク, 音声 {summary['audio_seconds']:.0f}s)")
+        for name, n in summary['counters'].items():
+            lines.append(f"  {name}: {n}")
+        return lines
@@ -1,9 +1,12 @@
 import os
+import shutil
+import time
 import wave
 import numpy as np
-import tempfile
-from pydub import AudioSegment
 from .setting import AppSettings
+from .sound_control import channels_path, to_int16
+from .stream_align import mix_streams_to_wav
+from .segment_writer import SegmentWriter, concat_segments
 
 INIT_YAML = os.path.join(os.getcwd(), "init.yml")
 
@@ -21,20 +24,43 @@ class RecorderModel:
     def reset(self):
         self.mic_frames = []
         self.spk_frames = []
+        # ブロック毎の (先頭サンプル番号配列, ADC時刻配列) — ストリーム間の時刻合わせ用
+        self.mic_times = []
+        self.spk_times = []
         self.same_device = False
+        # 録音中のセグメント書き出し (有効時はフレームをメモリに溜めない)
+        self.segment_writer = None
+
+    def start_segments(self, logger=None):
+        """設定で有効ならセッションフォルダを作りセグメント書き出しを始める (same_device 確定後に呼ぶ)"""
+        self.segment_writer = None
+        if not self.settings.segment_seconds or self.settings.segment_seconds <= 0:
+            return None
+        session_dir = os.path.join(self.settings.segment_dir, time.strftime('%Y%m%d-%H%M%S'))
+        try:
+            self.segment_writer = SegmentWriter(session_dir, self.settings.sample_rate,
+                                                self.settings.segment_seconds, channels=self.settings.channels,
+                                                dual=not self.same_device, logger=logger,
+                                                keep_channels=self.settings.separate_channels)
+        except Exception as e:
+            if logger: logger(f"セグメント書き出しを開始できません: {e}")
+            return None
+        if logger: logger(f"録音セグメント保存先: {session_dir}")
+        return self.segment_writer
 
     def save_settings(self):
         self.settings.save(INIT_YAML)
 
     def mix_and_save(self, logger=None):
+        if self.segment_writer is not None:
+            return self._save_from_segments(logger)
         # same_device の場合は mic_frames のみ保存
         if self.same_device:
             if not self.mic_frames:
                 if logger: logger("録音データがありません")
                 return False
             mic_data = np.concatenate(self.mic_frames, axis=0)
-            mic_int16 = np.clip(mic_data, -1, 1)
-            mic_int16 = (mic_int16 * 32767).astype('<i2')  # 16bit little-endian
+            mic_int16 = to_int16(mic_data)  # int16 録音なら変換不要
             with wave.open(self.settings.wav_file, 'wb') as wf:
                 wf.setnchannels(1)
                 wf.setsampwidth(2)
@@ -42,30 +68,44 @@ class RecorderModel:
                 wf.writeframes(mic_int16.tobytes())
             if logger: logger(f"録音保存: {self.settings.wav_file}")
             return True
-        # 両方ある場合はミックス
+        # 両方ある場合は ADC 時刻でオフセット/ドリフトを補正しながら逐次ミックス
         if self.mic_frames and self.spk_frames:
-            mic_data = np.concatenate(self.mic_frames, axis=0)
-            spk_data = np.concatenate(self.spk_frames, axis=0)
-            mic_int16 = (np.clip(mic_data, -1, 1) * 32767).astype('<i2')
-            spk_int16 = (np.clip(spk_data, -1, 1) * 32767).astype('<i2')
-            mic_wav_path = os.path.join(tempfile.gettempdir(), "mic_temp.wav")
-            spk_wav_path = os.path.join(tempfile.gettempdir(), "spk_temp.wav")
-            # 個別一時 WAV 書き込み（モノラル想定）
-            for path, data in ((mic_wav_path, mic_int16), (spk_wav_path, spk_int16)):
-                with wave.open(path, 'wb') as wf:
-                    wf.setnchannels(1)
-                    wf.setsampwidth(2)
-                    wf.setframerate(self.settings.sample_rate)
-                    wf.writeframes(data.tobytes())
-            mic_seg = AudioSegment.from_wav(mic_wav_path)
-            spk_seg = AudioSegment.from_wav(spk_wav_path)
-            if len(mic_seg) < len(spk_seg):
-                mic_seg = mic_seg.append(AudioSegment.silent(duration=len(spk_seg)-len(mic_seg), frame_rate=self.settings.sample_rate), crossfade=0)
-            elif len(spk_seg) < len(mic_seg):
-                spk_seg = spk_seg.append(AudioSegment.silent(duration=len(mic_seg)-len(spk_seg), frame_rate=self.settings.sample_rate), crossfade=0)
-            mixed_seg = mic_seg.overlay(spk_seg)
-            mixed_seg.export(self.settings.wav_file, format="wav")
+            mix_streams_to_wav(self.settings.wav_file, self.settings.sample_rate,
+                               self.mic_frames, self.spk_frames,
+                               self.mic_times, self.spk_times, logger=logger,
+                               channels_path=self._channels_path())
             if logger: logger(f"録音保存: {self.settings.wav_file}")
             return True
         if logger: logger("録音データがありません")
         return False
+
+    def _channels_path(self):
+        """チャンネル別文字起こし用の 2ch WAV の保存先 (無効時は None)"""
+        if not self.settings.separate_channels:
+            return None
+        return channels_path(self.settings.wav_file)
+
+    def _save_from_segments(self, logger=None):
+        """セグメントを閉じ、ミックス済みセグメントを連結して wav_file を作る
+
+        連結に成功したらセッションフォルダを削除する (keep_segments 指定時は残す)。失敗時は復旧用に残す
+        """
+        writer = self.segment_writer
+        try:
+            manifest = writer.close()
+            if not manifest['segments']:
+                if logger: logger("録音データがありません")
+                return False
+            concat_segments(writer.session_dir, self.settings.wav_file)
+            if writer.keep_channels:
+                concat_segments(writer.session_dir, channels_path(self.settings.wav_file), kind='channels')
+        except Exception as e:
+            if logger: logger(f"録音保存失敗: {e} (セグメント: {writer.session_dir})")
+            return False
+        if logger: logger(f"録音保存: {self.settings.wav_file} ({len(manifest['segments'])} セグメント)")
+        if not self.settings.keep_segments:
+            try:
+                shutil.rmtree(writer.session_dir)
+            except OSError as e:
+                if logger: logger(f"録音セグメントの削除失敗: {e} ({writer.session_dir})")
+        return True
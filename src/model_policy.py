@@ -0,0 +1,127 @@
+"""処理期限に合わせた Whisper モデルの自動選択
+
+VAD 後の発話時間と、このマシンで実測した実時間係数 (RTF = 処理秒 / 発話秒) から
+各モデルの所要時間を見積もり、期限内に終わる最大のモデルを選ぶ。
+
+ - 実測 RTF はバックエンド/オプション毎に JSON へ保存し、指数移動平均で更新
+ - 未計測のモデルは CPU fp32 を想定した事前値を使う
+ - 確信度 (avg_logprob) の低いチャンクは、残り時間が許せば一段大きいモデルで再文字起こし
+"""
+
+from typing import Dict, List, Optional, Tuple
+import json
+import os
+import threading
+
+from .asr_backend import default_cache_dir
+
+MODEL_ORDER = ['tiny', 'base', 'small', 'medium', 'large']
+# CPU fp32 での大まかな事前 RTF (実測で置き換わる)
+PRIOR_RTF = {'tiny': 0.08, 'base': 0.15, 'small': 0.4, 'medium': 1.2, 'large': 2.5}
+SAFETY_FACTOR = 1.3          # 見積もりの余裕
+EMA_ALPHA = 0.3              # 実測値の反映率
+LOW_CONFIDENCE_LOGPROB = -0.8  # チャンク平均 avg_logprob がこれ未満なら低確信度
+
+
+def _base_name(model: str) -> str:
+    """'large-v3' や 'small.en' を比較用の系列名へ"""
+    for name in sorted(MODEL_ORDER, key=len, reverse=True):
+        if model.startswith(name):
+            return name
+    return model
+
+
+class RtfStore:
+    """実測 RTF の永続化 (スレッドセーフ)"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(default_cache_dir(), 'rtf.json')
+        self._lock = threading.Lock()
+        self._data: Dict[str, dict] = {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._data = json.load(f)
+        except Exception:
+            self._data = {}
+
+    def get(self, key: str) -> Optional[float]:
+        entry = self._data.get(key)
+        return entry.get('rtf') if entry else None
+
+    def record(self, key: str, speech_seconds: float, elapsed: float):
+        if speech_seconds <= 0:
+            return
+        rtf = elapsed / speech_seconds
+        with self._lock:
+            entry = self._data.get(key)
+            if entry:
+                entry['rtf'] = (1 - EMA_ALPHA) * entry['rtf'] + EMA_ALPHA * rtf
+                entry['n'] = entry.get('n', 0) + 1
+            else:
+                self._data[key] = {'rtf': rtf, 'n': 1}
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp = self.path + '.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(self._data, f, indent=1)
+                os.replace(tmp, self.path)
+            except Exception:
+                pass
+
+
+class ModelPolicy:
+    def __init__(self, backend: str = 'whisper', asr_options: Optional[dict] = None,
+                 candidates: Optional[List[str]] = None, store: Optional[RtfStore] = None):
+        self.backend = backend
+        self.asr_options = asr_options or {}
+        self.candidates = candidates or list(MODEL_ORDER)
+        self.store = store or RtfStore()
+
+    def _key(self, model: str) -> str:
+        opts = ','.join(f"{k}={v}" for k, v in sorted(self.asr_options.items()))
+        return f"{self.backend}:{model}:{opts}"
+
+    def rtf(self, model: str) -> float:
+        measured = self.store.get(self._key(model))
+        if measured is not None:
+            return measured
+        return PRIOR_RTF.get(_base_name(model), PRIOR_RTF['large'])
+
+    def estimate(self, model: str, speech_seconds: float) -> float:
+        return speech_seconds * self.rtf(model) * SAFETY_FACTOR
+
+    def record(self, model: str, speech_seconds: float, elapsed: float):
+        self.store.record(self._key(model), speech_seconds, elapsed)
+
+    def choose(self, speech_seconds: float, deadline_seconds: float) -> Tuple[str, float]:
+        """期限内に終わる最大のモデルと見積もり秒を返す (どれも間に合わなければ最小モデル)"""
+        ordered = sorted(self.candidates, key=lambda m: MODEL_ORDER.index(_base_name(m))
+                         if _base_name(m) in MODEL_ORDER else len(MODEL_ORDER))
+        best = ordered[0]
+        for model in ordered:
+            if self.estimate(model, speech_seconds) <= deadline_seconds:
+                best = model
+        return best, self.estimate(best, speech_seconds)
+
+    def next_larger(self, model: str) -> Optional[str]:
+        base = _base_name(model)
+        if base not in MODEL_ORDER:
+            return None
+        for name in MODEL_ORDER[MODEL_ORDER.index(base) + 1:]:
+            if name in self.candidates:
+                return name
+        return None
+
+    @staticmethod
+    def is_low_confidence(segments: List[dict], threshold: float = LOW_CONFIDENCE_LOGPROB) -> bool:
+        """セグメントの平均 avg_logprob (文字数重み) が閾値未満か"""
+        total = 0.0
+        weight = 0
+        for seg in segments:
+            lp = seg.get('avg_logprob')
+            if lp is None:
+                continue
+            w = max(len(seg.get('text', '')), 1)
+            total += lp * w
+            weight += w
+        return weight > 0 and total / weight < threshold
@@ -0,0 +1,323 @@
+"""音声の前処理 (リサンプル / DC 除去 / 音量正規化)
+
+パイプラインは 16kHz を前提にしているため、44.1k / 48kHz しか受け付けないデバイスや
+16kHz 以外の WAV は、録音時 (CapturePreprocessor) または分割前 (prepare_audio) に 1 回だけ
+ここで 16kHz へ変換する。Whisper へは変換済みの配列が渡り、チャンク毎の ffmpeg 変換が起きない。
+
+ - リサンプルは Kaiser 窓 sinc のポリフェーズ FIR (scipy.signal.resample_poly と同じ設計)。
+   同じ位相の出力を入力のスライディング窓 (コピー無しのビュー) と係数の行列積でまとめて計算し、
+   ブロック境界は入力履歴で繋ぐ (ブロック分割しても一括処理と同じ結果)。
+   位相遅れ 0 で、出力 j は入力位置 j*in/out に対応する
+ - DC 除去はブロック平均の指数移動平均を差し引く (推定値はブロック内で線形補間して段差を作らない)
+ - 音量正規化は発話フレームの平均レベルを target_dbfs に合わせる一定ゲイン (録音全体で 1 つ)。
+   ピークが飽和しない範囲・max_gain_db までに制限する。レベルは前処理のブロック毎に集めるため、
+   prepare_audio(out_path=...) は録音全体の配列を作らずに WAV へ書き出せる
+"""
+
+from math import gcd
+from typing import Callable, Optional, Tuple
+import os
+import wave
+
+import numpy as np
+
+from . import sound_control
+
+KAISER_BETA = 5.0        # scipy.signal.resample_poly の既定窓
+FILTER_ZEROS = 10        # sinc の片側ゼロ交差数 (フィルタ長 ≒ 2 * 10 * max(up, down))
+DC_TIME_CONSTANT = 1.0   # DC 推定の時定数 (秒)
+PREPARE_BLOCK_SECONDS = 30
+EMIT_FRAMES = 65536      # 1 回にまとめて計算する出力サンプル数
+MAX_GAIN_DB = 20.0
+PEAK_LIMIT = 0.99
+
+Logger = Callable[[str], None]
+
+
+def _log(logger: Optional[Logger], msg: str):
+    if logger:
+        try:
+            logger(msg)
+        except Exception:
+            pass
+
+
+def _from_float(data: np.ndarray, dtype) -> np.ndarray:
+    if np.dtype(dtype) == np.int16:
+        return sound_control.to_int16(data)
+    return data.astype(dtype, copy=False)
+
+
+class Resampler:
+    """ブロック単位のポリフェーズリサンプラ (in_rate → out_rate, 多チャンネル可)"""
+
+    def __init__(self, in_rate: int, out_rate: int, channels: int = 1):
+        g = gcd(int(in_rate), int(out_rate))
+        self.up = int(out_rate) // g
+        self.down = int(in_rate) // g
+        self.channels = channels
+        n = max(self.up, self.down)
+        self.half = FILTER_ZEROS * n  # 係数の片側長 (アップサンプル後の単位)
+        t = np.arange(-self.half, self.half + 1, dtype=np.float64)
+        cutoff = 0.5 / n
+        h = 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(len(t), KAISER_BETA) * self.up
+        # 範囲外の参照を 0 にするため両端に 0 を 1 つずつ足す
+        table = np.concatenate(([0.0], h, [0.0]))
+        self.taps = (2 * self.half) // self.up + 2
+        # 出力 j の係数と先頭入力は j % up (位相) だけで決まる → 位相毎に前計算
+        pos = np.arange(self.up, dtype=np.int64) * self.down
+        self._k0 = -((self.half - pos) // self.up)  # ceil((pos - half) / up)
+        idx = pos[:, None] - (self._k0[:, None] + np.arange(self.taps)[None, :]) * self.up + self.half + 1
+        self._weights = table[np.clip(idx, 0, len(table) - 1)].astype(np.float32)
+        self._buf = np.zeros((0, channels), dtype=np.float32)
+        self._base = 0   # _buf[0] の入力サンプル番号
+        self._in = 0     # 受け取った累積入力サンプル数
+        self._next = 0   # 次に出力するサンプル番号
+
+    def _first_input(self, j: int) -> int:
+        return int(self._k0[j % self.up]) + (j // self.up) * self.down
+
+    def _emit(self, last: int) -> np.ndarray:
+        """出力 [self._next, last) を EMIT_FRAMES ずつ計算する"""
+        if last <= self._next:
+            return np.zeros((0, self.channels), dtype=np.float32)
+        parts = []
+        for start in range(self._next, last, EMIT_FRAMES):
+            parts.append(self._emit_range(start, min(start + EMIT_FRAMES, last)))
+        self._next = last
+        # 次の出力で使わない入力を捨てる
+        keep = self._first_input(self._next) - self._base
+        if keep > 0:
+            self._buf = self._buf[keep:]
+            self._base += keep
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def _emit_range(self, first: int, last: int) -> np.ndarray:
+        # 同じ位相の出力は入力 down サンプル間隔の窓に同じ係数を掛けるので、
+        # 位相毎に入力のスライディング窓 (コピー無しのビュー) を down 飛ばしで取り行列積で計算する
+        lo = self._first_input(first) - self._base
+        hi = self._first_input(last - 1) - self._base + self.taps
+        if lo >= 0 and hi <= len(self._buf):
+            x = self._buf[lo:hi]
+        else:
+            # 録音の先頭より前 / 入力末尾より後ろは 0 とみなす
+            x = np.zeros((hi - lo, self.channels), dtype=np.float32)
+            a, b = max(lo, 0), min(hi, len(self._buf))
+            if b > a:
+                x[a - lo:b - lo] = self._buf[a:b]
+        windows = np.lib.stride_tricks.sliding_window_view(x, self.taps, axis=0)  # (入力位置, ch, taps)
+        out = np.empty((last - first, self.channels), dtype=np.float32)
+        for j0 in range(first, min(first + self.up, last)):
+            count = len(range(j0, last, self.up))
+            start = self._first_input(j0) - self._base - lo
+            rows = windows[start:start + (count - 1) * self.down + 1:self.down]
+            out[j0 - first::self.up] = rows @ self._weights[j0 % self.up]
+        return out
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """float32 (フレーム数, チャンネル数) を追加し、計算できた分の出力を返す"""
+        block = np.asarray(block, dtype=np.float32).reshape(-1, self.channels)
+        self._buf = np.concatenate((self._buf, block)) if len(self._buf) else block
+        self._in += len(block)
+        # 出力 j は入力 floor((j*down + half) / up) までを使う
+        last = (self._in * self.up - self.half - 1) // self.down + 1
+        return self._emit(max(last, self._next))
+
+    def flush(self) -> np.ndarray:
+        """末尾 (入力の終わりを 0 とみなす) の出力を返す"""
+        total = -(-self._in * self.up // self.down)  # ceil(in * up / down)
+        return self._emit(total)
+
+    def map_index(self, index):
+        """入力サンプル番号 → 出力サンプル番号 (float)"""
+        return np.asarray(index, dtype=np.float64) * self.up / self.down
+
+
+class DCBlocker:
+    """ブロック平均の指数移動平均を差し引く DC 除去"""
+
+    def __init__(self, rate: int, channels: int = 1, time_constant: float = DC_TIME_CONSTANT):
+        self.rate = rate
+        self.time_constant = time_constant
+        self.level = None  # チャンネル毎の DC 推定値
+        self.channels = channels
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        block = np.asarray(block, dtype=np.float32).reshape(-1, self.channels)
+        if not len(block):
+            return block
+        mean = block.mean(axis=0)
+        if self.level is None:
+            self.level = mean
+            return block - mean
+        alpha = 1.0 - np.exp(-len(block) / (self.rate * self.time_constant))
+        new = self.level + alpha * (mean - self.level)
+        ramp = (np.arange(1, len(block) + 1, dtype=np.float32) / len(block))[:, None]
+        out = block - (self.level + (new - self.level) * ramp)
+        self.level = new
+        return out
+
+
+class CapturePreprocessor:
+    """録音ブロックを逐次 DC 除去 + リサンプルする (録音スレッドでリングから取り出す毎に呼ぶ)
+
+    出力は入力と同じ dtype。map_timestamps でブロック時刻のサンプル番号を出力側へ換算する。
+    """
+
+    def __init__(self, in_rate: int, out_rate: int, channels: int = 1, remove_dc: bool = True):
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.channels = channels
+        self.resampler = Resampler(in_rate, out_rate, channels) if in_rate != out_rate else None
+        self.dc = DCBlocker(in_rate, channels) if remove_dc else None
+        self._dtype = None
+
+    def process(self, block: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        if block is None or not len(block):
+            return block
+        self._dtype = block.dtype
+        x = sound_control.to_float32(block).reshape(-1, self.channels)
+        if self.dc is not None:
+            x = self.dc.process(x)
+        if self.resampler is not None:
+            x = self.resampler.process(x)
+        return _from_float(x, block.dtype) if len(x) else None
+
+    def flush(self) -> Optional[np.ndarray]:
+        if self.resampler is None or self._dtype is None:
+            return None
+        x = self.resampler.flush()
+        return _from_float(x, self._dtype) if len(x) else None
+
+    def map_timestamps(self, ts: Optional[tuple]) -> Optional[tuple]:
+        """(サンプル番号配列, 時刻配列) のサンプル番号を出力レート側へ換算"""
+        if ts is None or self.resampler is None:
+            return ts
+        return np.round(self.resampler.map_index(ts[0])).astype(np.int64), ts[1]
+
+
+def _gain_from_levels(db: np.ndarray, peak: float, target_dbfs: float, max_gain_db: float = MAX_GAIN_DB) -> float:
+    if not len(db):
+        return 1.0
+    # 絶対閾値は使わない (小さすぎる録音こそ正規化したい)。ノイズフロア + margin の相対判定のみ
+    active = sound_control.activity_from_db(db, threshold_db=-120.0)
+    if not active.any():
+        return 1.0
+    level = 10 * np.log10(np.mean(10 ** (db[active] / 10)) + 1e-20)
+    gain_db = float(np.clip(target_dbfs - level, -max_gain_db, max_gain_db))
+    gain = 10 ** (gain_db / 20)
+    if peak > 0:
+        gain = min(gain, PEAK_LIMIT / peak)
+    return gain
+
+
+def loudness_gain(data: np.ndarray, rate: int, target_dbfs: float, max_gain_db: float = MAX_GAIN_DB) -> float:
+    """発話フレームの平均レベルを target_dbfs に合わせるゲイン (倍率)"""
+    db, _ = sound_control.frame_db(data, rate)
+    peak = float(np.abs(sound_control.to_float32(np.asarray(data))).max()) if len(data) else 0.0
+    return _gain_from_levels(db, peak, target_dbfs, max_gain_db)
+
+
+class _LevelMeter:
+    """ブロック毎に渡したサンプルのフレーム dB とピークを集める (loudness_gain を録音全体の配列なしで求める)"""
+
+    def __init__(self, rate: int):
+        self.rate = rate
+        self.db = []
+        self.peak = 0.0
+        self._rest = np.zeros(0, dtype=np.int16)
+
+    def add(self, x: np.ndarray):
+        if not len(x):
+            return
+        self.peak = max(self.peak, float(np.abs(sound_control.to_float32(x)).max()))
+        x = np.concatenate((self._rest, x)) if len(self._rest) else x
+        db, frame = sound_control.frame_db(x, self.rate)
+        self.db.append(db)
+        self._rest = x[len(db) * frame:]
+
+    def gain(self, target_dbfs: float) -> float:
+        db = np.concatenate(self.db) if self.db else np.zeros(0, dtype=np.float32)
+        return _gain_from_levels(db, self.peak, target_dbfs)
+
+
+def _apply_gain(out: np.ndarray, gain: float, block: int):
+    for start in range(0, len(out), block):
+        seg = out[start:start + block].astype(np.float32) * gain
+        out[start:start + block] = np.clip(np.round(seg), -32768, 32767).astype(np.int16)
+
+
+def _wav_memmap(path: str, mode: str = 'r') -> np.ndarray:
+    """16bit モノラル WAV の PCM 部分を np.memmap で開く (読み込み時にページ単位で読む)"""
+    with wave.open(path, 'rb') as wf:
+        frames = wf.getnframes()
+    if not frames:
+        return np.zeros(0, dtype=np.int16)
+    offset = os.path.getsize(path) - frames * 2  # ヘッダは PCM の前だけ
+    return np.memmap(path, dtype='<i2', mode=mode, offset=offset, shape=(frames,))
+
+
+def prepare_audio(data, rate: int, target_rate: int = 16000, remove_dc: bool = True,
+                  target_dbfs: Optional[float] = None, logger: Optional[Logger] = None,
+                  out_path: Optional[str] = None) -> Tuple[np.ndarray, int]:
+    """分割前に録音全体を 1 回だけ前処理し (int16 モノラル配列, target_rate) を返す
+
+    data は int16 配列、または区間読み出しできる audio_archive.AudioSource (ブロック毎にデコード)。
+    target_dbfs を指定すると DC 除去・リサンプル後に音量を正規化する。
+    out_path を指定すると結果をその WAV へブロック毎に書き出し、読み取り専用の np.memmap で返す
+    (録音全体の配列をメモリに作らない)。
+    変換が不要 (target_rate 一致・DC 除去/正規化なし) なら data をそのまま返す。
+    """
+    if rate == target_rate and not remove_dc and target_dbfs is None:
+        return data, rate
+    pre = CapturePreprocessor(rate, target_rate, 1, remove_dc)
+    block = int(rate * PREPARE_BLOCK_SECONDS)
+    meter = _LevelMeter(target_rate) if target_dbfs is not None else None
+    parts = []
+    wf = None
+    if out_path:
+        wf = wave.open(out_path, 'wb')
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(target_rate)
+
+    def emit(x):
+        if x is None:
+            return
+        x = x.reshape(-1)
+        if meter is not None:
+            meter.add(x)
+        if wf is not None:
+            wf.writeframes(x.astype('<i2', copy=False).tobytes())
+        else:
+            parts.append(x)
+
+    try:
+        for start in range(0, len(data), block):
+            emit(pre.process(sound_control.to_int16(np.asarray(data[start:start + block]))))
+        emit(pre.flush())
+    finally:
+        if wf is not None:
+            wf.close()
+    gain = meter.gain(target_dbfs) if meter is not None else 1.0
+    if wf is not None:
+        if abs(gain - 1.0) > 1e-3:
+            out = _wav_memmap(out_path, 'r+')
+            _apply_gain(out, gain, block)
+            if isinstance(out, np.memmap):
+                out.flush()
+            del out
+        out = _wav_memmap(out_path)
+    else:
+        out = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int16)
+        if abs(gain - 1.0) > 1e-3:
+            _apply_gain(out, gain, block)
+    msg = []
+    if rate != target_rate:
+        msg.append(f"リサンプル {rate}Hz → {target_rate}Hz")
+    if remove_dc:
+        msg.append("DC 除去")
+    if target_dbfs is not None and len(out):
+        msg.append(f"音量正規化 {20 * np.log10(gain):+.1f} dB")
+    _log(logger, "前処理: " + ", ".join(msg))
+    return out, target_rate
@@ -0,0 +1,180 @@
+"""長時間会議向けのローリング要約
+
+文字起こしがチャンク毎に進むのに合わせ、録音 interval_seconds 分の新しいテキストが溜まる度に
+バックグラウンドで「これまでの要約 + 新しいテキスト」だけを要約し直して途中要約を更新する。
+最終要約は、途中要約と未要約の残りテキストを利用者のプロンプト (議事録フォーマット) でまとめ直す
+1 回のリクエストになり、文字起こし全文を一度に送る巨大なリクエストを避けられる。
+
+    rolling = RollingSummarizer(summarize_fn, prompt, interval_seconds=600, summary_path=path)
+    rolling.add(chunk_text, position_seconds)   # チャンク完了毎
+    summary = rolling.finish()                  # 残りを統合して最終要約
+
+summarize_fn(prompt, text) -> str には Gemini (summarize_minutes_gemini) かローカルスタブを渡す。
+metrics を渡すとバックグラウンドの途中更新だけを工程 rolling_summarize として記録する
+(finish() の最終統合は呼び出し側で計測する)。
+要約に失敗した区間のテキストは捨てずに次回へ持ち越す。
+"""
+
+from contextlib import nullcontext
+from typing import Callable, List, Optional
+import os
+import threading
+
+SummarizeFn = Callable[[str, str], str]
+
+UPDATE_PROMPT = """
+あなたは会議の書記です。以下は会議のここまでの要約と、その後に続く発言の文字起こしです。
+文字起こしの内容を反映して要約を更新してください。
+- 決定事項・課題・アクションアイテム・担当者は必ず残す
+- 既存の要約の内容は、新しい発言で訂正された場合を除き削らない
+- 出力は更新後の要約のみ (前置き不要)
+"""
+PREVIOUS_HEADER = "【これまでの要約】\n"
+NEW_TEXT_HEADER = "【以降の文字起こし】\n"
+FAILURE_PREFIXES = ("(要約スキップ", "(要約失敗", "(要約取得失敗")
+LOCAL_SUMMARY_LINES = 3  # ローカルスタブが 1 区間から残す行数
+
+
+def is_summary_failure(text: Optional[str]) -> bool:
+    """summarize_minutes_gemini の失敗/スキップ時の戻り値か"""
+    return not text or text.startswith(FAILURE_PREFIXES)
+
+
+def compose_text(previous: str, new_text: str) -> str:
+    """要約リクエストの本文 (これまでの要約 + 新しい文字起こし)"""
+    if not previous:
+        return new_text
+    return f"{PREVIOUS_HEADER}{previous}\n\n{NEW_TEXT_HEADER}{new_text}"
+
+
+def local_summarize(prompt: str, text: str) -> str:
+    """API キー無し時のローカルスタブ: 既存要約はそのまま、新しい区間は先頭数行を箇条書きで残す"""
+    previous = ''
+    if text.startswith(PREVIOUS_HEADER) and NEW_TEXT_HEADER in text:
+        previous, text = text[len(PREVIOUS_HEADER):].split(f"\n\n{NEW_TEXT_HEADER}", 1)
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip() and not ln.startswith('(')]
+    picked = [f"- {ln}" for ln in lines[:LOCAL_SUMMARY_LINES]]
+    if len(lines) > LOCAL_SUMMARY_LINES:
+        picked.append(f"- …(他 {len(lines) - LOCAL_SUMMARY_LINES} 行)")
+    return '\n'.join(part for part in (previous.strip(), '\n'.join(picked)) if part)
+
+
+class RollingSummarizer:
+    def __init__(self, summarize_fn: SummarizeFn, prompt: str, interval_seconds: float,
+                 summary_path: Optional[str] = None, logger: Optional[Callable[[str], None]] = None,
+                 metrics=None):
+        self.summarize_fn = summarize_fn
+        self.prompt = prompt
+        self.interval_seconds = interval_seconds
+        self.summary_path = summary_path
+        self.logger = logger
+        self.metrics = metrics
+        self.summary = ''              # 途中要約 (ここまでに統合済みの範囲)
+        self.covered_seconds = 0.0     # 途中要約が含む録音位置 (秒)
+        self.updates = 0
+        self._pending: List[str] = []  # まだ要約に入っていないチャンクテキスト
+        self._pending_end = 0.0
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='rolling-summary', daemon=True)
+        self._thread.start()
+
+    def _log(self, msg: str):
+        if self.logger:
+            try:
+                self.logger(msg)
+            except Exception:
+                pass
+
+    def add(self, text: str, position_seconds: float):
+        """チャンクのテキストを追加。前回の途中要約から interval_seconds 進んでいれば更新を起こす"""
+        with self._cond:
+            if text.strip():
+                self._pending.append(text)
+            self._pending_end = max(self._pending_end, position_seconds)
+            if self._due():
+                self._cond.notify()
+
+    def _due(self) -> bool:
+        return (not self._busy and bool(self._pending)
+                and self._pending_end - self.covered_seconds >= self.interval_seconds)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and not self._due():
+                    self._cond.wait()
+                if self._closed:
+                    return
+                # 要約中に届いたチャンクは次回へ回す
+                taken, self._pending = self._pending, []
+                end = self._pending_end
+                previous = self.summary
+                self._busy = True
+            with self.metrics.stage('rolling_summarize') if self.metrics is not None else nullcontext():
+                summary = self._summarize(UPDATE_PROMPT, previous, taken)
+            with self._cond:
+                self._busy = False
+                if summary is None:
+                    self._pending = taken + self._pending
+                    # 失敗しても同じ区間で即再試行しないよう、次の interval まで待つ
+                    self.covered_seconds = end
+                else:
+                    self.summary = summary
+                    self.covered_seconds = end
+                    self.updates += 1
+                self._cond.notify_all()
+            if summary is not None:
+                self._log(f"途中要約を更新 (~{_format_position(end)})")
+                self._write(f"(途中要約: 録音 {_format_position(end)} まで)\n\n{summary}")
+
+    def _summarize(self, prompt: str, previous: str, texts: List[str]) -> Optional[str]:
+        try:
+            summary = self.summarize_fn(prompt, compose_text(previous, '\n'.join(texts)))
+        except Exception as e:
+            self._log(f"途中要約失敗: {e}")
+            return None
+        if is_summary_failure(summary):
+            self._log(f"途中要約失敗: {summary}")
+            return None
+        return summary
+
+    def _write(self, text: str):
+        if not self.summary_path:
+            return
+        tmp = self.summary_path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp, self.summary_path)
+        except Exception as e:
+            self._log(f"途中要約の書き込み失敗: {e}")
+
+    def finish(self) -> str:
+        """実行中の更新を待ち、途中要約と残りを利用者プロンプトで統合した最終要約を返す"""
+        with self._cond:
+            while self._busy:
+                self._cond.wait()
+            self._closed = True
+            self._cond.notify_all()
+            remaining = '\n'.join(self._pending)
+            self._pending = []
+            previous = self.summary
+        self._thread.join()
+        if not previous:
+            # 途中要約が無い (短い会議 / 全て失敗) → 従来どおり全文を 1 回で要約
+            return self.summarize_fn(self.prompt, remaining)
+        return self.summarize_fn(self.prompt, compose_text(previous, remaining))
+
+    def close(self):
+        """最終要約を作らずに停止"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+
+def _format_position(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
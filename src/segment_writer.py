@@ -0,0 +1,289 @@
+"""録音中の固定長セグメント書き出し
+
+録音スレッドがリングから取り出したブロックを、segment_seconds 毎のファイルへ逐次書き込む。
+
+    <session_dir>/mic_0000.wav, mic_0001.wav, ...   マイク (録音チャンネル数のまま, 16bit)
+    <session_dir>/spk_0000.wav, ...                 スピーカー (2 デバイス録音時のみ)
+    <session_dir>/mix_0000.wav, ...                 時刻合わせ済みミックス (16bit mono)
+    <session_dir>/chan_0000.wav, ...                ミックス前の時刻合わせ済み 2ch (L: マイク, R: スピーカー)
+                                                    (keep_channels 指定時のみ)
+    <session_dir>/session.json                      マニフェスト (完了セグメントの一覧)
+
+ - WAV ヘッダは書き込み毎に更新し、セグメント完了時に fsync するため、
+   クラッシュしても失うのは書き込み中のセグメントだけ
+ - ミックスはマイク側のサンプル番号でセグメントを区切り、直近のブロック時刻だけから
+   オフセット/ドリフトを推定して重ねる (録音全体を保持・走査しない)
+ - マニフェストはセグメント完了毎に置き換え保存し、on_segment コールバックでも通知するので
+   後段の処理は完了済みセグメントから始められる
+ - 停止時の 1 本の WAV は concat_segments でミックスセグメントを順に連結して作る
+"""
+
+from typing import Callable, Dict, List, Optional
+import json
+import os
+import time
+import wave
+
+import numpy as np
+
+from .sound_control import to_int16
+from .stream_align import FrameStore, align_range, alignment_info, fit_clocks
+
+MANIFEST_NAME = 'session.json'
+MANIFEST_VERSION = 1
+CLOCK_WINDOW_SEGMENTS = 2  # 時刻合わせの推定に使う直近のブロック時刻 (セグメント数)
+SPK_MARGIN_SECONDS = 1.0   # ミックス後も保持するスピーカー側の余裕
+COPY_BLOCK_FRAMES = 16000 * 10
+
+
+def _fsync(f):
+    try:
+        f.flush()
+        os.fsync(f.fileno())
+    except Exception:
+        pass
+
+
+class _Channel:
+    """1 ストリーム分のセグメントファイルとミックス用の直近ブロック"""
+
+    def __init__(self, name: str, session_dir: str, sample_rate: int, channels: int):
+        self.name = name
+        self.session_dir = session_dir
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.count = 0          # 書き込んだ累積フレーム数
+        self.segment = -1       # 書き込み中のセグメント番号
+        self.frames: List[np.ndarray] = []  # ミックス待ちのブロック
+        self.base = 0           # frames[0] の先頭サンプル番号
+        self.anchors: List[tuple] = []      # (先頭サンプル番号配列, ADC 時刻配列)
+        self._file = None
+        self._wf = None
+
+    def path(self, index: int) -> str:
+        return os.path.join(self.session_dir, f"{self.name}_{index:04d}.wav")
+
+    def rotate(self, index: int):
+        self.close()
+        self._file = open(self.path(index), 'wb')
+        self._wf = wave.open(self._file, 'wb')
+        self._wf.setnchannels(self.channels)
+        self._wf.setsampwidth(2)
+        self._wf.setframerate(self.sample_rate)
+        self.segment = index
+
+    def write(self, data: np.ndarray):
+        # wave はヘッダのデータ長を書き込み毎に更新する
+        self._wf.writeframes(to_int16(data).tobytes())
+        self.count += len(data)
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._wf is not None:
+            self._wf.close()
+            _fsync(self._file)
+            self._file.close()
+        self._wf = None
+        self._file = None
+
+    def drop_before(self, index: int):
+        """index より前で終わるブロックを捨てる"""
+        n = 0
+        while n < len(self.frames) and self.base + len(self.frames[n]) <= index:
+            self.base += len(self.frames[n])
+            n += 1
+        del self.frames[:n]
+
+    def trim_anchors(self, keep_from: int):
+        self.anchors = [a for a in self.anchors if len(a[0]) and a[0][-1] >= keep_from]
+
+
+class SegmentWriter:
+    def __init__(self, session_dir: str, sample_rate: int, segment_seconds: float, channels: int = 1,
+                 dual: bool = True, logger: Optional[Callable[[str], None]] = None,
+                 on_segment: Optional[Callable[[dict], None]] = None, keep_channels: bool = False):
+        os.makedirs(session_dir, exist_ok=True)
+        self.session_dir = session_dir
+        self.sample_rate = sample_rate
+        self.segment_frames = max(int(sample_rate * segment_seconds), 1)
+        self.dual = dual
+        self.keep_channels = keep_channels and dual
+        self.logger = logger
+        self.on_segment = on_segment
+        self.streams: Dict[str, _Channel] = {'mic': _Channel('mic', session_dir, sample_rate, channels)}
+        if dual:
+            self.streams['spk'] = _Channel('spk', session_dir, sample_rate, channels)
+        self._next = 0  # 次に完了させるセグメント番号
+        self.closed = False
+        self.manifest = {
+            'version': MANIFEST_VERSION,
+            'sample_rate': sample_rate,
+            'segment_seconds': segment_seconds,
+            'streams': list(self.streams),
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'complete': False,
+            'segments': [],
+        }
+        self._write_manifest()
+
+    def _log(self, msg: str):
+        if self.logger:
+            try:
+                self.logger(msg)
+            except Exception:
+                pass
+
+    # ---------------- 書き込み (録音スレッド) ----------------
+    def write(self, name: str, data: Optional[np.ndarray], timestamps: Optional[tuple] = None):
+        """ストリーム name のブロックを追記し、揃ったセグメントを完了させる"""
+        ch = self.streams[name]
+        if timestamps is not None and self.dual:
+            ch.anchors.append(timestamps)
+        if data is None or not len(data):
+            return
+        pos = 0
+        while pos < len(data):
+            index = ch.count // self.segment_frames
+            if index != ch.segment:
+                ch.rotate(index)
+            take = min(len(data) - pos, (index + 1) * self.segment_frames - ch.count)
+            ch.write(data[pos:pos + take])
+            pos += take
+        ch.flush()
+        if self.dual:
+            ch.frames.append(data)
+        self._complete_ready(final=False)
+
+    def _complete_ready(self, final: bool):
+        mic = self.streams['mic']
+        while True:
+            k0 = self._next * self.segment_frames
+            k1 = k0 + self.segment_frames
+            if mic.count < k1 and not (final and mic.count > k0):
+                return
+            k1 = min(k1, mic.count)
+            if self.dual:
+                if not self._mix_segment(self._next, k0, k1, final):
+                    return
+            else:
+                self._finish_segment(self._next, k0, k1, {'mic': mic.path(self._next)}, mix=mic.path(self._next))
+            self._next += 1
+
+    def _mix_segment(self, index: int, k0: int, k1: int, final: bool) -> bool:
+        mic, spk = self.streams['mic'], self.streams['spk']
+        mic_clock, spk_clock = fit_clocks(mic.anchors, spk.anchors, mic.count, spk.count, self.sample_rate)
+        need = spk_clock.extrapolate_index(mic_clock.index_to_time(k1)) + 1
+        # スピーカー側が追いつくまで待つ (止まっている場合は 1 セグメント分遅れた時点で諦める)
+        if spk.count < need and not final and mic.count < k1 + self.segment_frames:
+            return False
+        local, remote = align_range(FrameStore(mic.frames, mic.base), FrameStore(spk.frames, spk.base),
+                                    mic_clock, spk_clock, k0, k1)
+        path = os.path.join(self.session_dir, f"mix_{index:04d}.wav")
+        self._write_wav(path, local + remote)
+        info = alignment_info(mic_clock, spk_clock)
+        files = {'mic': mic.path(index)}
+        if spk.count > k0:
+            files['spk'] = spk.path(index)
+        fields = {}
+        if self.keep_channels:
+            fields['channels'] = f"chan_{index:04d}.wav"
+            self._write_wav(os.path.join(self.session_dir, fields['channels']), np.stack((local, remote), axis=1))
+        self._finish_segment(index, k0, k1, files, mix=path,
+                             offset_ms=round(info['offset_ms'], 2), drift_ppm=round(info['drift_ppm'], 1), **fields)
+        mic.drop_before(k1)
+        spk.drop_before(int(spk_clock.extrapolate_index(mic_clock.index_to_time(k1))
+                            - SPK_MARGIN_SECONDS * self.sample_rate))
+        keep_from = k1 - CLOCK_WINDOW_SEGMENTS * self.segment_frames
+        mic.trim_anchors(keep_from)
+        spk.trim_anchors(int(spk_clock.extrapolate_index(mic_clock.index_to_time(max(keep_from, 0)))))
+        return True
+
+    def _write_wav(self, path: str, data: np.ndarray):
+        with open(path, 'wb') as f:
+            with wave.open(f, 'wb') as wf:
+                wf.setnchannels(1 if data.ndim == 1 else data.shape[1])
+                wf.setsampwidth(2)
+                wf.setframerate(self.sample_rate)
+                wf.writeframes(to_int16(data).tobytes())
+            _fsync(f)
+
+    def _finish_segment(self, index: int, k0: int, k1: int, files: dict, mix: str, **fields):
+        entry = {
+            'index': index,
+            'start_seconds': round(k0 / self.sample_rate, 3),
+            'seconds': round((k1 - k0) / self.sample_rate, 3),
+            'files': {name: os.path.basename(p) for name, p in files.items()},
+            'mix': os.path.basename(mix),
+            **fields,
+        }
+        self.manifest['segments'].append(entry)
+        self._write_manifest()
+        if self.on_segment:
+            try:
+                self.on_segment(dict(entry, mix=mix))
+            except Exception as e:
+                self._log(f"セグメント通知エラー: {e}")
+
+    def _write_manifest(self):
+        path = os.path.join(self.session_dir, MANIFEST_NAME)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=1)
+            _fsync(f)
+        os.replace(tmp, path)
+
+    def close(self) -> dict:
+        """残りを書き出してマニフェストを完了状態にする (複数回呼んでもよい)"""
+        if self.closed:
+            return self.manifest
+        self.closed = True
+        for ch in self.streams.values():
+            ch.close()
+        self._complete_ready(final=True)
+        for ch in self.streams.values():
+            ch.frames = []
+            ch.anchors = []
+        self.manifest['complete'] = True
+        self.manifest['seconds'] = round(self.streams['mic'].count / self.sample_rate, 3)
+        self._write_manifest()
+        return self.manifest
+
+
+def load_manifest(session_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(session_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def segment_paths(session_dir: str, kind: str = 'mix') -> List[str]:
+    """マニフェストに記録済み (完了済み) のセグメントのパス。kind='mix' / 'channels' / 'mic' / 'spk'"""
+    manifest = load_manifest(session_dir) or {}
+    paths = []
+    for entry in manifest.get('segments', []):
+        name = entry.get(kind) if kind in ('mix', 'channels') else entry['files'].get(kind)
+        if name:
+            paths.append(os.path.join(session_dir, name))
+    return paths
+
+
+def concat_segments(session_dir: str, out_path: str, kind: str = 'mix') -> bool:
+    """完了済みセグメントを順に連結して 1 本の WAV にする (一定長ずつコピー)"""
+    paths = segment_paths(session_dir, kind)
+    if not paths:
+        return False
+    with wave.open(out_path, 'wb') as out:
+        for i, path in enumerate(paths):
+            with wave.open(path, 'rb') as wf:
+                if i == 0:
+                    out.setparams(wf.getparams())
+                while True:
+                    data = wf.readframes(COPY_BLOCK_FRAMES)
+                    if not data:
+                        break
+                    out.writeframes(data)
+    return True
@@ -0,0 +1,748 @@
+"""議事録処理のローカル HTTP ジョブ API
+
+録音 (WAV / FLAC / Opus) をアップロードするか、許可したディレクトリ内のパスで指定するとジョブ ID を返し、
+バックグラウンドのワーカーで create_meeting_report を実行する。状態と進捗 (完了チャンク数) を
+ポーリングし、完了後に文字起こし・要約・字幕を取得する。標準ライブラリだけで動く。
+
+    python -m src.server serve --workers 2 --work-dir jobs
+    python -m src.server submit meeting.wav --out-dir .   # アップロード → 完了待ち → 文字起こし/要約を保存
+
+ - 外部サービスへは接続しない。要約は既定でローカル抜粋 (rolling_summary.local_summarize) で作り、
+   --gemini 指定時だけ設定の Gemini キーを使う
+ - ジョブで指定できるモデルは設定の whisper_model と --allow-model で許可したものだけ
+ - 会議アーカイブ (SQLite) へは --meeting-db 指定時だけ登録する (設定の meeting_db は使わない)
+ - モデルは起動時にロードし、ジョブ間で使い回す (asr_backend のキャッシュ)。同じモデルの推論は
+   AsrBackend.lock で直列化されるため、ワーカーを増やすと読み込み・分割・要約が他のジョブの推論と重なる
+ - 同時に受け付けるのは workers + max_queue 件まで。超えた投入は 503 を返す
+ - ジョブ毎に work_dir/<ID>/ へ job.json (状態)・job.log・入力・出力を置く。
+   再起動時は待ち/実行中だったジョブを再投入する
+ - 既定では 127.0.0.1 でのみ待ち受ける。--token 指定時は Authorization: Bearer <token> を要求する
+
+エンドポイント:
+    POST   /jobs?name=meeting.wav&lang=ja&model=small   本文に音声 (Content-Length 必須)
+    POST   /jobs   {"path": "/許可したディレクトリ/meeting.wav", "lang": "ja"}  (Content-Type: application/json)
+    GET    /jobs                   一覧
+    GET    /jobs/<ID>              状態・進捗・ログ末尾
+    GET    /jobs/<ID>/transcript   文字起こし (処理中は書き出し済みの所まで)。summary / srt / vtt / json も同様
+    DELETE /jobs/<ID>              削除 (実行中は 409)
+    GET    /health                 稼働状況 (認証不要)
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, quote, urlencode, urlparse
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import wave
+
+from . import ai_control
+from . import audio_archive
+from . import rolling_summary
+from .setting import AppSettings
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_LANG = 'ja'
+CHUNK_SECONDS = 300      # 既定の分割長 (録音全体を 1 チャンクにすると進捗が 0/1 → 1/1 になる)
+LOCAL_SUMMARY_SECONDS = 600  # ローカル要約の途中要約間隔 (設定 rolling_summary_seconds が 0 の場合)
+MAX_UPLOAD_MB = 2048
+MAX_JSON_BYTES = 64 * 1024
+DRAIN_LIMIT_MB = 256     # エラー応答前に読み捨てる本文の上限 (超えると送信側には接続断に見える)
+COPY_BLOCK = 1 << 20
+LOG_TAIL = 50            # 状態に含めるログの行数
+POLL_SECONDS = 2.0
+JOB_FILE = 'job.json'
+LOG_FILE = 'job.log'
+OUTPUT_TEXT = 'minutes.txt'
+OUTPUTS = {  # 取得できる出力 → ジョブディレクトリ内のファイル名 (create_meeting_report の命名規則)
+    'transcript': 'minutes.txt',
+    'summary': 'minutes_summary.txt',
+    'srt': 'minutes.srt',
+    'vtt': 'minutes.vtt',
+    'json': 'minutes.json',
+}
+CONTENT_TYPES = {
+    '.txt': 'text/plain; charset=utf-8',
+    '.srt': 'application/x-subrip; charset=utf-8',
+    '.vtt': 'text/vtt; charset=utf-8',
+    '.json': 'application/json; charset=utf-8',
+}
+AUDIO_EXTENSIONS = ('.wav',) + audio_archive.ARCHIVE_EXTENSIONS
+ACTIVE_STATES = ('receiving', 'queued', 'running')  # 受け付け上限に数える状態
+INIT_YAML = os.path.join(os.getcwd(), "init.yml")
+TOKEN_ENV = 'AMR_SERVER_TOKEN'
+
+_JOB_ID = re.compile(r'^[0-9A-Za-z-]{1,64}$')
+_PARAM = re.compile(r'^[\w.-]{1,64}$')
+
+Logger = Callable[[str], None]
+
+
+def _log(logger: Optional[Logger], msg: str):
+    if logger:
+        try:
+            logger(msg)
+        except Exception:
+            pass
+
+
+def _now() -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+class JobError(Exception):
+    """HTTP ステータス付きのジョブ操作エラー"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _safe_name(name: str) -> str:
+    name = os.path.basename(name.replace('\\', '/')).strip()
+    name = re.sub(r'[^\w.-]', '_', name)
+    if not name.lower().endswith(AUDIO_EXTENSIONS):
+        raise JobError(400, f"未対応の音声形式です: {name} ({', '.join(AUDIO_EXTENSIONS)})")
+    if name.startswith('.'):
+        name = 'recording' + name
+    return name
+
+
+def _job_params(params: dict, settings: AppSettings, allow_models: Optional[List[str]] = None) -> dict:
+    lang = params.get('lang') or DEFAULT_LANG
+    model = params.get('model') or settings.whisper_model
+    for key, value in (('lang', lang), ('model', model)):
+        if not isinstance(value, str) or not _PARAM.match(value):
+            raise JobError(400, f"{key} が不正です: {value}")
+    allowed = [settings.whisper_model] + list(allow_models or [])
+    if model not in allowed:
+        # 大きいモデルの指定でロード時間・メモリを使い切られないよう、起動時に許可したものだけ
+        raise JobError(400, f"model は {', '.join(allowed)} のみ指定できます: {model}")
+    return {'lang': lang, 'model': model}
+
+
+class JobManager:
+    """ジョブの受け付け・永続化と、上限付きワーカーでの create_meeting_report 実行"""
+
+    def __init__(self, work_dir: str, settings: AppSettings, workers: int = DEFAULT_WORKERS,
+                 max_queue: int = DEFAULT_MAX_QUEUE, allow_dirs: Optional[List[str]] = None,
+                 use_gemini: bool = False, chunk_seconds: int = CHUNK_SECONDS,
+                 max_upload_mb: float = MAX_UPLOAD_MB, allow_models: Optional[List[str]] = None,
+                 meeting_db: Optional[str] = None, logger: Optional[Logger] = None):
+        os.makedirs(work_dir, exist_ok=True)
+        self.work_dir = work_dir
+        self.settings = settings
+        self.workers = max(int(workers), 1)
+        self.capacity = self.workers + max(int(max_queue), 0)
+        self.allow_dirs = [os.path.realpath(d) for d in (allow_dirs or [])]
+        self.use_gemini = use_gemini
+        self.chunk_seconds = chunk_seconds
+        self.max_upload_bytes = int(max_upload_mb * 2**20)
+        self.allow_models = list(allow_models or [])
+        self.meeting_db = meeting_db or None
+        self.logger = logger
+        self.started = time.time()
+        self.jobs: Dict[str, dict] = {}
+        self._logs: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job')
+        self._recover()
+
+    # ---------------- 起動 / 停止 ----------------
+    def _recover(self):
+        """work_dir の job.json を読み込み、未完了のジョブを再投入する"""
+        requeue = []
+        for name in sorted(os.listdir(self.work_dir)):
+            try:
+                with open(os.path.join(self.work_dir, name, JOB_FILE), encoding='utf-8') as f:
+                    job = json.load(f)
+            except Exception:
+                continue
+            if job.get('id') != name:
+                continue
+            if job['state'] == 'receiving':
+                job.update(state='failed', error='アップロード中にサーバが停止しました', finished=_now())
+                self._save(job)
+            elif job['state'] in ('queued', 'running'):
+                job.update(state='queued', started=None, progress={'done': 0, 'total': 0})
+                self._save(job)
+                requeue.append(name)
+            self.jobs[name] = job
+        for job_id in requeue:
+            self._pool.submit(self._run, job_id)
+        if requeue:
+            _log(self.logger, f"未完了のジョブを再投入しました: {len(requeue)} 件")
+
+    def warm(self):
+        """既定モデルを事前ロードする (以降のジョブはロード済みモデルを使う)"""
+        model = self.settings.whisper_model
+        if model == 'auto':
+            _log(self.logger, "whisper_model=auto のため事前ロードを行いません (最初のジョブでロード)")
+            return
+        start = time.perf_counter()
+        ai_control.preload_models(self.logger, model, self.settings.asr_backend, self.settings.asr_options())
+        _log(self.logger, f"モデル事前ロード: {self.settings.asr_backend}/{model} ({time.perf_counter() - start:.1f}s)")
+
+    def shutdown(self, wait: bool = True):
+        """待ちジョブは取り消す (job.json は queued のまま残り、次回起動時に再投入される)"""
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    # ---------------- 受け付け ----------------
+    def _dir(self, job_id: str) -> str:
+        return os.path.join(self.work_dir, job_id)
+
+    def _reserve(self, name: str, source: Optional[str], params: dict) -> dict:
+        with self._lock:
+            active = sum(1 for j in self.jobs.values() if j['state'] in ACTIVE_STATES)
+            if active >= self.capacity:
+                raise JobError(503, f"受け付け上限 ({self.capacity} 件) に達しています")
+            job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+            os.makedirs(self._dir(job_id))
+            job = {
+                'id': job_id,
+                'state': 'receiving',
+                'name': name,
+                'source': source or os.path.join(self._dir(job_id), name),
+                'lang': params['lang'],
+                'model': params['model'],
+                'created': _now(),
+                'started': None,
+                'finished': None,
+                'progress': {'done': 0, 'total': 0},
+                'error': None,
+                'metrics': None,
+            }
+            self.jobs[job_id] = job
+            self._save(job)
+        return job
+
+    def _enqueue(self, job: dict) -> dict:
+        with self._lock:
+            job['state'] = 'queued'
+            self._save(job)
+        self._pool.submit(self._run, job['id'])
+        self._job_logger(job['id'])(f"受け付け: {job['name']} (lang={job['lang']}, model={job['model']})")
+        return self.status(job['id'])
+
+    def _discard(self, job: dict):
+        with self._lock:
+            self.jobs.pop(job['id'], None)
+            self._logs.pop(job['id'], None)
+        shutil.rmtree(self._dir(job['id']), ignore_errors=True)
+
+    def submit_upload(self, stream, length: Optional[int], params: dict) -> dict:
+        """本文 (length バイト) を音声としてジョブディレクトリへ書き出して投入する"""
+        name = _safe_name(params.get('name') or 'recording.wav')
+        if length is None:
+            raise JobError(411, "Content-Length が必要です")
+        if length <= 0 or length > self.max_upload_bytes:
+            raise JobError(413, f"アップロードサイズが不正です ({length} バイト, 上限 {self.max_upload_bytes})")
+        job = self._reserve(name, None, _job_params(params, self.settings, self.allow_models))
+        try:
+            remaining = length
+            with open(job['source'], 'wb') as f:
+                while remaining > 0:
+                    data = stream.read(min(COPY_BLOCK, remaining))
+                    if not data:
+                        raise JobError(400, f"アップロードが途中で切れました (残り {remaining} バイト)")
+                    f.write(data)
+                    remaining -= len(data)
+            if name.lower().endswith('.wav'):
+                try:
+                    with wave.open(job['source'], 'rb') as wf:
+                        if wf.getsampwidth() != 2:
+                            raise JobError(400, "16bit PCM WAV のみ対応")
+                except wave.Error as e:
+                    raise JobError(400, f"WAV を読めません: {e}")
+        except BaseException:
+            self._discard(job)
+            raise
+        return self._enqueue(job)
+
+    def submit_path(self, path: str, params: dict) -> dict:
+        """許可ディレクトリ内のファイルをコピーせずに処理する"""
+        if not self.allow_dirs:
+            raise JobError(403, "パス指定は無効です (serve --allow-dir で許可するディレクトリを指定)")
+        if not isinstance(path, str) or not path:
+            raise JobError(400, "path を指定してください")
+        real = os.path.realpath(path)
+        if not any(os.path.commonpath([real, d]) == d for d in self.allow_dirs):
+            raise JobError(403, f"許可されていないパスです: {path}")
+        if not os.path.isfile(real):
+            raise JobError(404, f"ファイルがありません: {path}")
+        name = os.path.basename(real)
+        if not name.lower().endswith(AUDIO_EXTENSIONS):
+            raise JobError(400, f"未対応の音声形式です: {name}")
+        return self._enqueue(self._reserve(name, real, _job_params(params, self.settings, self.allow_models)))
+
+    # ---------------- 実行 (ワーカースレッド) ----------------
+    def _job_logger(self, job_id: str) -> Logger:
+        tail = self._logs.setdefault(job_id, deque(maxlen=LOG_TAIL))
+        log_path = os.path.join(self._dir(job_id), LOG_FILE)
+
+        def log(msg: str):
+            line = f"{time.strftime('%H:%M:%S')} {msg}"
+            tail.append(line)
+            try:
+                with open(log_path, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+            except OSError:
+                pass
+            _log(self.logger, f"[{job_id}] {msg}")
+        return log
+
+    def _run(self, job_id: str):
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job['state'] != 'queued':
+                return  # 待ちの間に削除された
+            job['state'] = 'running'
+            job['started'] = _now()
+            self._save(job)
+        logger = self._job_logger(job_id)
+        job_dir = self._dir(job_id)
+        chunk_dir = os.path.join(job_dir, 'chunks')
+
+        def progress(done: int, total: int):
+            with self._lock:
+                job['progress'] = {'done': done, 'total': total}
+                self._save(job)
+
+        s = self.settings
+        if self.use_gemini:
+            options = ai_control.PipelineOptions.from_settings(s, meeting_db=self.meeting_db)
+        else:
+            # 途中要約・最終要約ともローカル抜粋 (全文を 1 回で読まないよう途中要約を使う)
+            options = ai_control.PipelineOptions.from_settings(
+                s, rolling_summary_seconds=s.rolling_summary_seconds or LOCAL_SUMMARY_SECONDS,
+                summarizer=rolling_summary.local_summarize, meeting_db=self.meeting_db)
+        try:
+            result = ai_control.create_meeting_report(
+                s.prompt, job['source'], chunk_dir, self.chunk_seconds, os.path.join(job_dir, OUTPUT_TEXT),
+                s.gemini_api_key if self.use_gemini else '',
+                logger=logger,
+                lang=job['lang'],
+                whisper_model=job['model'],
+                options=options,
+                progress=progress)
+        except Exception as e:  # create_meeting_report は例外安全だが、ワーカーを止めないよう念のため
+            result = {'success': False, 'error': str(e)}
+        finally:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+        stages = (result.get('metrics') or {}).get('stages', {})
+        with self._lock:
+            job['state'] = 'done' if result.get('success') else 'failed'
+            job['error'] = result.get('error')
+            job['finished'] = _now()
+            job['metrics'] = {name: round(v['seconds'], 3) for name, v in stages.items()}
+            self._save(job)
+        logger(f"ジョブ終了: {job['state']}" + (f" ({job['error']})" if job['error'] else ''))
+
+    def _save(self, job: dict):
+        """job.json を置き換え保存 (ロック内で呼ぶ)"""
+        path = os.path.join(self._dir(job['id']), JOB_FILE)
+        tmp = path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(job, f, ensure_ascii=False, indent=1)
+            os.replace(tmp, path)
+        except OSError as e:
+            _log(self.logger, f"[{job['id']}] job.json の保存失敗: {e}")
+
+    # ---------------- 参照 / 削除 ----------------
+    def _get(self, job_id: str) -> dict:
+        job = self.jobs.get(job_id) if _JOB_ID.match(job_id) else None
+        if job is None:
+            raise JobError(404, f"ジョブがありません: {job_id}")
+        return job
+
+    def status(self, job_id: str, log: bool = True) -> dict:
+        with self._lock:
+            job = self._get(job_id)
+            out = dict(job, progress=dict(job['progress']))
+            if job['state'] == 'queued':
+                # ID は受け付け時刻順に並ぶ
+                out['queue_position'] = sum(1 for j in self.jobs.values() if j['state'] == 'queued' and j['id'] <= job_id)
+        out['outputs'] = [k for k, name in OUTPUTS.items() if os.path.exists(os.path.join(self._dir(job_id), name))]
+        if log:
+            out['log'] = list(self._logs.get(job_id, ()))
+        return out
+
+    def list_jobs(self) -> List[dict]:
+        with self._lock:
+            ids = sorted(self.jobs)
+        jobs = []
+        for job_id in ids:
+            try:
+                jobs.append(self.status(job_id, log=False))
+            except JobError:
+                pass  # 一覧作成中に削除された
+        return jobs
+
+    def output_path(self, job_id: str, kind: str) -> str:
+        with self._lock:
+            self._get(job_id)
+        if kind not in OUTPUTS:
+            raise JobError(404, f"未対応の出力です: {kind} ({', '.join(OUTPUTS)})")
+        path = os.path.join(self._dir(job_id), OUTPUTS[kind])
+        if not os.path.exists(path):
+            raise JobError(404, f"{kind} はまだありません")
+        return path
+
+    def delete(self, job_id: str):
+        """ジョブディレクトリごと削除 (パス指定の元ファイルは消さない)"""
+        with self._lock:
+            job = self._get(job_id)
+            if job['state'] in ('receiving', 'running'):
+                raise JobError(409, f"処理中のジョブは削除できません ({job['state']})")
+            self.jobs.pop(job_id)
+            self._logs.pop(job_id, None)
+        shutil.rmtree(self._dir(job_id), ignore_errors=True)
+
+    def health(self) -> dict:
+        with self._lock:
+            states = [j['state'] for j in self.jobs.values()]
+        return {
+            'status': 'ok',
+            'workers': self.workers,
+            'capacity': self.capacity,
+            'queued': states.count('queued'),
+            'running': states.count('running'),
+            'backend': self.settings.asr_backend,
+            'model': self.settings.whisper_model,
+            'allow_models': self.allow_models,
+            'uptime_seconds': round(time.time() - self.started, 1),
+        }
+
+
+class JobServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, manager: JobManager, token: Optional[str] = None):
+        super().__init__(address, _Handler)
+        self.manager = manager
+        self.token = token
+
+
+class _Body:
+    """Content-Length 分だけ読める本文 (読み残しをエラー応答前に捨てるため残量を数える)"""
+
+    def __init__(self, stream, length: int):
+        self.stream = stream
+        self.remaining = length
+
+    def read(self, size: int) -> bytes:
+        data = self.stream.read(min(size, self.remaining))
+        self.remaining -= len(data)
+        return data
+
+    def drain(self, limit: int) -> bool:
+        if self.remaining > limit:
+            return False
+        while self.remaining > 0 and self.read(COPY_BLOCK):
+            pass
+        return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'ai-meeting-recorder'
+
+    def log_message(self, fmt, *args):
+        _log(self.server.manager.logger, f"{self.address_string()} {fmt % args}")
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def _dispatch(self, method: str):
+        manager = self.server.manager
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        self.body = None
+        try:
+            if parts == ['health'] and method == 'GET':
+                return self._json(200, manager.health())
+            self._check_token()
+            if not parts or parts[0] != 'jobs' or len(parts) > 3:
+                raise JobError(404, f"不明なパスです: {url.path}")
+            if len(parts) == 1 and method == 'GET':
+                return self._json(200, {'jobs': manager.list_jobs()})
+            if len(parts) == 1 and method == 'POST':
+                job = self._submit(params)
+                return self._json(202, job, {'Location': f"/jobs/{job['id']}"})
+            if len(parts) == 2 and method == 'GET':
+                return self._json(200, manager.status(parts[1]))
+            if len(parts) == 2 and method == 'DELETE':
+                manager.delete(parts[1])
+                return self._json(200, {'deleted': parts[1]})
+            if len(parts) == 3 and method == 'GET':
+                return self._send_file(manager.output_path(parts[1], parts[2]))
+            raise JobError(405, f"{method} {url.path} は使えません")
+        except JobError as e:
+            self._discard_body()
+            self._json(e.status, {'error': str(e)})
+        except Exception as e:
+            _log(manager.logger, f"リクエスト処理エラー: {e}")
+            self._discard_body()
+            self._json(500, {'error': str(e)})
+
+    def _discard_body(self):
+        """読み残した本文を捨てる (送信中に応答して接続を切ると、送信側はステータスを受け取れない)"""
+        if self.command != 'POST':
+            return
+        if self.headers.get('Content-Length') is None:
+            self.close_connection = True  # 長さの分からない本文は読み捨てられない
+            return
+        if self.body is None:
+            try:
+                self.body = _Body(self.rfile, max(self._content_length() or 0, 0))
+            except JobError:
+                self.close_connection = True
+                return
+        try:
+            if not self.body.drain(DRAIN_LIMIT_MB * 2**20):
+                self.close_connection = True
+        except OSError:
+            self.close_connection = True
+
+    def _check_token(self):
+        token = self.server.token
+        if token and self.headers.get('Authorization', '') != f"Bearer {token}":
+            raise JobError(401, "認証が必要です")
+
+    def _content_length(self) -> Optional[int]:
+        value = self.headers.get('Content-Length')
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise JobError(400, f"Content-Length が不正です: {value}")
+
+    def _submit(self, params: dict) -> dict:
+        manager = self.server.manager
+        length = self._content_length()
+        self.body = _Body(self.rfile, length or 0)
+        ctype = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if ctype == 'application/json':
+            if length is None or length > MAX_JSON_BYTES:
+                raise JobError(400, "JSON 本文が不正です")
+            try:
+                body = json.loads(self.body.read(length).decode('utf-8'))
+            except ValueError as e:
+                raise JobError(400, f"JSON を読めません: {e}")
+            if not isinstance(body, dict):
+                raise JobError(400, "JSON はオブジェクトで指定してください")
+            return manager.submit_path(body.get('path'), {k: body.get(k) for k in ('lang', 'model')})
+        return manager.submit_upload(self.body, length, params)
+
+    def _json(self, status: int, body, headers: Optional[dict] = None):
+        data = json.dumps(body, ensure_ascii=False, indent=1).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_file(self, path: str):
+        with open(path, 'rb') as f:
+            # 処理中の文字起こしは追記され続けるので、開いた時点の長さだけ返す
+            size = os.fstat(f.fileno()).st_size
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPES.get(os.path.splitext(path)[1], 'application/octet-stream'))
+            self.send_header('Content-Length', str(size))
+            self.end_headers()
+            while size > 0:
+                data = f.read(min(COPY_BLOCK, size))
+                if not data:
+                    break
+                self.wfile.write(data)
+                size -= len(data)
+
+
+def make_server(manager: JobManager, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                token: Optional[str] = None) -> JobServer:
+    """port=0 で空きポートを使う (実際のポートは server.server_address[1])"""
+    return JobServer((host, port), manager, token)
+
+
+# ---------------- クライアント ----------------
+def _request(url: str, method: str = 'GET', data=None, headers: Optional[dict] = None,
+             token: Optional[str] = None, timeout: float = 60) -> bytes:
+    headers = dict(headers or {})
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as res:
+            return res.read()
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read().decode('utf-8')).get('error')
+        except Exception:
+            message = None
+        raise JobError(e.code, message or str(e)) from None
+
+
+def submit_file(base_url: str, path: str, token: Optional[str] = None, lang: Optional[str] = None,
+                model: Optional[str] = None) -> dict:
+    """音声ファイルをアップロードしてジョブを作る (本文はファイルから順に送る)"""
+    query = {'name': os.path.basename(path)}
+    query.update({k: v for k, v in (('lang', lang), ('model', model)) if v})
+    with open(path, 'rb') as f:
+        body = _request(f"{base_url.rstrip('/')}/jobs?{urlencode(query)}", 'POST', data=f,
+                        headers={'Content-Type': 'application/octet-stream',
+                                 'Content-Length': str(os.path.getsize(path))},
+                        token=token, timeout=600)
+    return json.loads(body)
+
+
+def submit_path(base_url: str, path: str, token: Optional[str] = None, lang: Optional[str] = None,
+                model: Optional[str] = None) -> dict:
+    """サーバ側のパスを指定してジョブを作る (サーバの --allow-dir 内のみ)"""
+    payload = {'path': path, 'lang': lang, 'model': model}
+    body = _request(f"{base_url.rstrip('/')}/jobs", 'POST',
+                    data=json.dumps({k: v for k, v in payload.items() if v}).encode('utf-8'),
+                    headers={'Content-Type': 'application/json'}, token=token)
+    return json.loads(body)
+
+
+def get_job(base_url: str, job_id: str, token: Optional[str] = None) -> dict:
+    return json.loads(_request(f"{base_url.rstrip('/')}/jobs/{quote(job_id)}", token=token))
+
+
+def wait_job(base_url: str, job_id: str, token: Optional[str] = None, interval: float = POLL_SECONDS,
+             on_progress: Optional[Callable[[dict], None]] = None) -> dict:
+    """done / failed になるまでポーリングし、最後の状態を返す"""
+    while True:
+        job = get_job(base_url, job_id, token)
+        if on_progress:
+            on_progress(job)
+        if job['state'] not in ACTIVE_STATES:
+            return job
+        time.sleep(interval)
+
+
+def fetch_output(base_url: str, job_id: str, kind: str, token: Optional[str] = None) -> bytes:
+    return _request(f"{base_url.rstrip('/')}/jobs/{quote(job_id)}/{kind}", token=token)
+
+
+# ---------------- コマンドライン ----------------
+def _serve(args) -> int:
+    settings = AppSettings.load(args.config) if os.path.exists(args.config) else AppSettings()
+    manager = JobManager(args.work_dir, settings, workers=args.workers, max_queue=args.max_queue,
+                         allow_dirs=args.allow_dir, use_gemini=args.gemini, chunk_seconds=args.chunk_seconds,
+                         max_upload_mb=args.max_upload_mb, allow_models=args.allow_model,
+                         meeting_db=args.meeting_db, logger=print)
+    if not args.no_warm:
+        manager.warm()
+    server = make_server(manager, args.host, args.port, args.token)
+    if args.host not in ('127.0.0.1', 'localhost', '::1') and not args.token:
+        print(f"警告: {args.host} で認証無しに待ち受けます (--token の指定を推奨)")
+    print(f"待ち受け開始: http://{args.host}:{server.server_address[1]} "
+          f"(ワーカー {manager.workers}, 受け付け上限 {manager.capacity}, 作業ディレクトリ {args.work_dir})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("停止します (実行中のジョブの完了を待ちます。待ちジョブは次回起動時に再投入)")
+    finally:
+        server.server_close()
+        manager.shutdown()
+    return 0
+
+
+def _submit(args) -> int:
+    try:
+        if args.server_path:
+            job = submit_path(args.url, args.audio, args.token, args.lang, args.model)
+        else:
+            job = submit_file(args.url, args.audio, args.token, args.lang, args.model)
+    except (JobError, OSError) as e:
+        print(f"投入失敗: {e}", file=sys.stderr)
+        return 1
+    print(f"ジョブ {job['id']} を投入しました")
+    if args.no_wait:
+        return 0
+    shown = [None]
+
+    def show(j):
+        p = j['progress']
+        line = f"{j['state']} {p['done']}/{p['total']}" if p['total'] else j['state']
+        if line != shown[0]:
+            print(line, file=sys.stderr)
+            shown[0] = line
+    try:
+        job = wait_job(args.url, job['id'], args.token, args.interval, show)
+    except (JobError, OSError) as e:
+        print(f"状態取得失敗: {e}", file=sys.stderr)
+        return 1
+    if job['state'] != 'done':
+        print(f"ジョブ失敗: {job.get('error')}", file=sys.stderr)
+        return 1
+    stem = os.path.join(args.out_dir, os.path.splitext(os.path.basename(args.audio))[0])
+    for kind, suffix in (('transcript', '.txt'), ('summary', '_summary.txt')):
+        if kind in job['outputs']:
+            with open(stem + suffix, 'wb') as f:
+                f.write(fetch_output(args.url, job['id'], kind, args.token))
+            print(f"保存: {stem + suffix}")
+    if job.get('error'):
+        print(f"注意: {job['error']}", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description='議事録処理のローカル HTTP ジョブ API')
+    sub = ap.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('serve', help='ジョブサーバを起動')
+    p.add_argument('--host', default=DEFAULT_HOST)
+    p.add_argument('--port', type=int, default=DEFAULT_PORT)
+    p.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='同時に処理するジョブ数')
+    p.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE, help='実行待ちにできるジョブ数')
+    p.add_argument('--work-dir', default=os.path.join(os.getcwd(), 'jobs'))
+    p.add_argument('--allow-dir', action='append', default=[], help='パス指定で処理を許可するディレクトリ (複数可)')
+    p.add_argument('--token', default=os.environ.get(TOKEN_ENV), help=f'Bearer トークン (既定: 環境変数 {TOKEN_ENV})')
+    p.add_argument('--config', default=INIT_YAML, help='パイプライン設定 (AppSettings の YAML)')
+    p.add_argument('--chunk-seconds', type=int, default=CHUNK_SECONDS)
+    p.add_argument('--max-upload-mb', type=float, default=MAX_UPLOAD_MB)
+    p.add_argument('--allow-model', action='append', default=[],
+                   help='設定の whisper_model 以外にジョブで指定を許すモデル (複数可)')
+    p.add_argument('--meeting-db', help='完了したジョブを登録する会議アーカイブ (既定: 登録しない)')
+    p.add_argument('--gemini', action='store_true', help='設定の Gemini キーで要約する (既定はローカル抜粋)')
+    p.add_argument('--no-warm', action='store_true', help='起動時にモデルをロードしない')
+    p = sub.add_parser('submit', help='録音を投入し、完了後に文字起こし・要約を保存')
+    p.add_argument('audio')
+    p.add_argument('--url', default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+    p.add_argument('--token', default=os.environ.get(TOKEN_ENV))
+    p.add_argument('--lang')
+    p.add_argument('--model')
+    p.add_argument('--server-path', action='store_true', help='アップロードせずサーバ側のパスとして指定')
+    p.add_argument('--out-dir', default='.')
+    p.add_argument('--interval', type=float, default=POLL_SECONDS)
+    p.add_argument('--no-wait', action='store_true', help='投入だけして終了')
+    args = ap.parse_args(argv)
+    return _serve(args) if args.command == 'serve' else _submit(args)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
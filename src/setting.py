@@ -5,6 +5,31 @@ import os
 SAMPLE_RATE = 16000
 CHANNELS = 1
 RECORD_SECONDS = 600 * 30  # 最大録音時間（例: 30分）
+CAPTURE_DTYPE = "int16"  # 録音ストリームのサンプル型 ("int16" / "float32")
+DEVICE_REFRESH_SECONDS = 0  # デバイス一覧の定期再検索間隔（秒, 0で無効）。プレビュー停止中 (非アクティブ時) のみ実行
+PREVIEW_BLOCK_MS = 100  # プレビューストリームのブロック長（ミリ秒）
+PREVIEW_PAUSE_UNFOCUSED = True  # ウィンドウ非アクティブ時にプレビューを停止するか
+WHISPER_BATCH_SIZE = 1  # Whisper バッチ推論の窓数（1で従来の逐次処理）
+ASR_BACKEND = "whisper"  # 文字起こしエンジン ("whisper" / "faster-whisper")
+ASR_COMPUTE_TYPE = "int8"  # faster-whisper の演算精度 ("int8" / "int8_float32" / "float32" など)
+WHISPER_QUANTIZE = False  # Whisper (PyTorch) を動的 int8 量子化して CPU 推論するか
+WHISPER_MODEL = "small"  # Whisper モデル ("tiny"〜"large" / "auto" で期限から自動選択)
+DEADLINE_SECONDS = 1800  # whisper_model="auto" 時の文字起こし目標時間（秒）
+CHUNK_SECONDS = None  # 文字起こし用の分割長（秒, None で record_seconds）。短くすると並列/逐次処理しやすい
+CHUNK_OVERLAP_SECONDS = 2.0  # チャンク境界の重なり（秒）。重複部分はタイムスタンプで除去
+TRANSCRIPT_FORMATS = ["srt", "vtt", "json"]  # 文字起こしテキストと一緒に書き出すタイムスタンプ付き形式
+ROLLING_SUMMARY_SECONDS = 0  # 録音この秒数分の文字起こし毎に途中要約を更新（0で無効: 終了時に全文を 1 回で要約）
+METRICS_JSONL = ""  # 工程別計測を JSON Lines で追記するファイル（空で無効）
+DIAGNOSTICS = False  # 診断モード（プロファイル / メモリ追跡）。環境変数 AMR_DIAGNOSTICS でも有効化
+DIAGNOSTICS_MODE = "sample"  # 診断モードの方式 ("sample": スタックサンプリング / "cprofile")
+ARCHIVE_CODEC = ""  # 議事録処理後に録音を圧縮保存する形式 ("flac" / "opus", 空で無効)
+ARCHIVE_REMOVE_WAV = False  # 圧縮後に元の WAV を削除するか
+SEGMENT_SECONDS = 0  # 録音中に書き出すセグメントの長さ（秒, 0で無効: 停止時に 1 本だけ保存）
+KEEP_SEGMENTS = False  # 連結後も録音セグメントのフォルダを残すか
+REMOVE_DC = False  # 分割前 (と録音のリサンプル時) に DC オフセットを除去するか
+NORMALIZE_DBFS = None  # 分割前に発話の平均レベルをこの dBFS へ正規化（None で無効。例: -20.0）
+SEPARATE_CHANNELS = False  # マイク / スピーカーを別チャンネルのまま保存し、チャンネル別に文字起こしするか
+RETRANSCRIBE_LOW_CONFIDENCE = False  # 低確信度チャンクを期限内なら大きいモデルで再文字起こしするか
 
 # ファイル格納先
 BASE_DIR = os.getcwd()
@@ -12,6 +37,9 @@ WAV_FILE = os.path.join(BASE_DIR, "meeting.wav")
 CHUNK_DIR = os.path.join(BASE_DIR, "chunks")
 MINUTES_FILE = os.path.join(BASE_DIR, "meeting_minutes.txt")
 SUMMARY_FILE = os.path.join(BASE_DIR, "meeting_summary.txt")
+DIAGNOSTICS_DIR = os.path.join(BASE_DIR, "diagnostics")
+SEGMENT_DIR = os.path.join(BASE_DIR, "segments")
+MEETING_DB = ""  # 会議アーカイブ (全文検索用 SQLite) の保存先（空で無効。例: meetings.db）
 
 GEMINI_API_KEY = "YOUR_GEMINI_API_KEY"  # Gemini APIキーを設定
 
@@ -77,7 +105,35 @@ class AppSettings:
 				 minutes_file=MINUTES_FILE,    # 議事録テキストファイルのパス
 				 summary_file=SUMMARY_FILE,    # Gemini要約ファイルのパス
 				 gemini_api_key=GEMINI_API_KEY,# Gemini APIキー
-				 prompt=G_PROMPT):             # Geminiに渡すプロンプト
+				 prompt=G_PROMPT,              # Geminiに渡すプロンプト
+				 capture_dtype=CAPTURE_DTYPE,  # 録音ストリームのサンプル型
+				 segment_seconds=SEGMENT_SECONDS,              # 録音セグメントの長さ（秒）
+				 segment_dir=SEGMENT_DIR,                      # 録音セグメントの保存先
+				 keep_segments=KEEP_SEGMENTS,                  # 連結後もセグメントを残す
+				 archive_codec=ARCHIVE_CODEC,                  # 録音の圧縮保存形式
+				 meeting_db=MEETING_DB,                        # 会議アーカイブの保存先
+				 archive_remove_wav=ARCHIVE_REMOVE_WAV,        # 圧縮後に WAV を削除
+				 separate_channels=SEPARATE_CHANNELS,          # チャンネル別 (local / remote) 文字起こし
+				 remove_dc=REMOVE_DC,                          # DC オフセット除去
+				 normalize_dbfs=NORMALIZE_DBFS,                # 文字起こし前の音量正規化目標
+				 device_refresh_seconds=DEVICE_REFRESH_SECONDS, # デバイス定期再検索間隔（秒）
+				 preview_block_ms=PREVIEW_BLOCK_MS,            # プレビューのブロック長（ミリ秒）
+				 preview_pause_unfocused=PREVIEW_PAUSE_UNFOCUSED, # 非アクティブ時のプレビュー停止
+				 whisper_batch_size=WHISPER_BATCH_SIZE,        # Whisper バッチ推論の窓数
+				 asr_backend=ASR_BACKEND,                      # 文字起こしエンジン
+				 asr_compute_type=ASR_COMPUTE_TYPE,            # faster-whisper の演算精度
+				 whisper_quantize=WHISPER_QUANTIZE,            # Whisper の動的 int8 量子化
+				 whisper_model=WHISPER_MODEL,                  # Whisper モデル ("auto" で自動選択)
+				 deadline_seconds=DEADLINE_SECONDS,            # 自動選択時の目標処理時間
+				 retranscribe_low_confidence=RETRANSCRIBE_LOW_CONFIDENCE,  # 低確信度チャンクの再文字起こし
+				 chunk_seconds=CHUNK_SECONDS,                  # 文字起こし用の分割長 (None: record_seconds)
+				 chunk_overlap_seconds=CHUNK_OVERLAP_SECONDS,  # チャンク境界の重なり
+				 transcript_formats=None,                      # タイムスタンプ付き出力形式
+				 rolling_summary_seconds=ROLLING_SUMMARY_SECONDS,  # 途中要約の更新間隔
+				 metrics_jsonl=METRICS_JSONL,                  # 工程別計測の出力先
+				 diagnostics=DIAGNOSTICS,                      # 診断モード
+				 diagnostics_mode=DIAGNOSTICS_MODE,            # 診断モードの方式
+				 diagnostics_dir=DIAGNOSTICS_DIR):             # 診断レポートの出力先
 		self.sample_rate = sample_rate
 		self.channels = channels
 		self.record_seconds = record_seconds
@@ -87,6 +143,46 @@ class AppSettings:
 		self.summary_file = summary_file
 		self.gemini_api_key = gemini_api_key
 		self.prompt = prompt
+		self.capture_dtype = capture_dtype
+		self.segment_seconds = segment_seconds
+		self.segment_dir = segment_dir
+		self.keep_segments = keep_segments
+		self.archive_codec = archive_codec
+		self.meeting_db = meeting_db
+		self.archive_remove_wav = archive_remove_wav
+		self.separate_channels = separate_channels
+		self.remove_dc = remove_dc
+		self.normalize_dbfs = normalize_dbfs
+		self.device_refresh_seconds = device_refresh_seconds
+		self.preview_block_ms = preview_block_ms
+		self.preview_pause_unfocused = preview_pause_unfocused
+		self.whisper_batch_size = whisper_batch_size
+		self.asr_backend = asr_backend
+		self.asr_compute_type = asr_compute_type
+		self.whisper_quantize = whisper_quantize
+		self.whisper_model = whisper_model
+		self.deadline_seconds = deadline_seconds
+		self.retranscribe_low_confidence = retranscribe_low_confidence
+		self.chunk_seconds = chunk_seconds
+		self.chunk_overlap_seconds = chunk_overlap_seconds
+		self.transcript_formats = list(TRANSCRIPT_FORMATS) if transcript_formats is None else transcript_formats
+		self.rolling_summary_seconds = rolling_summary_seconds
+		self.metrics_jsonl = metrics_jsonl
+		self.diagnostics = diagnostics
+		self.diagnostics_mode = diagnostics_mode
+		self.diagnostics_dir = diagnostics_dir
+
+	def split_seconds(self):
+		"""文字起こし用の分割長。chunk_seconds 未指定の設定 (従来の init.yml) は record_seconds で分割する"""
+		return self.chunk_seconds or self.record_seconds
+
+	def asr_options(self):
+		"""ASRバックエンドへ渡す追加オプション"""
+		if self.asr_backend == "faster-whisper":
+			return {"compute_type": self.asr_compute_type}
+		if self.asr_backend == "whisper" and self.whisper_quantize:
+			return {"quantize": True}
+		return {}
 
 	def save(self, filepath):
 		with open(filepath, "w", encoding="utf-8") as f:
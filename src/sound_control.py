@@ -1,15 +1,159 @@
-import sounddevice as sd
 import numpy as np
 import wave
 import os
 
+try:
+    import sounddevice as sd
+except Exception:  # 音声デバイスの無い環境 (ベンチマーク / サーバ) でも分割・変換処理は使えるように
+    sd = None
+
 # 録音設定
 SAMPLE_RATE = 16000
 CHANNELS = 1
 RECORD_SECONDS = 600 * 30  # 最大録音時間（例: 30分）
 
+INT16_SCALE = 32768.0
+CHANNELS_SUFFIX = '_channels.wav'  # チャンネル別文字起こし用の 2ch WAV
+
+
+def to_int16(data):
+    """録音データを 16bit PCM へ変換 (既に int16 ならそのまま返す)"""
+    if data.dtype == np.int16:
+        return data
+    return (np.clip(data, -1, 1) * 32767).astype('<i2')
+
+
+def to_float32(data):
+    """録音データを -1..1 の float32 へ変換 (表示 / Whisper 入力用)"""
+    if data.dtype == np.float32:
+        return data
+    if data.dtype.kind == 'i':
+        return data.astype(np.float32) / INT16_SCALE
+    return data.astype(np.float32)
+
+
+def read_wav_int16(input_file):
+    """16bit PCM WAV を読み込み (モノラル int16 配列, サンプルレート) を返す"""
+    with wave.open(input_file, 'rb') as wf:
+        rate = wf.getframerate()
+        nch = wf.getnchannels()
+        sampwidth = wf.getsampwidth()
+        frames = wf.readframes(wf.getnframes())
+    if sampwidth != 2:
+        raise ValueError('16bit PCM WAV のみ対応')
+    data = np.frombuffer(frames, dtype='<i2')
+    if nch > 1:
+        data = data.reshape(-1, nch)[:,0]
+    return data, rate
+
+
+def channels_path(wav_file):
+    """ミックス前の 2ch WAV (L: マイク, R: スピーカー) のパス"""
+    return os.path.splitext(wav_file)[0] + CHANNELS_SUFFIX
+
+
+def read_wav_channels(input_file):
+    """16bit PCM WAV をチャンネルを分けたまま読み込み (int16 配列 (サンプル数, チャンネル数), サンプルレート) を返す"""
+    with wave.open(input_file, 'rb') as wf:
+        rate = wf.getframerate()
+        nch = wf.getnchannels()
+        sampwidth = wf.getsampwidth()
+        frames = wf.readframes(wf.getnframes())
+    if sampwidth != 2:
+        raise ValueError('16bit PCM WAV のみ対応')
+    return np.frombuffer(frames, dtype='<i2').reshape(-1, nch), rate
+
+
+def frame_db(data, rate, frame_ms=30):
+    """フレーム毎の RMS (dB)。端数サンプルは捨てる
+
+    Returns: (dB 配列, フレーム長サンプル数)
+    """
+    frame = max(int(rate * frame_ms / 1000), 1)
+    n = len(data) // frame
+    if n == 0:
+        return np.zeros(0, dtype=np.float32), frame
+    x = to_float32(np.asarray(data[:n * frame]).reshape(-1)).reshape(n, frame)
+    rms = np.sqrt(np.einsum('ij,ij->i', x, x) / frame)
+    return 20 * np.log10(rms + 1e-10), frame
+
+
+def activity_from_db(db, threshold_db=-45.0, margin_db=10.0):
+    """フレーム dB 列から発話フレームを判定 (ノイズフロアは列全体の下位10%)"""
+    if len(db) == 0:
+        return np.zeros(0, dtype=bool)
+    floor = np.percentile(db, 10)
+    return db > max(threshold_db, floor + margin_db)
+
+
+def voice_activity(data, rate, frame_ms=30, threshold_db=-45.0, margin_db=10.0):
+    """フレーム毎の簡易 VAD (エネルギー判定)
+
+    フレーム RMS が「絶対閾値」と「ノイズフロア (下位10%) + margin」の大きい方を超えたら発話とみなす。
+    Returns: (フレーム毎の bool 配列, フレーム長サンプル数)
+    """
+    db, frame = frame_db(data, rate, frame_ms)
+    return activity_from_db(db, threshold_db, margin_db), frame
+
+
+def regions_from_activity(active, frame, total, rate, frame_ms=30, min_silence_ms=500, pad_ms=200):
+    """発話フレーム列を [(開始サンプル, 終了サンプル), ...] へまとめる (speech_regions の後半)"""
+    if not active.any():
+        return []
+    edges = np.diff(np.concatenate(([0], active.astype(np.int8), [0])))
+    starts = np.nonzero(edges == 1)[0]
+    ends = np.nonzero(edges == -1)[0]
+    gap = max(int(min_silence_ms / frame_ms), 1)
+    keep = np.concatenate(([True], starts[1:] - ends[:-1] >= gap))
+    merged_starts = starts[keep]
+    merged_ends = np.concatenate((ends[:-1][keep[1:]], [ends[-1]]))
+    pad = int(rate * pad_ms / 1000)
+    return [(max(int(s) * frame - pad, 0), min(int(e) * frame + pad, total))
+            for s, e in zip(merged_starts, merged_ends)]
+
+
+def speech_regions(data, rate, frame_ms=30, min_silence_ms=500, pad_ms=200, **vad_kwargs):
+    """発話区間を [(開始サンプル, 終了サンプル), ...] で返す
+
+    min_silence_ms 未満の無音は連結し、前後に pad_ms の余白を付ける。
+    """
+    active, frame = voice_activity(data, rate, frame_ms=frame_ms, **vad_kwargs)
+    return regions_from_activity(active, frame, len(data), rate, frame_ms, min_silence_ms, pad_ms)
+
+
+def speech_seconds(data, rate, **vad_kwargs):
+    """VAD 後の発話時間 (秒)"""
+    return sum(e - s for s, e in speech_regions(data, rate, **vad_kwargs)) / rate
+
+
+def window_density(active, frame, rate, window_seconds=30):
+    """window_seconds 毎の発話フレーム割合と、1 窓のサンプル数"""
+    per_window = max(int(window_seconds * rate) // frame, 1)
+    n = len(active) // per_window
+    return active[:n * per_window].reshape(n, per_window).mean(axis=1), per_window * frame
+
+
+def densest_windows(density, span, count=3):
+    """発話割合の高い順に count 個の窓を [(開始, 終了), ...] (時刻順) で返す"""
+    best = np.argsort(density, kind='stable')[::-1][:count]
+    best = [int(i) for i in best if density[i] > 0] or [int(best[0])]
+    return [(i * span, (i + 1) * span) for i in sorted(best)]
+
+
+def dense_speech_windows(data, rate, window_seconds=30, count=3, **vad_kwargs):
+    """発話フレームの割合が高い順に、重ならない窓を count 個返す [(開始, 終了), ...] (時刻順)"""
+    active, frame = voice_activity(data, rate, **vad_kwargs)
+    density, span = window_density(active, frame, rate, window_seconds)
+    if len(density) == 0:
+        return [(0, len(data))] if len(data) else []
+    return densest_windows(density, span, count)
+
+
 def record_audio(filename):
     import queue
+    if sd is None:
+        print("sounddevice が利用できないため録音できません")
+        return
     print("録音開始... Ctrl+Cで中断できます")
     q = queue.Queue()
     frames = []
@@ -105,31 +249,88 @@ def split_audio(input_file, output_dir, min_silence_len=1000, silence_thresh=-40
     return files
 
 
-def split_audio_by_time(input_file, output_dir, split_seconds=30):
+def chunk_spans(total_samples, rate, split_seconds=30, overlap_seconds=0.0):
+    """時間分割の区間を [(開始, 終了, 採用開始, 採用終了), ...] (サンプル単位) で返す
+
+    各チャンクは名目境界 k*split_seconds の前後へ overlap_seconds/2 ずつ伸ばして切り出す。
+    採用区間 [採用開始, 採用終了) は名目境界そのもので、重複部分の文字起こしは
+    セグメント中心がどちらの採用区間に入るかで片方だけを残す (asr_backend.clip_segments)。
     """
-    音声ファイルを指定した秒数ごとに分割
+    step = max(int(rate * split_seconds), 1)
+    half = int(rate * max(overlap_seconds, 0.0) / 2)
+    spans = []
+    for start in range(0, total_samples, step):
+        end = min(start + step, total_samples)
+        spans.append((max(start - half, 0), min(end + half, total_samples), start, end))
+    return spans
+
+
+def pack_speech_regions(regions, rate, window_seconds=30, overlap_seconds=0.0, gap_seconds=0.5):
+    """発話区間を無音を詰めて window_seconds 以内の文字起こし単位へまとめる
+
+    Returns: [[(開始, 終了, 採用開始, 採用終了), ...], ...] (単位毎の区間列, サンプル単位)。
+    単位内の区間は gap_seconds の無音を挟んで連結して 1 回で文字起こしする想定
+    (Whisper は 1 回の入力を 30 秒窓へ埋めるため、短い発話毎に呼ぶより窓数が減る)。
+    window_seconds を超える連続発話は chunk_spans と同じく重なり付きで分割して採用区間を持たせる。
+    分割しない区間の採用区間は (-inf, inf)。
+    """
+    step = max(int(rate * window_seconds), 1)
+    gap = int(rate * gap_seconds)
+    pieces = []
+    for start, end in regions:
+        if end - start <= step:
+            pieces.append((start, end, float('-inf'), float('inf')))
+            continue
+        spans = chunk_spans(end - start, rate, window_seconds, overlap_seconds)
+        for i, (s, e, ks, ke) in enumerate(spans):
+            pieces.append((start + s, start + e,
+                           float('-inf') if i == 0 else start + ks,
+                           float('inf') if i == len(spans) - 1 else start + ke))
+    jobs = []
+    length = 0
+    for piece in pieces:
+        size = piece[1] - piece[0]
+        if jobs and length + gap + size <= step:
+            jobs[-1].append(piece)
+            length += gap + size
+        else:
+            jobs.append([piece])
+            length = size
+    return jobs
+
+
+def write_time_chunks(data, rate, output_dir, split_seconds=30, overlap_seconds=0.0):
+    """
+    読み込み済みの int16 配列を指定した秒数ごとに (前後 overlap_seconds/2 の重なりを付けて) WAV へ書き出す
+    data には区間読み出しできる audio_archive.AudioSource も渡せる (チャンク毎にその区間だけデコード)
+    Returns: [(ファイルパス, 開始秒, 採用開始秒, 採用終了秒), ...]
     """
     os.makedirs(output_dir, exist_ok=True)
-    with wave.open(input_file, 'rb') as wf:
-        rate = wf.getframerate()
-        nch = wf.getnchannels()
-        sampwidth = wf.getsampwidth()
-        frames = wf.readframes(wf.getnframes())
-    if sampwidth != 2:
-        raise ValueError('16bit PCM WAV のみ対応')
-    data = np.frombuffer(frames, dtype='<i2')
-    if nch > 1:
-        data = data.reshape(-1, nch)[:,0]
-    samples_per_split = int(rate * split_seconds)
-    files = []
-    for i in range(0, len(data), samples_per_split):
-        chunk = data[i:i+samples_per_split]
-        out_file = os.path.join(output_dir, f"time_chunk_{i//samples_per_split+1}.wav")
+    chunks = []
+    for idx, (start, end, keep_start, keep_end) in enumerate(chunk_spans(len(data), rate, split_seconds, overlap_seconds)):
+        chunk = data[start:end]
+        out_file = os.path.join(output_dir, f"time_chunk_{idx+1}.wav")
         pcm16 = chunk.astype('<i2') if chunk.dtype != np.int16 else chunk
         with wave.open(out_file, 'wb') as wf:
             wf.setnchannels(1)
             wf.setsampwidth(2)
             wf.setframerate(rate)
             wf.writeframes(pcm16.tobytes())
-        files.append(out_file)
-    return files
+        chunks.append((out_file, start / rate, keep_start / rate, keep_end / rate))
+    return chunks
+
+
+def split_audio_with_spans(input_file, output_dir, split_seconds=30, overlap_seconds=0.0):
+    """
+    音声ファイルを指定した秒数ごとに (前後 overlap_seconds/2 の重なりを付けて) 分割
+    Returns: [(ファイルパス, 開始秒, 採用開始秒, 採用終了秒), ...]
+    """
+    data, rate = read_wav_int16(input_file)
+    return write_time_chunks(data, rate, output_dir, split_seconds, overlap_seconds)
+
+
+def split_audio_by_time(input_file, output_dir, split_seconds=30, overlap_seconds=0.0):
+    """
+    音声ファイルを指定した秒数ごとに分割
+    """
+    return [c[0] for c in split_audio_with_spans(input_file, output_dir, split_seconds, overlap_seconds)]
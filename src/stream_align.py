@@ -0,0 +1,239 @@
+"""マイク/スピーカー 2 ストリームの時刻合わせとミックス
+
+録音コールバックで記録したブロック毎の ADC 時刻 (time.inputBufferAdcTime) から
+ストリーム毎の「サンプル番号 → 時刻」対応 (StreamClock) を推定し、
+マイクの時間軸にスピーカー側を線形補間で再サンプリングして重ね合わせる。
+
+ - 開始時刻のずれ (オフセット) とデバイス間のクロック差 (ドリフト) を同時に補正
+ - 一時停止などで時刻が飛んだ箇所は区間を分けて個別に直線近似
+ - 出力は一定長ずつ生成して WAV へ追記するため、全体の結合や追加の全体パスは不要
+ - 時刻情報が無い/不正な場合は従来通り先頭揃えとする
+"""
+
+from typing import List, Optional, Tuple
+import math
+import wave
+import numpy as np
+
+from .sound_control import to_float32, to_int16
+
+GAP_TOLERANCE = 0.1    # これ以上時刻が飛んだら別区間とみなす (秒)
+MAX_RATE_ERROR = 0.01  # 推定レートが公称値から 1% 以上ずれたら傾きは公称値を使う
+MIX_CHUNK_SECONDS = 10
+
+
+class StreamClock:
+    """サンプル番号と時刻の区分線形対応 (t = a + b * index)"""
+
+    def __init__(self, starts, ends, a, b, nominal: bool = False):
+        self.starts = np.asarray(starts, dtype=np.float64)  # 区間の先頭サンプル番号
+        self.ends = np.asarray(ends, dtype=np.float64)      # 区間の終端サンプル番号 (含まない)
+        self.a = np.asarray(a, dtype=np.float64)
+        self.b = np.asarray(b, dtype=np.float64)
+        self.t_starts = self.a + self.b * self.starts
+        self.nominal = nominal
+
+    @classmethod
+    def nominal_clock(cls, n_frames: int, sample_rate: int) -> 'StreamClock':
+        return cls([0], [n_frames], [0.0], [1.0 / sample_rate], nominal=True)
+
+    @classmethod
+    def fit(cls, index, times, n_frames: int, sample_rate: int) -> 'StreamClock':
+        """ブロック先頭のサンプル番号と ADC 時刻から推定"""
+        index = np.asarray(index, dtype=np.float64)
+        times = np.asarray(times, dtype=np.float64)
+        ok = times > 0  # ADC 時刻を返さないホスト API は 0 を渡してくる
+        index = index[ok]
+        times = times[ok]
+        if len(index) < 2 or n_frames <= 0:
+            return cls.nominal_clock(n_frames, sample_rate)
+        order = np.argsort(index, kind='stable')
+        index = index[order]
+        times = times[order]
+        nominal_b = 1.0 / sample_rate
+        jump = np.abs(np.diff(times) - np.diff(index) * nominal_b)
+        breaks = np.nonzero(jump > GAP_TOLERANCE)[0] + 1
+        bounds = np.concatenate(([0], breaks, [len(index)]))
+        starts, ends, a_list, b_list = [], [], [], []
+        for s, e in zip(bounds[:-1], bounds[1:]):
+            xi = index[s:e]
+            ti = times[s:e]
+            b = nominal_b
+            if len(xi) >= 2:
+                xm = xi.mean()
+                tm = ti.mean()
+                var = float(np.dot(xi - xm, xi - xm))
+                if var > 0:
+                    fitted = float(np.dot(xi - xm, ti - tm)) / var
+                    if abs(fitted / nominal_b - 1.0) < MAX_RATE_ERROR:
+                        b = fitted
+            else:
+                xm, tm = xi[0], ti[0]
+            starts.append(0.0 if s == 0 else xi[0])
+            a_list.append(tm - b * xm)
+            b_list.append(b)
+        ends = starts[1:] + [float(n_frames)]
+        return cls(starts, ends, a_list, b_list)
+
+    @property
+    def start_time(self) -> float:
+        return float(self.t_starts[0])
+
+    @property
+    def end_time(self) -> float:
+        return float(self.a[-1] + self.b[-1] * self.ends[-1])
+
+    @property
+    def rate(self) -> float:
+        """区間長で重み付けした実効サンプルレート"""
+        w = self.ends - self.starts
+        return float(np.sum(w / self.b) / max(np.sum(w), 1.0))
+
+    def index_to_time(self, k):
+        seg = np.clip(np.searchsorted(self.starts, k, side='right') - 1, 0, len(self.starts) - 1)
+        return self.a[seg] + self.b[seg] * k
+
+    def time_to_index(self, t) -> Tuple[np.ndarray, np.ndarray]:
+        """時刻 → 小数サンプル位置。データが存在する位置かどうかのマスクも返す"""
+        seg = np.clip(np.searchsorted(self.t_starts, t, side='right') - 1, 0, len(self.starts) - 1)
+        p = (t - self.a[seg]) / self.b[seg]
+        valid = (p >= self.starts[seg]) & (p < self.ends[seg] - 1)
+        return p, valid
+
+    def extrapolate_index(self, t: float) -> float:
+        """範囲外も含めて時刻をサンプル位置へ (先頭/末尾区間で外挿)"""
+        seg = int(np.clip(np.searchsorted(self.t_starts, t, side='right') - 1, 0, len(self.starts) - 1))
+        return float((t - self.a[seg]) / self.b[seg])
+
+
+class FrameStore:
+    """録音チャンクのリストを結合せずにサンプル範囲で参照する
+
+    base: frames[0] の先頭サンプル番号 (古いチャンクを捨てながら使う場合)
+    """
+
+    def __init__(self, frames: List[np.ndarray], base: int = 0):
+        self.frames = frames
+        lengths = [len(f) for f in frames]
+        self.offsets = (base + np.concatenate(([0], np.cumsum(lengths)))).astype(np.int64)
+        self.base = int(base)
+        self.n = int(self.offsets[-1])  # 終端サンプル番号 (含まない)
+
+    def gather(self, lo: int, hi: int) -> np.ndarray:
+        """[lo, hi) のモノラル float32 (範囲外は 0)"""
+        out = np.zeros(max(hi - lo, 0), dtype=np.float32)
+        a = max(lo, self.base)
+        b = min(hi, self.n)
+        if a >= b:
+            return out
+        i = int(np.searchsorted(self.offsets, a, side='right') - 1)
+        pos = a
+        while pos < b:
+            f = self.frames[i]
+            f0 = int(self.offsets[i])
+            s = pos - f0
+            e = min(len(f), b - f0)
+            part = f[s:e]
+            if part.ndim > 1:
+                part = part.mean(axis=1) if part.shape[1] > 1 else part[:, 0]
+            out[pos - lo:pos - lo + (e - s)] = to_float32(part)
+            pos = f0 + e
+            i += 1
+        return out
+
+
+def _concat_anchors(anchors) -> Tuple[np.ndarray, np.ndarray]:
+    if not anchors:
+        return np.empty(0), np.empty(0)
+    idx = np.concatenate([a[0] for a in anchors])
+    t = np.concatenate([a[1] for a in anchors])
+    return idx, t
+
+
+def align_range(mic: FrameStore, spk: FrameStore, mic_clock: StreamClock, spk_clock: StreamClock,
+                k0: int, k1: int) -> Tuple[np.ndarray, np.ndarray]:
+    """マイクのサンプル番号 [k0, k1) の区間について (マイク, 時刻合わせしたスピーカー) の float32 を返す"""
+    out = np.zeros(max(k1 - k0, 0), dtype=np.float32)
+    k = np.arange(k0, k1, dtype=np.float64)
+    p, valid = spk_clock.time_to_index(mic_clock.index_to_time(k))
+    if valid.any():
+        pv = p[valid]
+        lo = int(np.floor(pv.min()))
+        hi = int(np.floor(pv.max())) + 2
+        src = spk.gather(lo, hi)
+        i0 = np.floor(pv).astype(np.int64) - lo
+        frac = (pv - np.floor(pv)).astype(np.float32)
+        i1 = np.minimum(i0 + 1, len(src) - 1)
+        out[valid] = src[i0] * (1.0 - frac) + src[i1] * frac
+    return mic.gather(k0, k1), out
+
+
+def mix_range(mic: FrameStore, spk: FrameStore, mic_clock: StreamClock, spk_clock: StreamClock,
+              k0: int, k1: int) -> np.ndarray:
+    """マイクのサンプル番号 [k0, k1) の区間について、スピーカー側を時刻合わせして重ねた float32"""
+    local, remote = align_range(mic, spk, mic_clock, spk_clock, k0, k1)
+    return local + remote
+
+
+def _open_wav(path: str, sample_rate: int, channels: int):
+    wf = wave.open(path, 'wb')
+    wf.setnchannels(channels)
+    wf.setsampwidth(2)
+    wf.setframerate(sample_rate)
+    return wf
+
+
+def fit_clocks(mic_anchors, spk_anchors, mic_frames: int, spk_frames: int,
+               sample_rate: int) -> Tuple[StreamClock, StreamClock]:
+    """両ストリームの時刻対応を推定 (片方でも時刻が取れなければ両方とも先頭揃え)"""
+    mic_clock = StreamClock.fit(*_concat_anchors(mic_anchors or []), mic_frames, sample_rate)
+    spk_clock = StreamClock.fit(*_concat_anchors(spk_anchors or []), spk_frames, sample_rate)
+    if mic_clock.nominal or spk_clock.nominal:
+        mic_clock = StreamClock.nominal_clock(mic_frames, sample_rate)
+        spk_clock = StreamClock.nominal_clock(spk_frames, sample_rate)
+    return mic_clock, spk_clock
+
+
+def alignment_info(mic_clock: StreamClock, spk_clock: StreamClock) -> dict:
+    return {
+        'offset_ms': (spk_clock.start_time - mic_clock.start_time) * 1000.0,
+        'drift_ppm': (spk_clock.rate / mic_clock.rate - 1.0) * 1e6,
+        'aligned': not mic_clock.nominal,
+    }
+
+
+def mix_streams_to_wav(path: str, sample_rate: int, mic_frames, spk_frames,
+                       mic_anchors=None, spk_anchors=None, logger=None,
+                       chunk_seconds: int = MIX_CHUNK_SECONDS, channels_path: Optional[str] = None) -> Optional[dict]:
+    """時刻合わせしたマイク + スピーカーのミックスを WAV (16bit mono) へ書き出す
+
+    mic_anchors / spk_anchors: (サンプル番号配列, ADC時刻配列) のリスト
+    channels_path を指定すると、同じ時間軸でミックス前の 2ch WAV (L: マイク, R: スピーカー) も書き出す
+    Returns: オフセット/ドリフト等の情報 dict
+    """
+    mic = FrameStore(mic_frames)
+    spk = FrameStore(spk_frames)
+    # 片方でも時刻が取れなければ先頭揃え (従来動作)
+    mic_clock, spk_clock = fit_clocks(mic_anchors, spk_anchors, mic.n, spk.n, sample_rate)
+    k_start = min(0, int(math.floor(mic_clock.extrapolate_index(spk_clock.start_time))))
+    k_end = max(mic.n, int(math.ceil(mic_clock.extrapolate_index(spk_clock.end_time))))
+    # 時刻が異常な場合の暴走防止
+    k_start = max(k_start, -spk.n)
+    k_end = min(k_end, mic.n + spk.n)
+    info = dict(alignment_info(mic_clock, spk_clock), frames=k_end - k_start)
+    step = max(int(sample_rate * chunk_seconds), 1)
+    cf = _open_wav(channels_path, sample_rate, 2) if channels_path else None
+    try:
+        with _open_wav(path, sample_rate, 1) as wf:
+            for k0 in range(k_start, k_end, step):
+                k1 = min(k0 + step, k_end)
+                local, remote = align_range(mic, spk, mic_clock, spk_clock, k0, k1)
+                wf.writeframes(to_int16(local + remote).tobytes())
+                if cf is not None:
+                    cf.writeframes(to_int16(np.stack((local, remote), axis=1)).tobytes())
+    finally:
+        if cf is not None:
+            cf.close()
+    if logger:
+        logger(f"ストリーム同期: オフセット {info['offset_ms']:.1f}ms / ドリフト {info['drift_ppm']:.0f}ppm")
+    return info
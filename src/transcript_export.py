@@ -0,0 +1,218 @@
+"""タイムスタンプ付き文字起こしの出力 (SRT / WebVTT / JSON)
+
+セグメント (asr_backend.make_segment 形式, start/end は録音先頭からの秒) を
+1 回の走査で各形式へ整形し、テキスト出力と同じ場所に拡張子違いで保存する。
+
+    meeting_minutes.txt → meeting_minutes.srt / meeting_minutes.vtt / meeting_minutes.json
+
+チャンネル別文字起こしの話者ラベル (seg['speaker']: local / remote) は SRT では "[local] " の前置き、
+WebVTT では声タグ <v local>、JSON では speaker 項目として出力する。
+
+TranscriptWriter はチャンク単位で全ファイルへ追記し、その都度 flush + fsync する。
+処理途中でもテキストを読める (GUI の途中経過表示) ほか、異常終了しても完了分は残る。
+書き出した JSON は iter_json_segments でセグメント毎に読み戻せる。
+書き直し (再文字起こし・チャンネル統合) は replace=True で一時ファイルへ書き、close() で os.replace する。
+読み手には旧ファイルか完成した新ファイルのどちらかだけが見え、inode の変化で書き直しを検出できる。
+"""
+
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import json
+import os
+
+EXPORT_FORMATS = ('srt', 'vtt', 'json')
+
+ExportLogger = Callable[[str], None]
+
+
+def format_timestamp(seconds: float, decimal: str = ',') -> str:
+    """秒 → 'HH:MM:SS,mmm' (SRT) / 'HH:MM:SS.mmm' (VTT)"""
+    ms = int(round(max(seconds, 0.0) * 1000))
+    h, ms = divmod(ms, 3_600_000)
+    m, ms = divmod(ms, 60_000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02d}:{m:02d}:{s:02d}{decimal}{ms:03d}"
+
+
+def _cue_text(text: str) -> str:
+    # 空行はキューの区切りになるため詰める
+    return '\n'.join(line.strip() for line in str(text).strip().splitlines() if line.strip())
+
+
+def _srt_cue(index: int, start: float, end: float, text: str, speaker: Optional[str] = None) -> str:
+    if speaker:
+        text = f"[{speaker}] {text}"
+    return f"{index}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n\n"
+
+
+def _vtt_cue(start: float, end: float, text: str, speaker: Optional[str] = None) -> str:
+    if speaker:
+        text = f"<v {speaker}>{text}"
+    return f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{text}\n\n"
+
+
+def _json_item(index: int, start: float, end: float, text: str, seg: dict) -> dict:
+    item = {'id': index, 'start': round(start, 3), 'end': round(end, 3), 'text': text,
+            'avg_logprob': seg.get('avg_logprob'), 'no_speech_prob': seg.get('no_speech_prob')}
+    if seg.get('speaker'):
+        item['speaker'] = seg['speaker']
+    return item
+
+
+def _cues(segments: Iterable[dict], first_index: int = 1):
+    """(番号, 開始, 終了, テキスト, 元セグメント) を yield (空テキストは除外)"""
+    index = first_index
+    for seg in segments:
+        text = _cue_text(seg.get('text', ''))
+        if not text:
+            continue
+        start = float(seg.get('start') or 0.0)
+        end = max(float(seg.get('end') or 0.0), start)
+        yield index, start, end, text, seg
+        index += 1
+
+
+def render(segments: Iterable[dict], formats: Iterable[str] = EXPORT_FORMATS, language: Optional[str] = None) -> Dict[str, str]:
+    """セグメントを 1 回走査して {形式: 文字列} を返す"""
+    formats = [f for f in formats if f in EXPORT_FORMATS]
+    srt: List[str] = []
+    vtt: List[str] = ['WEBVTT\n\n']
+    items: List[dict] = []
+    for index, start, end, text, seg in _cues(segments):
+        if 'srt' in formats:
+            srt.append(_srt_cue(index, start, end, text, seg.get('speaker')))
+        if 'vtt' in formats:
+            vtt.append(_vtt_cue(start, end, text, seg.get('speaker')))
+        if 'json' in formats:
+            items.append(_json_item(index, start, end, text, seg))
+    out: Dict[str, str] = {}
+    if 'srt' in formats:
+        out['srt'] = ''.join(srt)
+    if 'vtt' in formats:
+        out['vtt'] = ''.join(vtt)
+    if 'json' in formats:
+        out['json'] = json.dumps({'language': language, 'segments': items}, ensure_ascii=False, indent=1)
+    return out
+
+
+def write_transcripts(segments: Iterable[dict], text_path: str, formats: Iterable[str] = EXPORT_FORMATS,
+                      language: Optional[str] = None, logger: Optional[ExportLogger] = None) -> Dict[str, str]:
+    """text_path と同じ場所へ拡張子違いで書き出し、{形式: パス} を返す (失敗した形式は含まない)"""
+    base = os.path.splitext(text_path)[0]
+    written: Dict[str, str] = {}
+    for fmt, body in render(segments, formats, language).items():
+        path = f"{base}.{fmt}"
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(body)
+            written[fmt] = path
+        except Exception as e:
+            if logger:
+                logger(f"{fmt.upper()} 書き込み失敗: {e}")
+    return written
+
+
+def iter_json_segments(path: str) -> Iterator[dict]:
+    """TranscriptWriter が書いた JSON からセグメントを 1 件ずつ読む (全体を読み込まない)
+
+    TranscriptWriter はセグメントを 1 行 1 件で書くため、行単位で復元できる。
+    """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip().rstrip(',')
+            if line.startswith('{') and line.endswith('}') and not line.startswith('{"language"'):
+                yield json.loads(line)
+
+
+class TranscriptWriter:
+    """チャンク単位でテキスト/SRT/VTT/JSON へ追記するライタ
+
+    add_chunk() 毎に flush + fsync するため、処理途中でも完了分のテキストを読める。
+    JSON はセグメント配列を逐次書き、close() で閉じ括弧を書いて有効な文書にする。
+    replace=True では各ファイルを *.tmp へ書き、close() で本来のパスへ置き換える (例外時は破棄)。
+    """
+
+    def __init__(self, text_path: str, formats: Iterable[str] = EXPORT_FORMATS, language: Optional[str] = None,
+                 logger: Optional[ExportLogger] = None, replace: bool = False):
+        self.text_path = text_path
+        self.logger = logger
+        self.paths: Dict[str, str] = {}
+        self._files = {}
+        self._index = 1
+        self._chunks = 0
+        self._suffix = '.tmp' if replace else ''
+        self._text = open(text_path + self._suffix, 'w', encoding='utf-8')
+        base = os.path.splitext(text_path)[0]
+        for fmt in formats:
+            if fmt not in EXPORT_FORMATS:
+                continue
+            path = f"{base}.{fmt}"
+            try:
+                f = open(path + self._suffix, 'w', encoding='utf-8')
+            except Exception as e:
+                self._warn(f"{fmt.upper()} 書き込み失敗: {e}")
+                continue
+            self._files[fmt] = f
+            self.paths[fmt] = path
+        if 'vtt' in self._files:
+            self._files['vtt'].write('WEBVTT\n\n')
+        if 'json' in self._files:
+            self._files['json'].write('{"language": %s, "segments": [' % json.dumps(language))
+        self._sync()
+
+    def _warn(self, msg: str):
+        if self.logger:
+            self.logger(msg)
+
+    def _sync(self):
+        for f in [self._text, *self._files.values()]:
+            try:
+                f.flush()
+                os.fsync(f.fileno())
+            except Exception:
+                pass
+
+    def add_chunk(self, text: str, segments: Iterable[dict] = ()):
+        """1 チャンク分のテキストとセグメントを追記して永続化"""
+        # テキストはチャンク間を改行 1 つで連結 (従来の "\n".join と同じ形)
+        self._text.write(('\n' if self._chunks else '') + text)
+        self._chunks += 1
+        for index, start, end, cue, seg in _cues(segments, self._index):
+            if 'srt' in self._files:
+                self._files['srt'].write(_srt_cue(index, start, end, cue, seg.get('speaker')))
+            if 'vtt' in self._files:
+                self._files['vtt'].write(_vtt_cue(start, end, cue, seg.get('speaker')))
+            if 'json' in self._files:
+                item = json.dumps(_json_item(index, start, end, cue, seg), ensure_ascii=False)
+                self._files['json'].write(('\n ' if index == 1 else ',\n ') + item)
+            self._index = index + 1
+        self._sync()
+
+    def close(self, discard: bool = False) -> Dict[str, str]:
+        """ファイルを閉じ、{形式: パス} を返す。discard=True は一時ファイルを置き換えずに消す"""
+        if self._text.closed:
+            return dict(self.paths)
+        if 'json' in self._files and not discard:
+            self._files['json'].write('\n]}\n')
+        self._sync()
+        for f in [self._text, *self._files.values()]:
+            try:
+                f.close()
+            except Exception:
+                pass
+        if self._suffix:
+            for path in [self.text_path, *self.paths.values()]:
+                try:
+                    if discard:
+                        os.remove(path + self._suffix)
+                    else:
+                        os.replace(path + self._suffix, path)
+                except Exception as e:
+                    self._warn(f"書き直し失敗 ({os.path.basename(path)}): {e}")
+        return dict(self.paths)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(discard=exc_type is not None)
+        return False
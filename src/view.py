@@ -5,15 +5,22 @@ Controller から期待される公開属性:
   mic_device_combo, spk_device_combo, lang_combo, gemini_key_entry,
   output_entry, wav_entry, btn_output, btn_wav, prompt_entry,
   btn_record, btn_pause, btn_resume, btn_stop, btn_transcribe,
-  log_box, update_waveform(), log(), ask_save_text(), ask_open_wav(), show_info()
+  btn_refresh_devices, log_box, update_waveform(), log(), ask_save_text(), ask_open_wav(), show_info(),
+  search_entry, btn_search, show_search_results()
+
+波形表示は LevelMeter (level_meter.py) の min/max 履歴とピーク/RMS メーターを描画する。
+描画点数は履歴ビン数で固定のため、録音時間に関わらず 1 フレームのコストは一定。
 """
 
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
 import numpy as np
 
+from .level_meter import HISTORY_BINS, to_dbfs
+
 try:
     import customtkinter as ctk
     _USE_CTK = True
@@ -25,6 +32,12 @@ except Exception:  # ライブラリ未導入時フォールバック
 BG_COLOR = '#001a33'   # 濃いネイビー
 FG_COLOR = 'white'
 
+# 履歴の右側に置くメーター領域 (x 軸上の幅)
+METER_GAP = 10
+METER_WIDTH = 30
+# 文字起こし言語の選択肢。"自動" は録音全体で 1 回だけ言語判定して全チャンクに固定する
+LANG_OPTIONS = ["日本語 (ja)", "英語 (en)", "自動 (auto)"]
+
 
 class RecorderView:
     def __init__(self, master):
@@ -47,8 +60,8 @@ class RecorderView:
     # ------------------------------------------------------------------
     # UI 構築
     # ------------------------------------------------------------------
-    def _build_layout(self):
-        row = 0
+    def _build_figure(self):
+        """波形表示用の Figure / Artist を生成 (Tk に依存しないためベンチマークからも使う)"""
         # Matplotlib Figure (黒背景波形)
         self.fig = Figure(figsize=(8, 2))
         self.ax_mic = self.fig.add_subplot(121)
@@ -58,16 +71,28 @@ class RecorderView:
             self.fig.patch.set_facecolor(BG_COLOR)
         except Exception:
             pass
+        x_max = HISTORY_BINS + METER_GAP + METER_WIDTH
         for ax in (self.ax_mic, self.ax_spk):
             ax.set_facecolor(BG_COLOR)
             ax.set_ylim(-1, 1)
-            ax.set_xlim(0, 1000)
+            ax.set_xlim(0, x_max)
+            ax.set_xticks([])
             ax.tick_params(axis='x', colors='white')
             ax.tick_params(axis='y', colors='white')
             for spine in ax.spines.values():
                 spine.set_color('white')
-        self.line_mic, = self.ax_mic.plot([], [], color='lime')
-        self.line_spk, = self.ax_spk.plot([], [], color='cyan')
+        # 履歴 (上側 = max, 下側 = min) とメーター (RMS バー + ピーク線)
+        self.line_mic, = self.ax_mic.plot([], [], color='lime', linewidth=0.8)
+        self.line_spk, = self.ax_spk.plot([], [], color='cyan', linewidth=0.8)
+        self.line_mic_min, = self.ax_mic.plot([], [], color='lime', linewidth=0.8)
+        self.line_spk_min, = self.ax_spk.plot([], [], color='cyan', linewidth=0.8)
+        meter_x = HISTORY_BINS + METER_GAP
+        self.bar_mic = Rectangle((meter_x, 0), METER_WIDTH, 0, color='lime', alpha=0.6)
+        self.bar_spk = Rectangle((meter_x, 0), METER_WIDTH, 0, color='cyan', alpha=0.6)
+        self.ax_mic.add_patch(self.bar_mic)
+        self.ax_spk.add_patch(self.bar_spk)
+        self.peak_mic, = self.ax_mic.plot([], [], color='white', linewidth=1.2)
+        self.peak_spk, = self.ax_spk.plot([], [], color='white', linewidth=1.2)
         self.ax_mic.set_title('mic', color='white')
         self.ax_spk.set_title('speaker', color='white')
         # 念のため既存タイトルオブジェクトにも色適用（古い Matplotlib 互換）
@@ -76,6 +101,16 @@ class RecorderView:
             self.ax_spk.title.set_color('white')
         except Exception:
             pass
+        # 描画用バッファは使い回す (フレーム毎のアロケーションを避ける)
+        self._hist_x = np.arange(HISTORY_BINS, dtype=np.float32)
+        self._hist_buf = {
+            'mic': (np.zeros(HISTORY_BINS, dtype=np.float32), np.zeros(HISTORY_BINS, dtype=np.float32)),
+            'spk': (np.zeros(HISTORY_BINS, dtype=np.float32), np.zeros(HISTORY_BINS, dtype=np.float32)),
+        }
+
+    def _build_layout(self):
+        row = 0
+        self._build_figure()
         self.canvas = FigureCanvasTkAgg(self.fig, self.master)
         self.canvas.get_tk_widget().grid(row=row, column=0, columnspan=4, padx=4, pady=4, sticky='nsew')
         row += 1
@@ -87,6 +122,7 @@ class RecorderView:
         self.gemini_key_var = tk.StringVar()
         self.output_path = tk.StringVar()
         self.wav_path = tk.StringVar()
+        self.search_var = tk.StringVar()
 
         # ヘルパ: CTk が無ければ ttk 風代替 (ここでは標準 tk) を使用
         WidgetLabel = ctk.CTkLabel if _USE_CTK else tk.Label
@@ -107,7 +143,9 @@ class RecorderView:
         else:
             self.mic_device_combo = tk.OptionMenu(self.master, self.mic_device_var, "")
             self.mic_device_combo.configure(bg='#002244', fg=FG_COLOR, highlightthickness=0, activebackground='#003c66', activeforeground=FG_COLOR)
-        self.mic_device_combo.grid(row=row, column=1, columnspan=3, sticky='ew', padx=4, pady=4)
+        self.mic_device_combo.grid(row=row, column=1, columnspan=2, sticky='ew', padx=4, pady=4)
+        self.btn_refresh_devices = WidgetButton(self.master, text='デバイス再検索', **btn_kwargs)
+        self.btn_refresh_devices.grid(row=row, column=3, padx=4, pady=4, sticky='ew')
         row += 1
 
         # スピーカーデバイス
@@ -123,13 +161,13 @@ class RecorderView:
         # 言語
         WidgetLabel(self.master, text="文字起こし言語:", **label_kwargs).grid(row=row, column=0, padx=4, pady=4, sticky='w')
         if _USE_CTK:
-            self.lang_combo = WidgetCombo(self.master, variable=self.lang_var, values=["日本語 (ja)", "英語 (en)"])
+            self.lang_combo = WidgetCombo(self.master, variable=self.lang_var, values=LANG_OPTIONS)
             try:
                 self.lang_combo.set(self.lang_var.get())
             except Exception:
                 pass
         else:
-            self.lang_combo = tk.OptionMenu(self.master, self.lang_var, "日本語 (ja)", "英語 (en)")
+            self.lang_combo = tk.OptionMenu(self.master, self.lang_var, *LANG_OPTIONS)
             self.lang_combo.configure(bg='#002244', fg=FG_COLOR, highlightthickness=0, activebackground='#003c66', activeforeground=FG_COLOR)
         self.lang_combo.grid(row=row, column=1, columnspan=1, sticky='ew', padx=4, pady=4)
         row += 1
@@ -183,6 +221,14 @@ class RecorderView:
         self.btn_transcribe.grid(row=row, column=0, columnspan=4, padx=4, pady=6, sticky='ew')
         row += 1
 
+        # 会議アーカイブ検索
+        WidgetLabel(self.master, text="議事録検索:", **label_kwargs).grid(row=row, column=0, padx=4, pady=4, sticky='w')
+        self.search_entry = WidgetEntry(self.master, textvariable=self.search_var, **entry_kwargs)
+        self.search_entry.grid(row=row, column=1, columnspan=2, sticky='ew', padx=4, pady=4)
+        self.btn_search = WidgetButton(self.master, text='検索', **btn_kwargs)
+        self.btn_search.grid(row=row, column=3, padx=4, pady=4, sticky='ew')
+        row += 1
+
         # ログ
         WidgetLabel(self.master, text='ログ:', **label_kwargs).grid(row=row, column=0, padx=4, pady=4, sticky='nw')
         self.log_box = WidgetTextbox(self.master, height=8, **textbox_kwargs)
@@ -212,38 +258,41 @@ class RecorderView:
     # ------------------------------------------------------------------
     # 波形更新
     # ------------------------------------------------------------------
-    def update_waveform(self, mic_frames, spk_frames):
+    def update_waveform(self, mic_meter, spk_meter):
+        """LevelMeter の履歴とレベルを描画 (コストは履歴ビン数で一定)"""
         # 録音状態に応じてライン色を切り替え
         try:
             if getattr(self, '_is_recording', False):
-                self.line_mic.set_color('red')
-                self.line_spk.set_color('red')
+                colors = ('red', 'red')
             else:
-                self.line_mic.set_color('lime')
-                self.line_spk.set_color('cyan')
+                colors = ('lime', 'cyan')
+            for line, c in ((self.line_mic, colors[0]), (self.line_mic_min, colors[0]), (self.bar_mic, colors[0]),
+                            (self.line_spk, colors[1]), (self.line_spk_min, colors[1]), (self.bar_spk, colors[1])):
+                line.set_color(c)
         except Exception:
             pass
-        if mic_frames:
-            mic_data = np.concatenate(mic_frames, axis=0)
-            if len(mic_data) > 1000:
-                mic_data = mic_data[-1000:]
-            self.line_mic.set_data(range(len(mic_data)), mic_data.flatten())
-            self.ax_mic.set_xlim(0, len(mic_data))
-        else:
-            self.line_mic.set_data([], [])
-            self.ax_mic.set_xlim(0, 1000)
-        if spk_frames:
-            spk_data = np.concatenate(spk_frames, axis=0)
-            if len(spk_data) > 1000:
-                spk_data = spk_data[-1000:]
-            self.line_spk.set_data(range(len(spk_data)), spk_data.flatten())
-            self.ax_spk.set_xlim(0, len(spk_data))
+        self._draw_meter('mic', mic_meter, self.ax_mic, self.line_mic, self.line_mic_min, self.bar_mic, self.peak_mic)
+        self._draw_meter('spk', spk_meter, self.ax_spk, self.line_spk, self.line_spk_min, self.bar_spk, self.peak_spk)
+        self.canvas.draw_idle()
+
+    def _draw_meter(self, key, meter, ax, line_max, line_min, bar, peak_line):
+        buf_min, buf_max = self._hist_buf[key]
+        if meter is None:
+            count, peak, rms = 0, 0.0, 0.0
         else:
-            self.line_spk.set_data([], [])
-            self.ax_spk.set_xlim(0, 1000)
-        self.ax_mic.set_ylim(-1, 1)
-        self.ax_spk.set_ylim(-1, 1)
-        self.canvas.draw()
+            count = meter.copy_history(buf_min, buf_max)
+            peak, rms = meter.levels()
+        line_max.set_data(self._hist_x[:count], buf_max[:count])
+        line_min.set_data(self._hist_x[:count], buf_min[:count])
+        peak = min(peak, 1.0)
+        rms = min(rms, 1.0)
+        bar.set_y(-rms)
+        bar.set_height(2 * rms)
+        x0 = HISTORY_BINS + METER_GAP
+        x1 = x0 + METER_WIDTH
+        peak_line.set_data([x0, x1, np.nan, x0, x1], [peak, peak, np.nan, -peak, -peak])
+        title = 'mic' if key == 'mic' else 'speaker'
+        ax.title.set_text(f"{title}  peak {to_dbfs(peak):.0f} dB / rms {to_dbfs(rms):.0f} dB")
 
     def set_recording_state(self, is_recording: bool):
         self._is_recording = is_recording
@@ -255,11 +304,31 @@ class RecorderView:
         return filedialog.asksaveasfilename(defaultextension='.txt')
 
     def ask_open_wav(self):
-        return filedialog.askopenfilename(defaultextension='.wav', filetypes=[('WAV files', '*.wav')])
+        return filedialog.askopenfilename(defaultextension='.wav',
+                                          filetypes=[('Audio files', '*.wav *.flac *.opus'), ('WAV files', '*.wav')])
 
     def show_info(self, title, msg):
         messagebox.showinfo(title, msg)
 
+    def show_search_results(self, query, lines):
+        """検索結果を別ウィンドウに表示 (同じウィンドウを再利用)"""
+        top = getattr(self, '_search_window', None)
+        if top is None or not top.winfo_exists():
+            top = tk.Toplevel(self.master)
+            top.configure(bg=BG_COLOR)
+            top.geometry('760x420')
+            box = tk.Text(top, wrap='word', fg=FG_COLOR, bg='#002244', insertbackground=FG_COLOR)
+            box.pack(fill='both', expand=True, padx=4, pady=4)
+            top._result_box = box
+            self._search_window = top
+        top.title(f"議事録検索: {query} ({len(lines)} 件)")
+        box = top._result_box
+        box.configure(state='normal')
+        box.delete('1.0', 'end')
+        box.insert('end', '\n'.join(lines) if lines else '該当なし')
+        box.configure(state='disabled')
+        top.lift()
+
     # ------------------------------------------------------------------
     # デバイスリスト更新 (Controller から呼び出し)
     # ------------------------------------------------------------------
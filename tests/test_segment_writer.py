@@ -0,0 +1,82 @@
+import json
+import os
+
+import numpy as np
+
+from src import segment_writer, sound_control
+from src.segment_writer import SegmentWriter
+
+RATE = 16000
+BLOCK = 1000      # セグメント長 (1 秒) の約数ではないブロック長
+SEGMENT = 1.0
+
+
+def _signal(n, seed):
+    return np.random.default_rng(seed).integers(-8000, 8000, size=(n, 1), dtype=np.int16)
+
+
+def _feed(writer, name, data, start_time=100.0):
+    """録音スレッドと同じく、ブロック毎に (先頭サンプル番号, ADC 時刻) を付けて書き込む"""
+    for i in range(0, len(data), BLOCK):
+        ts = (np.array([i], dtype=np.int64), np.array([start_time + i / RATE]))
+        writer.write(name, data[i:i + BLOCK], ts)
+
+
+def _frames(path):
+    return len(sound_control.read_wav_channels(str(path))[0])
+
+
+def test_rotates_files_at_segment_boundaries(tmp_path):
+    data = _signal(int(2.5 * RATE), seed=1)
+    writer = SegmentWriter(str(tmp_path), RATE, SEGMENT, dual=False)
+    _feed(writer, 'mic', data)
+    writer.close()
+
+    assert sorted(os.listdir(tmp_path)) == ['mic_0000.wav', 'mic_0001.wav', 'mic_0002.wav',
+                                            segment_writer.MANIFEST_NAME]
+    assert [_frames(tmp_path / f"mic_{i:04d}.wav") for i in range(3)] == [RATE, RATE, RATE // 2]
+    out = str(tmp_path / 'joined.wav')
+    assert segment_writer.concat_segments(str(tmp_path), out)
+    joined, rate = sound_control.read_wav_int16(out)
+    assert rate == RATE
+    np.testing.assert_array_equal(joined, data[:, 0])
+
+
+def test_manifest_after_close(tmp_path):
+    writer = SegmentWriter(str(tmp_path), RATE, SEGMENT, dual=False)
+    _feed(writer, 'mic', _signal(int(1.5 * RATE), seed=2))
+    assert not segment_writer.load_manifest(str(tmp_path))['complete']
+    manifest = writer.close()
+
+    assert segment_writer.load_manifest(str(tmp_path)) == json.loads(json.dumps(manifest))
+    assert manifest['complete']
+    assert manifest['seconds'] == 1.5
+    assert manifest['streams'] == ['mic']
+    assert [(s['index'], s['start_seconds'], s['seconds']) for s in manifest['segments']] == [(0, 0.0, 1.0),
+                                                                                            (1, 1.0, 0.5)]
+    assert manifest['segments'][1]['files'] == {'mic': 'mic_0001.wav'}
+    assert manifest['segments'][1]['mix'] == 'mic_0001.wav'
+    assert writer.close() is manifest  # 2 回目は何もしない
+
+
+def test_speaker_stream_stops_partway(tmp_path):
+    mic = _signal(3 * RATE, seed=3)
+    spk = _signal(int(1.2 * RATE), seed=4)
+    done = []
+    writer = SegmentWriter(str(tmp_path), RATE, SEGMENT, dual=True, on_segment=done.append)
+    _feed(writer, 'spk', spk)
+    _feed(writer, 'mic', mic)
+    # スピーカー側を待つのは 1 セグメント分まで。止まっていても録音中にセグメントが進む
+    assert [s['index'] for s in done] == [0, 1]
+    manifest = writer.close()
+
+    assert [s['seconds'] for s in manifest['segments']] == [1.0, 1.0, 1.0]
+    assert manifest['segments'][1]['files'] == {'mic': 'mic_0001.wav', 'spk': 'spk_0001.wav'}
+    assert manifest['segments'][2]['files'] == {'mic': 'mic_0002.wav'}
+    assert not os.path.exists(tmp_path / 'spk_0002.wav')
+    # スピーカーが止まった後のミックスはマイクだけになる
+    mix, _ = sound_control.read_wav_int16(str(tmp_path / 'mix_0002.wav'))
+    assert len(mix) == RATE
+    np.testing.assert_allclose(mix.astype(np.int32), mic[2 * RATE:, 0].astype(np.int32), atol=1)
+    paths = segment_writer.segment_paths(str(tmp_path))
+    assert [os.path.basename(p) for p in paths] == ['mix_0000.wav', 'mix_0001.wav', 'mix_0002.wav']
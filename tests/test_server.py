@@ -0,0 +1,231 @@
+import http.client
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.request
+import wave
+
+import numpy as np
+import pytest
+
+from src import asr_backend, server
+from src.setting import AppSettings
+
+RATE = 16000
+SECONDS = 5
+CHUNK_SECONDS = 2
+TOKEN = 'secret'
+
+
+class StubBackend(asr_backend.AsrBackend):
+    """チャンク毎に 1 セグメントを返す ASR スタブ (gate が閉じている間は推論で待つ)"""
+    name = 'test-stub'
+    gate = threading.Event()
+
+    def load(self):
+        return True
+
+    def transcribe_array(self, audio, lang='ja', **kwargs):
+        assert self.gate.wait(30)
+        return [asr_backend.make_segment(0.0, len(audio) / RATE, f"発話 {self.model_size}", -0.3, 0.01)]
+
+    def detect_language(self, audios):
+        return {'ja': 1.0}
+
+
+@pytest.fixture(autouse=True)
+def stub_backend():
+    asr_backend.register_backend(StubBackend)
+    StubBackend.gate.set()
+    yield
+    StubBackend.gate.set()
+
+
+def _write_wav(path, seconds=SECONDS):
+    t = np.arange(int(seconds * RATE)) / RATE
+    data = (0.3 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 0.5 * t) > 0) * 32767).astype('<i2')
+    with wave.open(str(path), 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(RATE)
+        wf.writeframes(data.tobytes())
+    return str(path)
+
+
+@pytest.fixture
+def wav(tmp_path):
+    return _write_wav(tmp_path / 'meeting.wav')
+
+
+def _manager(tmp_path, **kwargs):
+    settings = AppSettings(asr_backend=StubBackend.name, whisper_model='stub', metrics_jsonl='',
+                           meeting_db=str(tmp_path / 'settings.db'))
+    kwargs.setdefault('chunk_seconds', CHUNK_SECONDS)
+    return server.JobManager(str(tmp_path / 'jobs'), settings, **kwargs)
+
+
+@pytest.fixture
+def serve(tmp_path):
+    """serve(token=None, **JobManager の引数) → (manager, base_url)。終了時にサーバとワーカーを止める"""
+    running = []
+
+    def start(token=None, **kwargs):
+        manager = _manager(tmp_path, **kwargs)
+        httpd = server.make_server(manager, '127.0.0.1', 0, token)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        running.append((manager, httpd))
+        return manager, f"http://127.0.0.1:{httpd.server_address[1]}"
+    yield start
+    StubBackend.gate.set()
+    for manager, httpd in running:
+        httpd.shutdown()
+        httpd.server_close()
+        manager.shutdown()
+
+
+def _wait(manager, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.status(job_id)
+        if job['state'] not in server.ACTIVE_STATES:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"ジョブが終わりません: {manager.status(job_id)}")
+
+
+def _status(call):
+    with pytest.raises(server.JobError) as e:
+        call()
+    return e.value.status
+
+
+def test_upload_poll_fetch(serve, wav, tmp_path):
+    manager, url = serve()
+    job = server.submit_file(url, wav, lang='ja')
+    assert job['state'] in ('queued', 'running')
+    job = server.wait_job(url, job['id'], interval=0.05)
+
+    assert job['state'] == 'done', job['error']
+    assert job['progress'] == {'done': 3, 'total': 3}
+    assert {'transcript', 'summary', 'srt', 'vtt', 'json'} <= set(job['outputs'])
+    transcript = server.fetch_output(url, job['id'], 'transcript').decode('utf-8')
+    assert transcript.count('発話 stub') == 3
+    assert server.fetch_output(url, job['id'], 'summary').strip()
+    assert len(json.loads(server.fetch_output(url, job['id'], 'json'))['segments']) == 3
+    assert [j['id'] for j in json.loads(urllib.request.urlopen(url + '/jobs').read())['jobs']] == [job['id']]
+    assert _status(lambda: server.fetch_output(url, job['id'], 'pdf')) == 404
+    # 会議アーカイブは --meeting-db 指定時だけ (設定の meeting_db には書かない)
+    assert not os.path.exists(tmp_path / 'settings.db')
+
+
+def test_meeting_db_is_opt_in(serve, wav, tmp_path):
+    db = tmp_path / 'jobs.db'
+    manager, url = serve(meeting_db=str(db))
+    job = server.wait_job(url, server.submit_file(url, wav)['id'], interval=0.05)
+    assert job['state'] == 'done'
+    with sqlite3.connect(str(db)) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM meetings').fetchone() == (1,)
+
+
+def test_rejects_bad_uploads(serve, wav, tmp_path):
+    manager, url = serve(max_upload_mb=0.05, allow_models=['base'])
+    port = int(url.rsplit(':', 1)[1])
+
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    conn.putrequest('POST', '/jobs?name=a.wav')
+    conn.endheaders()
+    assert conn.getresponse().status == 411
+    conn.close()
+
+    assert _status(lambda: server.submit_file(url, wav)) == 413  # 5 秒 = 160 KB > 50 KB
+    small = _write_wav(tmp_path / 'small.wav', seconds=1)
+    broken = tmp_path / 'broken.wav'
+    broken.write_bytes(b'x' * 100)
+    assert _status(lambda: server.submit_file(url, str(broken))) == 400
+    text = tmp_path / 'notes.txt'
+    text.write_text('x')
+    assert _status(lambda: server.submit_file(url, str(text))) == 400
+    assert _status(lambda: server.submit_file(url, small, lang='ja;rm')) == 400
+    # モデルは設定の whisper_model と allow_models のみ
+    assert _status(lambda: server.submit_file(url, small, model='large')) == 400
+    job = server.submit_file(url, small, model='base')
+    assert server.wait_job(url, job['id'], interval=0.05)['model'] == 'base'
+    # 拒否したアップロードは残さない
+    assert sorted(os.listdir(manager.work_dir)) == [job['id']]
+
+
+def test_queue_full_returns_503(serve, wav):
+    StubBackend.gate.clear()
+    manager, url = serve(workers=1, max_queue=1)
+    first = server.submit_file(url, wav)
+    second = server.submit_file(url, wav)
+    assert _status(lambda: server.submit_file(url, wav)) == 503
+    assert server.get_job(url, second['id'])['queue_position'] == 1
+    StubBackend.gate.set()
+    for job in (first, second):
+        assert server.wait_job(url, job['id'], interval=0.05)['state'] == 'done'
+    # 空いたら再び受け付ける
+    assert server.wait_job(url, server.submit_file(url, wav)['id'], interval=0.05)['state'] == 'done'
+
+
+def test_token_required(serve, wav):
+    manager, url = serve(token=TOKEN)
+    assert json.loads(urllib.request.urlopen(url + '/health').read())['status'] == 'ok'
+    assert _status(lambda: server.submit_file(url, wav)) == 401
+    assert _status(lambda: server.submit_file(url, wav, token='wrong')) == 401
+    assert _status(lambda: server.get_job(url, 'missing')) == 401
+    job = server.submit_file(url, wav, token=TOKEN)
+    assert server.wait_job(url, job['id'], token=TOKEN, interval=0.05)['state'] == 'done'
+    assert _status(lambda: server.fetch_output(url, job['id'], 'transcript')) == 401
+
+
+def test_allow_dirs_rejects_paths_outside(serve, wav, tmp_path):
+    allowed = tmp_path / 'allowed'
+    allowed.mkdir()
+    inside = _write_wav(allowed / 'inside.wav')
+    os.symlink(wav, allowed / 'link.wav')
+    manager, url = serve(allow_dirs=[str(allowed)])
+
+    assert _status(lambda: server.submit_path(url, wav)) == 403
+    assert _status(lambda: server.submit_path(url, str(allowed / '..' / 'meeting.wav'))) == 403
+    assert _status(lambda: server.submit_path(url, str(allowed / 'link.wav'))) == 403
+    assert _status(lambda: server.submit_path(url, str(allowed / 'missing.wav'))) == 404
+    job = server.submit_path(url, inside)
+    job = server.wait_job(url, job['id'], interval=0.05)
+    assert job['state'] == 'done'
+    assert job['source'] == os.path.realpath(inside)
+    assert os.path.exists(inside)
+
+    manager, url = serve()
+    assert _status(lambda: server.submit_path(url, inside)) == 403  # --allow-dir 無しではパス指定不可
+
+
+def test_restart_recovers_queued_jobs(wav, tmp_path, monkeypatch):
+    # 1 回目: ワーカーが動かないまま停止した状態を作る
+    monkeypatch.setattr(server.JobManager, '_run', lambda self, job_id: None)
+    first = _manager(tmp_path)
+    size = os.path.getsize(wav)
+    with open(wav, 'rb') as f:
+        queued = first.submit_upload(f, size, {'name': 'queued.wav'})
+    with open(wav, 'rb') as f:
+        running = first.submit_upload(f, size, {'name': 'running.wav'})
+    with first._lock:
+        first.jobs[running['id']]['state'] = 'running'
+        first._save(first.jobs[running['id']])
+    receiving = first._reserve('partial.wav', None, {'lang': 'ja', 'model': 'stub'})
+    first.shutdown()
+    monkeypatch.undo()
+
+    manager = _manager(tmp_path)
+    try:
+        for job in (queued, running):
+            job = _wait(manager, job['id'])
+            assert job['state'] == 'done', job['error']
+            assert 'transcript' in job['outputs']
+        job = manager.status(receiving['id'])
+        assert job['state'] == 'failed'
+        assert 'アップロード中' in job['error']
+    finally:
+        manager.shutdown()
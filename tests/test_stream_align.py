@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from src import sound_control, stream_align
+from src.stream_align import FrameStore, StreamClock
+
+RATE = 16000
+BLOCK = 1600
+OFFSET = 0.120     # スピーカー側の開始が 120 ms 遅い
+DRIFT_PPM = 150.0  # スピーカー側のクロックが 150 ppm 速い
+
+
+def _signal(t):
+    """線形補間で十分再現できる低周波の合成信号"""
+    return (0.3 * np.sin(2 * np.pi * 110 * t) + 0.2 * np.sin(2 * np.pi * 37 * t + 1.0)).astype(np.float32)
+
+
+def _capture(seconds, start, drift_ppm, jitter=0.0, seed=0):
+    """(int16 ブロックのリスト, [(先頭サンプル番号, ADC 時刻)]) を録音スレッドと同じ形で作る"""
+    rate = RATE * (1 + drift_ppm * 1e-6)
+    n = int(seconds * rate)
+    data = sound_control.to_int16(_signal(np.arange(n) / rate + start))
+    frames = [data[i:i + BLOCK].reshape(-1, 1) for i in range(0, n, BLOCK)]
+    idx = np.arange(0, n, BLOCK, dtype=np.int64)
+    t = start + idx / rate + np.random.default_rng(seed).normal(0, jitter, len(idx))
+    return frames, [(idx, t)]
+
+
+def _streams(seconds=20.0, jitter=0.0005):
+    mic, mic_anchors = _capture(seconds, 100.0, 0.0, jitter, seed=1)
+    spk, spk_anchors = _capture(seconds, 100.0 + OFFSET, DRIFT_PPM, jitter, seed=2)
+    return mic, mic_anchors, spk, spk_anchors
+
+
+def _fit(mic, mic_anchors, spk, spk_anchors):
+    return stream_align.fit_clocks(mic_anchors, spk_anchors, FrameStore(mic).n, FrameStore(spk).n, RATE)
+
+
+def test_fit_recovers_offset_and_drift():
+    mic_clock, spk_clock = _fit(*_streams())
+    info = stream_align.alignment_info(mic_clock, spk_clock)
+    assert info['aligned']
+    assert info['offset_ms'] == pytest.approx(OFFSET * 1000, abs=1.0)
+    assert info['drift_ppm'] == pytest.approx(DRIFT_PPM, abs=10.0)
+
+
+def test_fit_splits_at_time_gap():
+    idx = np.arange(0, 20 * BLOCK, BLOCK)
+    t = 10.0 + idx / RATE
+    t[10:] += 5.0  # 一時停止で 5 秒飛ぶ
+    clock = StreamClock.fit(idx, t, 20 * BLOCK, RATE)
+    assert len(clock.starts) == 2
+    assert clock.index_to_time(9 * BLOCK) == pytest.approx(t[9])
+    assert clock.index_to_time(10 * BLOCK) == pytest.approx(t[10])
+
+
+def test_missing_timestamps_fall_back_to_head_alignment():
+    mic, mic_anchors, spk, spk_anchors = _streams(seconds=2.0)
+    spk_anchors = [(spk_anchors[0][0], np.zeros(len(spk_anchors[0][0])))]  # ADC 時刻を返さないホスト API
+    mic_clock, spk_clock = _fit(mic, mic_anchors, spk, spk_anchors)
+    assert mic_clock.nominal and spk_clock.nominal
+    assert stream_align.alignment_info(mic_clock, spk_clock)['offset_ms'] == 0.0
+
+
+def test_align_range_resamples_speaker_onto_mic_time():
+    mic, mic_anchors, spk, spk_anchors = _streams(jitter=0.0)
+    mic_clock, spk_clock = _fit(mic, mic_anchors, spk, spk_anchors)
+    n = FrameStore(mic).n
+    local, remote = stream_align.align_range(FrameStore(mic), FrameStore(spk), mic_clock, spk_clock, 0, n)
+    # スピーカーは 120 ms 遅れて始まるので、それ以降はマイクと同じ信号になる
+    valid = slice(int(0.2 * RATE), n - RATE)
+    assert np.max(np.abs(remote[valid] - local[valid])) < 0.01
+    assert not remote[:int(0.1 * RATE)].any()
+
+
+def test_align_range_in_pieces_matches_one_pass():
+    mic, mic_anchors, spk, spk_anchors = _streams(seconds=5.0)
+    mic_clock, spk_clock = _fit(mic, mic_anchors, spk, spk_anchors)
+    mic_store, spk_store = FrameStore(mic), FrameStore(spk)
+    n = mic_store.n
+    whole = stream_align.align_range(mic_store, spk_store, mic_clock, spk_clock, 0, n)
+    bounds = [0, 1234, 16000, 40001, n]
+    pieces = [stream_align.align_range(mic_store, spk_store, mic_clock, spk_clock, a, b)
+              for a, b in zip(bounds[:-1], bounds[1:])]
+    for i in range(2):
+        np.testing.assert_array_equal(np.concatenate([p[i] for p in pieces]), whole[i])
+
+
+def test_mix_streams_to_wav_chunking_does_not_change_output(tmp_path):
+    mic, mic_anchors, spk, spk_anchors = _streams(seconds=5.0)
+    outputs = []
+    for chunk_seconds in (1, 100):
+        path = tmp_path / f"mix_{chunk_seconds}.wav"
+        channels = tmp_path / f"chan_{chunk_seconds}.wav"
+        info = stream_align.mix_streams_to_wav(str(path), RATE, mic, spk, mic_anchors, spk_anchors,
+                                               chunk_seconds=chunk_seconds, channels_path=str(channels))
+        assert info['offset_ms'] == pytest.approx(OFFSET * 1000, abs=1.0)
+        outputs.append((sound_control.read_wav_int16(str(path))[0],
+                        sound_control.read_wav_channels(str(channels))[0]))
+    (mix_a, chan_a), (mix_b, chan_b) = outputs
+    np.testing.assert_array_equal(mix_a, mix_b)
+    np.testing.assert_array_equal(chan_a, chan_b)
+    assert chan_a.shape == (len(mix_a), 2)